@@ -0,0 +1,72 @@
+"""
+Empreintes de schéma des tables et collections, pour ne reclassifier que ce qui a changé.
+
+Une empreinte est un hash des colonnes (nom, type) d'une table ou de l'ensemble des
+champs d'une collection. Elle est enregistrée après chaque classification réussie ;
+tant qu'elle est identique au passage suivant, l'entité peut être ignorée.
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FINGERPRINT_PATH = os.getenv("FINGERPRINT_PATH", os.path.join(PROJECT_ROOT, ".cache", "fingerprints.json"))
+
+
+def table_fingerprint(columns: list) -> str:
+    """Empreinte d'une table à partir de get_table_info : [{'name': ..., 'type': ...}]."""
+    items = sorted(f"{col['name']}:{col['type']}" for col in columns)
+    return hashlib.sha256("\n".join(items).encode("utf-8")).hexdigest()
+
+
+def collection_fingerprint(fields) -> str:
+    """Empreinte d'une collection à partir de l'ensemble de ses champs."""
+    return hashlib.sha256("\n".join(sorted(fields)).encode("utf-8")).hexdigest()
+
+
+class FingerprintStore:
+    """
+    Registre persistant {clé entité: empreinte de la dernière classification réussie}.
+
+    Args:
+        path (str): Fichier JSON de stockage.
+    """
+
+    def __init__(self, path: str = FINGERPRINT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.entries = {}
+
+    def matches(self, key: str, fingerprint: str) -> bool:
+        entry = self.entries.get(key)
+        return bool(entry) and entry.get("fingerprint") == fingerprint
+
+    def get(self, key: str) -> dict:
+        return self.entries.get(key, {})
+
+    def record(self, key: str, fingerprint: str, level: str) -> None:
+        with self._lock:
+            self.entries[key] = {
+                "fingerprint": fingerprint,
+                "level": level,
+                "classified_at": time.strftime("%Y-%m-%dT%H:%M:%S")
+            }
+
+    def forget(self, key: str) -> None:
+        with self._lock:
+            self.entries.pop(key, None)
+
+    def save(self) -> None:
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
@@ -0,0 +1,375 @@
+"""
+Choix du modèle LLM selon LLM_PROVIDER.
+
+  gemini (défaut)  google.generativeai.GenerativeModel, clé API_KEY_GOOGLE
+  llama            llama-cpp-python, modèle GGUF local (environnements sans réseau)
+  fake             classification.fake_llm.FakeGenerativeModel, hors ligne et déterministe
+
+Tous les modèles renvoyés exposent generate_content(prompt) → objet avec .text, et
+generate_content(prompt, stream=True) → itérable de fragments avec .text (voir
+stream_text et stream_lines). Le paramètre generation_config (format google-generativeai)
+permet de demander une réponse JSON conforme à un schéma ; llama.cpp le traduit en
+response_format. Chaque appel est chronométré, y compris le délai avant
+le premier fragment d'une réponse diffusée (voir latency_summary).
+
+get_model(model_name, system_prefix) renvoie un modèle dont le préfixe statique (barème,
+voir classification.prompt_cache) est mis en cache par le fournisseur : seuls les prompts
+passés à generate_content sont alors envoyés à chaque appel.
+
+Variables d'environnement du cache de préfixe :
+  PROMPT_CACHE_ENABLED   0 pour renvoyer le préfixe à chaque appel (défaut 1)
+  PROMPT_CACHE_TTL       Durée de vie du cache de contexte Gemini en secondes (défaut 3600)
+  LLAMA_PROMPT_CACHE_MB  Taille du cache KV llama.cpp en mémoire, 0 = désactivé (défaut 512)
+
+Variables d'environnement du backend llama :
+  LLAMA_MODEL_PATH     Fichier .gguf (ou LLM_MODEL s'il se termine par .gguf)
+  LLAMA_N_CTX          Taille du contexte en tokens (défaut 8192)
+  LLAMA_N_THREADS      Threads CPU (défaut : nombre de CPU)
+  LLAMA_N_BATCH        Tokens traités par passe lors de l'évaluation du prompt (défaut 512)
+  LLAMA_N_GPU_LAYERS   Couches déchargées sur GPU (défaut 0)
+  LLAMA_MAX_TOKENS     Tokens générés au maximum par réponse (défaut 2048)
+  LLAMA_TEMPERATURE    Température d'échantillonnage (défaut 0.1)
+  LLAMA_WARMUP         0 pour ne pas préchauffer le modèle au chargement (défaut 1)
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini").lower()
+
+LLAMA_MODEL_PATH = os.getenv("LLAMA_MODEL_PATH")
+LLAMA_N_CTX = int(os.getenv("LLAMA_N_CTX", "8192"))
+LLAMA_N_THREADS = int(os.getenv("LLAMA_N_THREADS", "0")) or os.cpu_count()
+LLAMA_N_BATCH = int(os.getenv("LLAMA_N_BATCH", "512"))
+LLAMA_N_GPU_LAYERS = int(os.getenv("LLAMA_N_GPU_LAYERS", "0"))
+LLAMA_MAX_TOKENS = int(os.getenv("LLAMA_MAX_TOKENS", "2048"))
+LLAMA_TEMPERATURE = float(os.getenv("LLAMA_TEMPERATURE", "0.1"))
+LLAMA_WARMUP = os.getenv("LLAMA_WARMUP", "1") != "0"
+LLAMA_PROMPT_CACHE_MB = int(os.getenv("LLAMA_PROMPT_CACHE_MB", "512"))
+
+PROMPT_CACHE_ENABLED = os.getenv("PROMPT_CACHE_ENABLED", "1") != "0"
+PROMPT_CACHE_TTL = int(os.getenv("PROMPT_CACHE_TTL", "3600"))
+
+_gemini_configured = False
+
+
+class LatencyStats:
+    """Durées des derniers appels LLM (fenêtre glissante), partagées par tous les modèles du processus."""
+
+    def __init__(self, window: int = 1000):
+        self.durations = deque(maxlen=window)
+        self.first_chunks = deque(maxlen=window)
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self._lock = threading.Lock()
+
+    def record(self, duration: float, prompt_tokens: int = 0, completion_tokens: int = 0, cached_tokens: int = 0,
+               error: bool = False, first_chunk: float = None):
+        with self._lock:
+            if first_chunk is not None:
+                self.first_chunks.append(first_chunk)
+            self.calls += 1
+            self.errors += int(error)
+            self.durations.append(duration)
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.cached_tokens += cached_tokens
+
+    def summary(self) -> dict:
+        with self._lock:
+            durations = sorted(self.durations)
+            first_chunks = sorted(self.first_chunks)
+            calls, errors = self.calls, self.errors
+            prompt_tokens, completion_tokens = self.prompt_tokens, self.completion_tokens
+            cached_tokens = self.cached_tokens
+        if not durations:
+            return {"provider": LLM_PROVIDER, "calls": 0}
+
+        def percentile(p, values=durations):
+            return values[min(len(values) - 1, int(p * len(values)))] if values else None
+
+        total = sum(durations)
+        return {
+            "provider": LLM_PROVIDER,
+            "calls": calls,
+            "errors": errors,
+            "mean": total / len(durations),
+            "p50": percentile(0.5),
+            "p95": percentile(0.95),
+            "max": durations[-1],
+            "first_chunk_p50": percentile(0.5, first_chunks),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cached_tokens": cached_tokens,
+            "tokens_per_second": completion_tokens / total if completion_tokens and total else None
+        }
+
+
+latency_stats = LatencyStats()
+
+
+def latency_summary() -> dict:
+    """Statistiques de latence des appels LLM du processus (moyenne, p50, p95, tokens/s)."""
+    return latency_stats.summary()
+
+
+def format_latency_summary() -> str:
+    stats = latency_summary()
+    if not stats["calls"]:
+        return f"⏱️  LLM ({stats['provider']}) : aucun appel"
+    line = (
+        f"⏱️  LLM ({stats['provider']}) : {stats['calls']} appel(s), {stats['errors']} erreur(s) — "
+        f"moyenne {stats['mean']:.2f}s, p50 {stats['p50']:.2f}s, p95 {stats['p95']:.2f}s, max {stats['max']:.2f}s"
+    )
+    if stats["first_chunk_p50"] is not None:
+        line += f", 1er fragment p50 {stats['first_chunk_p50']:.2f}s"
+    if stats["tokens_per_second"]:
+        line += f", {stats['tokens_per_second']:.1f} tokens/s"
+    if stats["cached_tokens"] and stats["prompt_tokens"]:
+        line += f", {stats['cached_tokens'] / stats['prompt_tokens']:.0%} du prompt servi par le cache".replace("%", " %")
+    return line
+
+
+class TimedModel:
+    """Enveloppe un modèle et enregistre la durée de chaque generate_content."""
+
+    def __init__(self, model):
+        self.model = model
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def generate_content(self, prompt, stream: bool = False, **kwargs):
+        if stream:
+            return self._timed_stream(prompt, **kwargs)
+        started = time.perf_counter()
+        try:
+            response = self.model.generate_content(prompt, **kwargs)
+        except Exception:
+            latency_stats.record(time.perf_counter() - started, error=True)
+            raise
+        latency_stats.record(time.perf_counter() - started, *_token_usage(response))
+        return response
+
+    def _timed_stream(self, prompt, **kwargs):
+        started = time.perf_counter()
+        first_chunk = chunk = None
+        try:
+            for chunk in self.model.generate_content(prompt, stream=True, **kwargs):
+                if first_chunk is None:
+                    first_chunk = time.perf_counter() - started
+                yield chunk
+        except Exception:
+            latency_stats.record(time.perf_counter() - started, error=True, first_chunk=first_chunk)
+            raise
+        # Gemini place l'usage des tokens sur le dernier fragment
+        latency_stats.record(time.perf_counter() - started, *_token_usage(chunk), first_chunk=first_chunk)
+
+
+def _token_usage(response) -> tuple:
+    """(tokens du prompt, tokens générés, tokens du prompt servis par le cache) selon le fournisseur."""
+    usage = getattr(response, "usage", None)
+    if isinstance(usage, dict):
+        return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0), 0
+    metadata = getattr(response, "usage_metadata", None)
+    if metadata is not None:
+        return (
+            getattr(metadata, "prompt_token_count", 0) or 0,
+            getattr(metadata, "candidates_token_count", 0) or 0,
+            getattr(metadata, "cached_content_token_count", 0) or 0
+        )
+    return 0, 0, 0
+
+
+class LlamaResponse:
+    def __init__(self, text: str, usage: dict = None):
+        self.text = text
+        self.usage = usage or {}
+
+
+class LlamaCppModel:
+    """
+    Modèle GGUF local servi par llama-cpp-python, avec la même interface que genai.GenerativeModel.
+
+    Le modèle est chargé une seule fois par processus (voir get_llama) et un verrou
+    sérialise les générations : un contexte llama.cpp ne peut servir qu'une requête à la fois.
+    Le préfixe statique est envoyé en message système, toujours tokenisé à l'identique :
+    llama.cpp reprend alors son état KV au lieu de réévaluer le barème.
+    """
+
+    def __init__(self, llama, lock: threading.Lock, system_prefix: str = None):
+        self.llama = llama
+        self.lock = lock
+        self.system_prefix = system_prefix
+
+    def _messages(self, prompt: str) -> list:
+        messages = [{"role": "system", "content": self.system_prefix}] if self.system_prefix else []
+        return messages + [{"role": "user", "content": prompt}]
+
+    def generate_content(self, prompt, max_tokens: int = LLAMA_MAX_TOKENS, stream: bool = False,
+                         generation_config: dict = None, **kwargs):
+        prompt = prompt if isinstance(prompt, str) else "\n".join(map(str, prompt))
+        options = {"max_tokens": max_tokens, "temperature": LLAMA_TEMPERATURE}
+        config = generation_config or {}
+        if config.get("response_mime_type") == "application/json":
+            # Génération contrainte par une grammaire dérivée du schéma
+            options["response_format"] = {"type": "json_object", "schema": config.get("response_schema")}
+        if stream:
+            return self._stream(prompt, options)
+        with self.lock:
+            result = self.llama.create_chat_completion(messages=self._messages(prompt), **options)
+        return LlamaResponse(result["choices"][0]["message"]["content"], result.get("usage"))
+
+    def _stream(self, prompt: str, options: dict):
+        # Le verrou reste pris jusqu'à la fin du flux
+        with self.lock:
+            for event in self.llama.create_chat_completion(
+                messages=self._messages(prompt),
+                stream=True,
+                **options
+            ):
+                text = event["choices"][0].get("delta", {}).get("content")
+                if text:
+                    yield LlamaResponse(text)
+
+
+def stream_text(model, prompt, **kwargs):
+    """Fragments de texte de la réponse, au fur et à mesure de leur génération."""
+    for chunk in model.generate_content(prompt, stream=True, **kwargs):
+        text = getattr(chunk, "text", "")
+        if text:
+            yield text
+
+
+def stream_lines(chunks):
+    """Regroupe des fragments de texte en lignes complètes (la dernière peut être sans retour à la ligne)."""
+    pending = ""
+    for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split("\n")
+        yield from lines
+    if pending:
+        yield pending
+
+
+_llamas = {}
+_llamas_lock = threading.Lock()
+
+
+def get_llama(model_path: str):
+    """Charge (une fois) et préchauffe le modèle GGUF ; renvoie (Llama, verrou de génération)."""
+    with _llamas_lock:
+        if model_path not in _llamas:
+            from llama_cpp import Llama
+
+            started = time.perf_counter()
+            llama = Llama(
+                model_path=model_path,
+                n_ctx=LLAMA_N_CTX,
+                n_threads=LLAMA_N_THREADS,
+                n_batch=LLAMA_N_BATCH,
+                n_gpu_layers=LLAMA_N_GPU_LAYERS,
+                verbose=False
+            )
+            if LLAMA_PROMPT_CACHE_MB and PROMPT_CACHE_ENABLED:
+                from llama_cpp import LlamaRAMCache
+                # États KV conservés par préfixe : alterner les barèmes ne force pas leur réévaluation
+                llama.set_cache(LlamaRAMCache(capacity_bytes=LLAMA_PROMPT_CACHE_MB * 1024 * 1024))
+            if LLAMA_WARMUP:
+                # Premier passage : alloue les buffers et charge les poids en mémoire
+                llama.create_completion("Bonjour", max_tokens=1)
+            print(f"🦙 Modèle GGUF chargé en {time.perf_counter() - started:.1f}s : {os.path.basename(model_path)}")
+            _llamas[model_path] = (llama, threading.Lock())
+        return _llamas[model_path]
+
+
+def prompt_token_budget():
+    """
+    Tokens disponibles pour le prompt d'un appel groupé, ou None si le fournisseur n'impose
+    pas de limite pratique. Avec llama.cpp, prompt et réponse partagent LLAMA_N_CTX.
+    """
+    if LLM_PROVIDER == "llama":
+        return max(LLAMA_N_CTX - LLAMA_MAX_TOKENS, LLAMA_N_CTX // 4)
+    return None
+
+
+_gemini_caches = {}
+_gemini_caches_lock = threading.Lock()
+
+
+def _gemini_prefixed_model(genai, model_name: str, system_prefix: str):
+    """
+    Modèle Gemini adossé à un CachedContent contenant le préfixe, recréé à expiration.
+    Si le cache de contexte est refusé (modèle non versionné, préfixe sous le minimum de
+    tokens…), le préfixe est passé en system_instruction.
+    """
+    if not PROMPT_CACHE_ENABLED:
+        return genai.GenerativeModel(model_name, system_instruction=system_prefix)
+
+    from classification.prompt_cache import prefix_key
+
+    key = (model_name, prefix_key(system_prefix))
+    with _gemini_caches_lock:
+        cached, expires_at = _gemini_caches.get(key, (None, 0))
+        if time.time() >= expires_at:
+            cached = None
+            try:
+                import datetime
+                from google.generativeai import caching
+
+                cached = caching.CachedContent.create(
+                    model=model_name if model_name.startswith("models/") else f"models/{model_name}",
+                    system_instruction=system_prefix,
+                    ttl=datetime.timedelta(seconds=PROMPT_CACHE_TTL)
+                )
+                print(f"🧠 Préfixe du prompt mis en cache côté Gemini ({cached.name})")
+            except Exception as e:
+                print(f"⚠️ Cache de contexte Gemini indisponible, préfixe envoyé en instruction système : {e}")
+            # Marge d'une minute pour ne pas utiliser un cache sur le point d'expirer ;
+            # après un refus, on ne réessaie qu'à la fin du TTL
+            _gemini_caches[key] = (cached, time.time() + max(PROMPT_CACHE_TTL - 60, 60))
+
+    if cached is None:
+        return genai.GenerativeModel(model_name, system_instruction=system_prefix)
+    return genai.GenerativeModel.from_cached_content(cached_content=cached)
+
+
+def get_model(model_name: str, system_prefix: str = None):
+    """
+    Instancie le modèle du fournisseur configuré, chronométré.
+
+    Args:
+        model_name (str): Nom du modèle (ou fichier .gguf pour llama).
+        system_prefix (str): Préfixe statique (barème) mis en cache par le fournisseur ;
+                             generate_content ne reçoit alors que le contexte de l'entité.
+    """
+    global _gemini_configured
+
+    if LLM_PROVIDER == "fake":
+        from classification.fake_llm import FakeGenerativeModel
+        return TimedModel(FakeGenerativeModel(model_name, system_instruction=system_prefix))
+
+    if LLM_PROVIDER == "llama":
+        model_path = LLAMA_MODEL_PATH or (model_name if model_name and model_name.endswith(".gguf") else None)
+        if not model_path:
+            raise ValueError("❌ Chemin du modèle GGUF manquant. Renseigne LLAMA_MODEL_PATH dans ton fichier .env")
+        return TimedModel(LlamaCppModel(*get_llama(model_path), system_prefix=system_prefix))
+
+    import google.generativeai as genai
+    if not _gemini_configured:
+        api_key = os.getenv("API_KEY_GOOGLE")
+        if not api_key:
+            raise ValueError("❌ Clé API Google manquante. Vérifie ton fichier .env")
+        genai.configure(api_key=api_key)
+        _gemini_configured = True
+    if system_prefix:
+        return TimedModel(_gemini_prefixed_model(genai, model_name, system_prefix))
+    return TimedModel(genai.GenerativeModel(model_name))
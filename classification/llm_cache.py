@@ -0,0 +1,230 @@
+"""
+Cache disque des réponses LLM, partagé par tous les points d'entrée de classification.
+
+Chaque réponse est indexée par un hash (modèle, prompt, contexte de l'entité) et
+rangée dans un sous-dossier par entité, ce qui permet d'invalider une seule table
+ou collection. Les entrées expirent après LLM_CACHE_TTL secondes et les plus
+anciennes sont évincées lorsque le cache dépasse LLM_CACHE_MAX_MB.
+
+Le parcours du dossier pour l'éviction n'a pas lieu à chaque écriture : la taille du
+cache est suivie en mémoire (approximation mise à jour à chaque put) et l'éviction ne
+s'exécute que tous les LLM_CACHE_EVICT_EVERY écritures ou quand la taille estimée
+dépasse la limite. Un seul thread évince à la fois ; les autres écrivent sans attendre.
+
+Usage CLI :
+  python -m classification.llm_cache --invalidate clients
+  python -m classification.llm_cache --clear
+"""
+
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.getenv("LLM_CACHE_DIR", os.path.join(PROJECT_ROOT, ".cache", "llm"))
+CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+CACHE_MAX_BYTES = int(float(os.getenv("LLM_CACHE_MAX_MB", "50")) * 1024 * 1024)
+CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") != "0"
+CACHE_EVICT_EVERY = int(os.getenv("LLM_CACHE_EVICT_EVERY", "100"))
+# L'éviction descend sous cette fraction de la taille max, pour ne pas se redéclencher à l'écriture suivante
+CACHE_LOW_WATERMARK = 0.9
+
+_lock = threading.Lock()
+_state_lock = threading.Lock()
+# Taille estimée du cache (None : inconnue, un parcours est nécessaire) et écritures depuis le dernier parcours
+_approx_size = None
+_writes_since_evict = 0
+
+def cache_key(model_name: str, prompt_template: str, context: str) -> str:
+    h = hashlib.sha256()
+    for part in (model_name or "", prompt_template or "", context or ""):
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+def _entity_dir(entity: str) -> str:
+    slug = re.sub(r"[^\w\-.]", "_", (entity or "_sans_nom").lower())
+    return os.path.join(CACHE_DIR, slug)
+
+def _entry_path(entity: str, key: str) -> str:
+    return os.path.join(_entity_dir(entity), f"{key}.json")
+
+def get(model_name: str, prompt_template: str, context: str, entity: str):
+    """Retourne la réponse en cache, ou None si absente ou expirée."""
+    path = _entry_path(entity, cache_key(model_name, prompt_template, context))
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+    if time.time() - entry.get("created_at", 0) > CACHE_TTL:
+        _remove(path)
+        return None
+
+    # Rafraîchir la date d'accès pour l'éviction LRU
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return entry.get("response")
+
+def put(model_name: str, prompt_template: str, context: str, entity: str, response: str) -> None:
+    path = _entry_path(entity, cache_key(model_name, prompt_template, context))
+    entry = {
+        "entity": entity,
+        "model": model_name,
+        "created_at": time.time(),
+        "response": response
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(entry, f, ensure_ascii=False)
+        size = f.tell()
+    os.replace(tmp_path, path)
+    if _eviction_due(size):
+        _evict()
+
+def _eviction_due(written: int) -> bool:
+    """Compte l'écriture ; vrai si un parcours d'éviction est nécessaire."""
+    global _approx_size, _writes_since_evict
+    with _state_lock:
+        _writes_since_evict += 1
+        if _approx_size is not None:
+            # Une entrée réécrite est comptée deux fois : l'estimation ne peut que surévaluer
+            _approx_size += written
+        return _approx_size is None or _approx_size > CACHE_MAX_BYTES or _writes_since_evict >= CACHE_EVICT_EVERY
+
+def invalidate(entity: str = None) -> int:
+    """Supprime les réponses d'une entité (ou tout le cache si entity est None)."""
+    target = _entity_dir(entity) if entity else CACHE_DIR
+    if not os.path.isdir(target):
+        return 0
+    count = sum(len(files) for _, _, files in os.walk(target))
+    shutil.rmtree(target, ignore_errors=True)
+    _reset_size()
+    return count
+
+def _reset_size() -> None:
+    global _approx_size
+    with _state_lock:
+        _approx_size = None
+
+def cached_generate(model_name: str, prompt_template: str, context: str, generate, entity: str, bypass: bool = False) -> str:
+    """
+    Renvoie la réponse en cache pour ce (modèle, prompt, contexte) ou appelle generate().
+
+    Args:
+        model_name (str): Nom du modèle LLM utilisé.
+        prompt_template (str): Prompt système (barème) envoyé au modèle.
+        context (str): Partie du prompt propre à l'entité.
+        generate (callable): Fonction sans argument qui appelle le LLM et renvoie le texte.
+        entity (str): Nom de la table ou collection, pour l'invalidation ciblée.
+        bypass (bool): Ignore la lecture du cache et écrase l'entrée existante.
+    Returns:
+        str: Texte de la réponse du LLM.
+    """
+    if CACHE_ENABLED and not bypass:
+        cached = get(model_name, prompt_template, context, entity)
+        if cached is not None:
+            print(f"⚡ Réponse LLM servie depuis le cache pour '{entity}'")
+            return cached
+
+    response = generate()
+    if CACHE_ENABLED and response:
+        put(model_name, prompt_template, context, entity, response)
+    return response
+
+def cached_stream(model_name: str, prompt_template: str, context: str, stream, entity: str, bypass: bool = False):
+    """
+    Variante de cached_generate pour les réponses diffusées au fil de l'eau.
+
+    Args:
+        stream (callable): Fonction sans argument qui renvoie un itérable de fragments de texte.
+        (autres arguments : voir cached_generate)
+    Yields:
+        str: Fragments de la réponse ; une réponse en cache est renvoyée d'un seul bloc.
+             La réponse complète n'est mise en cache qu'une fois le flux terminé.
+    """
+    if CACHE_ENABLED and not bypass:
+        cached = get(model_name, prompt_template, context, entity)
+        if cached is not None:
+            print(f"⚡ Réponse LLM servie depuis le cache pour '{entity}'")
+            yield cached
+            return
+
+    parts = []
+    for chunk in stream():
+        parts.append(chunk)
+        yield chunk
+
+    response = "".join(parts)
+    if CACHE_ENABLED and response:
+        put(model_name, prompt_template, context, entity, response)
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def _evict() -> None:
+    """Supprime les entrées expirées puis les moins récemment utilisées au-delà de la taille max."""
+    global _approx_size, _writes_since_evict
+    # Un autre thread évince déjà : inutile de l'attendre
+    if not _lock.acquire(blocking=False):
+        return
+    try:
+        entries = []
+        now = time.time()
+        for root, _, files in os.walk(CACHE_DIR):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                # L'expiration réelle est vérifiée à la lecture ; ici on ne purge que l'évident
+                if now - stat.st_mtime > CACHE_TTL:
+                    _remove(path)
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        if total > CACHE_MAX_BYTES:
+            for _, size, path in sorted(entries):
+                if total <= CACHE_MAX_BYTES * CACHE_LOW_WATERMARK:
+                    break
+                _remove(path)
+                total -= size
+
+        with _state_lock:
+            _approx_size = total
+            _writes_since_evict = 0
+    finally:
+        _lock.release()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gestion du cache des réponses LLM")
+    parser.add_argument("--invalidate", metavar="ENTITE", help="Invalider le cache d'une table ou collection")
+    parser.add_argument("--clear", action="store_true", help="Vider tout le cache")
+    args = parser.parse_args()
+
+    if args.clear:
+        print(f"🧹 {invalidate()} réponse(s) supprimée(s) du cache.")
+    elif args.invalidate:
+        print(f"🧹 {invalidate(args.invalidate)} réponse(s) supprimée(s) pour '{args.invalidate}'.")
+    else:
+        parser.print_help()
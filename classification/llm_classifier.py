@@ -1,56 +1,344 @@
 import os
-import google.generativeai as genai
 from dotenv import load_dotenv
 import re
+from classification.llm_backend import get_model, prompt_token_budget, stream_text
+from classification.pii_rules import pre_classify, merge_output, render_output, describe_column
+from classification.similarity_cache import reuse_similar, learn as learn_similar
+from classification.llm_cache import cached_generate, cached_stream, get as get_cached, put as put_cached
+from classification.prompt_cache import load_prompt
+from classification.rate_limit import RateLimiter, call_with_backoff
+from classification.structured_output import (
+    OUTPUT_FORMAT, ClassificationResult, ColumnClassification, classify_json, generation_config, json_prompt,
+    stream_classification
+)
 
 # Charger les variables d’environnement
 load_dotenv()
 
-# Vérifier que la clé API est bien présente
-api_key = os.getenv("API_KEY_GOOGLE")
-if not api_key:
-    raise ValueError("❌ Clé API Google manquante. Vérifie ton fichier .env")
-genai.configure(api_key=api_key)
+# La clé API Google est vérifiée au premier appel (llm_backend.get_model), pas à l'import
 
-def load_prompt(template_type: str) -> str:
-    prompt_path = f"prompts/prompt_{template_type}.txt"
-    try:
-        with open(prompt_path, "r", encoding="utf-8") as f:
-            return f.read()
-    except FileNotFoundError:
-        raise FileNotFoundError(f"❌ Fichier prompt introuvable : {prompt_path}")
+MODEL_NAME = "gemini-1.5-flash"
 
-def classify_data(template_type: str, entity_name: str, data: list) -> tuple:
-    system_prompt = load_prompt(template_type)
+# Budget approximatif (en tokens) d'un prompt regroupant plusieurs entités
+BATCH_TOKEN_BUDGET = int(os.getenv("LLM_BATCH_TOKEN_BUDGET", "24000"))
+
+# Limitation de débit partagée par tous les appels Gemini du processus
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+rate_limiter = RateLimiter(
+    rate=float(os.getenv("LLM_REQUESTS_PER_MINUTE", "0")) / 60,
+    burst=int(os.getenv("LLM_BURST", "1")),
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "0"))
+)
 
-    # Formater les données en fonction du type
+# Marqueur qui sépare les réponses de chaque entité dans un appel groupé
+ENTITY_MARKER = "=== ENTITÉ : {name} ==="
+ENTITY_MARKER_RE = re.compile(r"^\s*=+\s*ENTIT[ÉE]\s*:\s*(.+?)\s*=+\s*$", re.MULTILINE | re.IGNORECASE)
+
+def build_entity_context(template_type: str, entity_name: str, data) -> str:
+    """Construit la partie du prompt propre à une table ou une collection."""
     if template_type == "structured":
-        cols_str = "\n".join([f"- {col['name']} ({col['type']})" for col in data])
-        final_prompt = f"{system_prompt}\n\n📊 Table : {entity_name}\n\n🧱 Colonnes :\n{cols_str}"
+        cols_str = "\n".join([describe_column(col) for col in data])
+        return f"📊 Table : {entity_name}\n\n🧱 Colonnes :\n{cols_str}"
+
+    if isinstance(data, dict) and "description" in data:
+        fields_str = data["description"]
+    elif isinstance(data, list):
+        fields_str = "\n".join([f"- {field}" for field in data])
     else:
-        if isinstance(data, dict) and "description" in data:
-            fields_str = data["description"]
-        elif isinstance(data, list):
-            fields_str = "\n".join([f"- {field}" for field in data])
-        else:
-            fields_str = str(data)
-        final_prompt = f"{system_prompt}\n\n📚 Collection : {entity_name}\n\n📄 Champs :\n{fields_str}"
+        fields_str = str(data)
+    return f"📚 Collection : {entity_name}\n\n📄 Champs :\n{fields_str}"
+
+def extract_level(output: str):
+    """Retourne le libellé de 'Classification finale', ou None s'il est absent."""
+    level_match = re.search(r"Classification finale\s*:\s*([^\(\n]+)\s*\((\d)\)", output)
+    return level_match.group(1).strip() if level_match else None
+
+def estimate_tokens(text: str) -> int:
+    # Approximation suffisante pour découper les lots : ~4 caractères par token
+    return len(text) // 4 + 1
+
+def configure_rate_limit(requests_per_minute: float, burst: int = 1, max_concurrency: int = 0) -> None:
+    """Remplace la limitation de débit appliquée aux appels Gemini."""
+    global rate_limiter
+    rate_limiter = RateLimiter(rate=requests_per_minute / 60, burst=burst, max_concurrency=max_concurrency)
+
+def _generate(prompt: str, config: dict = None, prefix: str = None, model_name: str = MODEL_NAME) -> str:
+    """Appel LLM ; prefix (barème) est mis en cache par le fournisseur et prompt ne contient que le reste."""
+    def call():
+        with rate_limiter:
+            model = get_model(model_name, prefix)
+            if config:
+                return model.generate_content(prompt, generation_config=config).text
+            return model.generate_content(prompt).text
+    return call_with_backoff(call, max_retries=LLM_MAX_RETRIES)
+
+def _stream(prompt: str, config: dict, prefix: str, model_name: str = MODEL_NAME):
+    """Variante diffusée de _generate, sous la même limitation de débit."""
+    with rate_limiter:
+        yield from stream_text(get_model(model_name, prefix), prompt, generation_config=config)
+
+def known_columns(entity_name: str, columns: list) -> tuple:
+    """
+    Colonnes classées sans LLM : règles PII locales, puis reprise des colonnes similaires
+    déjà classées.
+
+    Returns:
+        tuple: (lignes connues, colonnes restantes pour le LLM)
+    """
+    rule_rows, columns = pre_classify(columns)
+    similar_rows, columns = reuse_similar(entity_name, columns)
+    return rule_rows + similar_rows, columns
+
+def classify_structured(template_type: str, entity_name: str, data, use_cache: bool = True, verbose: bool = True,
+                        on_column=None, context: str = None, prompt: str = None,
+                        model_name: str = None) -> ClassificationResult:
+    """
+    Classification en mode JSON : réponse diffusée, scores F, C, R, O par colonne lus en
+    une passe, avec au plus un appel de réparation ciblé sur les champs invalides.
+    Point d'entrée unique du mode JSON (classify_data, pages Streamlit).
+
+    Args:
+        template_type (str): 'structured' ou 'unstructured'.
+        entity_name (str): Nom de la table ou collection.
+        data: Colonnes {"name", "type"} ou description de la collection.
+        use_cache (bool): Réutilise la réponse JSON en cache.
+        verbose (bool): Affiche le prompt et la réponse.
+        on_column (callable): on_column(ColumnClassification) pour chaque colonne connue
+                              ou reçue dans le flux, avant la validation finale.
+        context (str): Contexte envoyé tel quel (reclassification ciblée) ; les colonnes
+                       sont alors toutes confiées au LLM, sans règles locales ni similarité.
+        prompt (str): Barème, par défaut celui de template_type.
+        model_name (str): Modèle, par défaut MODEL_NAME.
+    Returns:
+        ClassificationResult: Colonnes connues (règles, similarité) incluses dans l'ordre
+                              de la table ; niveau recalculé.
+    """
+    model_name = model_name or MODEL_NAME
+    pre_classified = template_type == "structured" and context is None
+    all_columns = list(data) if template_type == "structured" else []
+    known = []
+    if pre_classified:
+        known_rows, data = known_columns(entity_name, data)
+        known = [ColumnClassification.from_row(row) for row in known_rows]
+        if on_column:
+            for col in known:
+                on_column(col)
+        if known and not data:
+            result = ClassificationResult(entity_name, template_type, known)
+            result.justification = f"Toutes les colonnes ont été classées par règles locales ; niveau maximal {result.level}."
+            return result
+
+    prompt_key = json_prompt(prompt or load_prompt(template_type), template_type)
+    context = context or build_entity_context(template_type, entity_name, data)
+    if verbose:
+        print("\n🔎 Contexte envoyé à Gemini (JSON, barème en préfixe mis en cache) :\n", context)
+
+    # La réponse brute est mise en cache à la fin du flux ; seule une réponse réparée la remplace
+    config = generation_config(template_type)
+    chunks = cached_stream(
+        model_name, prompt_key, context,
+        lambda: _stream(context, config, prompt_key, model_name),
+        entity=entity_name, bypass=not use_cache
+    )
+    raw = stream_classification(chunks, on_column)
+
+    result, repaired = classify_json(
+        lambda text: _generate(text, config, prefix=prompt_key, model_name=model_name), template_type, entity_name,
+        context, expected_columns=data if template_type == "structured" else None, raw=raw
+    )
+    if verbose:
+        print("\n📄 Réponse de Gemini (JSON) :\n", result.to_json())
+
+    # On met en cache la réponse réparée : une relecture ne redéclenche pas la réparation
+    if repaired and (result.columns or result.impacts):
+        put_cached(model_name, prompt_key, context, entity_name, result.to_json())
+    if result.errors:
+        print(f"⚠️ {len(result.errors)} élément(s) toujours invalide(s) pour '{entity_name}' après réparation")
+
+    if pre_classified:
+        learn_similar(entity_name, result.to_markdown())
+        if known:
+            order = {col["name"]: i for i, col in enumerate(all_columns)}
+            result.columns = sorted(known + result.columns, key=lambda col: order.get(col.name, len(order)))
+            names = ", ".join(f"{col.name} ({col.level})" for col in known)
+            result.justification = f"{result.justification} Colonnes classées par règles locales : {names}.".strip()
+    return result
+
+def classify_data(template_type: str, entity_name: str, data: list, use_cache: bool = True, verbose: bool = True) -> tuple:
+    if OUTPUT_FORMAT == "json":
+        try:
+            result = classify_structured(template_type, entity_name, data, use_cache=use_cache, verbose=verbose)
+        except Exception as e:
+            return f"❌ Erreur lors de la génération : {e}", "Erreur"
+        if not result.columns and not result.impacts:
+            return f"❌ Réponse JSON illisible pour '{entity_name}'", "Erreur"
+        return result.to_markdown(), result.label
+
+    # Les colonnes déjà connues (règles, similarité) ne sont pas envoyées au LLM
+    known_rows = []
+    if template_type == "structured":
+        known_rows, data = known_columns(entity_name, data)
+        if known_rows and not data:
+            output = render_output(entity_name, known_rows)
+            return output, extract_level(output)
 
+    system_prompt = load_prompt(template_type)
+    context = build_entity_context(template_type, entity_name, data)
     # Afficher le prompt pour debug
-    print("\n🔎 Prompt envoyé à Gemini :\n", final_prompt)
+    if verbose:
+        print("\n🔎 Contexte envoyé à Gemini (barème en préfixe mis en cache) :\n", context)
 
     # Appel au modèle Gemini
     try:
-        model = genai.GenerativeModel("gemini-1.5-flash")
-        response = model.generate_content(final_prompt)
-        output = response.text
+        output = cached_generate(
+            MODEL_NAME, system_prompt, context,
+            lambda: _generate(context, prefix=system_prompt),
+            entity=entity_name, bypass=not use_cache
+        )
     except Exception as e:
         return f"❌ Erreur lors de la génération : {e}", "Erreur"
 
-    print("\n📄 Réponse de Gemini :\n", output)
+    if verbose:
+        print("\n📄 Réponse de Gemini :\n", output)
+
+    if template_type == "structured":
+        learn_similar(entity_name, output)
+    output = merge_output(output, known_rows)
 
     # Extraction du niveau de classification
-    level_match = re.search(r"Classification finale\s*:\s*([^\(\n]+)\s*\((\d)\)", output)
-    level = level_match.group(1).strip() if level_match else "Non classifié"
+    level = extract_level(output) or "Non classifié"
 
     return output, level
+
+def plan_batches(template_type: str, entities: list, token_budget: int = BATCH_TOKEN_BUDGET) -> list:
+    """
+    Répartit les entités en lots dont le prompt estimé reste sous le budget de tokens.
+
+    Args:
+        template_type (str): 'structured' ou 'unstructured'.
+        entities (list): Liste de tuples (nom, data) comme pour classify_data.
+        token_budget (int): Nombre maximal de tokens estimés par prompt.
+    Returns:
+        list: Liste de lots, chaque lot étant une liste de tuples (nom, data).
+    """
+    base_tokens = estimate_tokens(load_prompt(template_type)) + estimate_tokens(_batch_instructions(1))
+    batches, current, current_tokens = [], [], base_tokens
+
+    for name, data in entities:
+        entity_tokens = estimate_tokens(build_entity_context(template_type, name, data)) + 10
+        # Une entité trop volumineuse part seule dans son lot
+        if current and current_tokens + entity_tokens > token_budget:
+            batches.append(current)
+            current, current_tokens = [], base_tokens
+        current.append((name, data))
+        current_tokens += entity_tokens
+
+    if current:
+        batches.append(current)
+    return batches
+
+def _batch_instructions(count: int) -> str:
+    return (
+        f"⚙️ Tu vas recevoir {count} entités à classifier indépendamment.\n"
+        "Pour CHACUNE, produis la réponse complète au format demandé ci-dessus "
+        "(tableau, Classification finale, Justification finale), "
+        "précédée EXACTEMENT de la ligne de séparation fournie pour cette entité :\n"
+        + ENTITY_MARKER.format(name="<nom>")
+    )
+
+def split_batch_response(output: str) -> dict:
+    """Découpe la réponse d'un appel groupé en {nom_entité: texte}."""
+    sections = {}
+    matches = list(ENTITY_MARKER_RE.finditer(output))
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(output)
+        sections[match.group(1).strip().lower()] = output[match.end():end].strip()
+    return sections
+
+def _classify_single(template_type: str, name: str, data: list, known_rows: list, use_cache: bool) -> tuple:
+    """Classification individuelle des colonnes restantes, fusionnée avec les lignes des règles."""
+    output, level = classify_data(template_type, name, data, use_cache=use_cache)
+    if not known_rows or level == "Erreur":
+        return output, level
+    output = merge_output(output, known_rows)
+    return output, extract_level(output) or level
+
+def classify_batch(template_type: str, entities: list, token_budget: int = BATCH_TOKEN_BUDGET, use_cache: bool = True) -> dict:
+    """
+    Classifie plusieurs tables ou collections en regroupant leurs contextes dans un
+    minimum d'appels Gemini, le barème n'étant envoyé qu'une fois par lot.
+
+    Args:
+        template_type (str): 'structured' ou 'unstructured'.
+        entities (list): Liste de tuples (nom, data) comme pour classify_data.
+        token_budget (int): Nombre maximal de tokens estimés par prompt.
+        use_cache (bool): Réutilise les réponses en cache et n'envoie que les entités manquantes.
+    Returns:
+        dict: {nom: (output, level)}, même forme que le retour de classify_data.
+              Une entité dont la réponse n'a pas pu être extraite est reclassifiée seule.
+    """
+    results = {}
+    system_prompt = load_prompt(template_type)
+    # Un modèle local partage sa fenêtre de contexte entre prompt et réponse
+    token_budget = min(token_budget, prompt_token_budget() or token_budget)
+
+    # Pré-classification locale : seules les colonnes restantes partent au LLM
+    known_rows = {}
+    if template_type == "structured":
+        reduced = []
+        for name, data in entities:
+            known, remaining = known_columns(name, data)
+            if known and not remaining:
+                output = render_output(name, known)
+                results[name] = (output, extract_level(output))
+                continue
+            known_rows[name] = known
+            reduced.append((name, remaining))
+        entities = reduced
+
+    pending = []
+    for name, data in entities:
+        cached = get_cached(MODEL_NAME, system_prompt, build_entity_context(template_type, name, data), name) if use_cache else None
+        if cached and extract_level(cached):
+            cached = merge_output(cached, known_rows.get(name))
+            results[name] = (cached, extract_level(cached))
+        else:
+            pending.append((name, data))
+
+    for batch in plan_batches(template_type, pending, token_budget):
+        if len(batch) == 1:
+            name, data = batch[0]
+            results[name] = _classify_single(template_type, name, data, known_rows.get(name), use_cache)
+            continue
+
+        contexts = "\n\n".join(
+            f"{ENTITY_MARKER.format(name=name)}\n{build_entity_context(template_type, name, data)}"
+            for name, data in batch
+        )
+        batch_prompt = f"{_batch_instructions(len(batch))}\n\n{contexts}"
+        print(
+            f"\n🔎 Prompt groupé envoyé à Gemini ({len(batch)} entités, ~{estimate_tokens(batch_prompt)} tokens "
+            f"+ barème en cache ~{estimate_tokens(system_prompt)} tokens)"
+        )
+
+        try:
+            sections = split_batch_response(_generate(batch_prompt, prefix=system_prompt))
+        except Exception as e:
+            print(f"⚠️ Échec de l'appel groupé, repli entité par entité : {e}")
+            sections = {}
+
+        for name, data in batch:
+            output = sections.get(name.strip().lower())
+            level = extract_level(output) if output else None
+            if level:
+                # Stockée sous la même clé qu'un appel individuel
+                put_cached(MODEL_NAME, system_prompt, build_entity_context(template_type, name, data), name, output)
+                if template_type == "structured":
+                    learn_similar(name, output)
+                output = merge_output(output, known_rows.get(name))
+                results[name] = (output, extract_level(output))
+            else:
+                print(f"⚠️ Réponse illisible pour '{name}', reclassification individuelle.")
+                results[name] = _classify_single(template_type, name, data, known_rows.get(name), use_cache)
+
+    return results
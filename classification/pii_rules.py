@@ -0,0 +1,243 @@
+"""
+Pré-classification déterministe des colonnes dont la sensibilité est évidente.
+
+Les identifiants connus (CIN, téléphone, e-mail, IBAN, numéro de carte…) reçoivent
+localement leurs scores F, C, R, O selon CLASS-DON-01 ; seules les autres colonnes
+sont envoyées au LLM. Une règle se déclenche sur le nom de la colonne et, quand des
+valeurs sont connues, celles-ci doivent confirmer le motif : soit des valeurs d'exemple
+(clé "samples" du dict de colonne), soit des taux de correspondance calculés dans
+PostgreSQL par database.pg_profiler (clé "pii_hits", {règle: taux}, déjà corrigés par le
+validateur de la règle, ex : clé de Luhn des cartes). Certaines règles
+(e-mail, IBAN, carte) reconnaissent aussi une colonne au nom quelconque à partir de
+ses seules valeurs.
+
+Les lignes produites ont le format du tableau renvoyé par le LLM, ce qui permet de les
+fusionner dans sa réponse sans changer le parsing existant.
+
+Variables d'environnement :
+  PII_RULES_ENABLED       0 pour tout envoyer au LLM (défaut 1)
+  PII_MIN_MATCH_RATIO     Part minimale des valeurs qui doivent respecter le motif (défaut 0.8)
+  PII_CONTEXT_MIN_RATIO   Taux à partir duquel un motif détecté est signalé au LLM (défaut 0.05)
+"""
+
+import os
+import re
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PII_RULES_ENABLED = os.getenv("PII_RULES_ENABLED", "1") != "0"
+MIN_MATCH_RATIO = float(os.getenv("PII_MIN_MATCH_RATIO", "0.8"))
+CONTEXT_MIN_RATIO = float(os.getenv("PII_CONTEXT_MIN_RATIO", "0.05"))
+
+LEVEL_LABELS = {1: "Public", 2: "Restreint", 3: "Confidentiel", 4: "Secret", 5: "Très secret"}
+
+
+class PiiRule:
+    """
+    Règle de reconnaissance d'un identifiant sensible.
+
+    Args:
+        name (str): Nom court de la règle.
+        name_pattern (str): Regex appliquée au nom de colonne (en minuscules).
+        value_pattern (str): Regex appliquée aux valeurs normalisées, ou None.
+        scores (tuple): Scores (F, C, R, O) sur 1 à 5.
+        reason (str): Justification lisible reprise dans le tableau.
+        value_only (bool): Reconnaît aussi la colonne sur ses seules valeurs.
+        validator (callable): Contrôle supplémentaire d'une valeur (ex : clé de Luhn).
+    """
+
+    def __init__(self, name: str, name_pattern: str, value_pattern: str, scores: tuple, reason: str,
+                 value_only: bool = False, validator=None):
+        self.name = name
+        self.name_re = re.compile(name_pattern)
+        self.value_re = re.compile(value_pattern) if value_pattern else None
+        self.scores = scores
+        self.reason = reason
+        self.value_only = value_only
+        self.validator = validator
+
+    @property
+    def level(self) -> int:
+        return max(self.scores)
+
+    def matches_value(self, value: str) -> bool:
+        if not self.value_re.fullmatch(value):
+            return False
+        return self.validator(value) if self.validator else True
+
+    def value_ratio(self, values: list) -> float:
+        """Part des valeurs non vides qui respectent le motif (None si aucune valeur)."""
+        values = [normalize_value(v) for v in values if v is not None and str(v).strip()]
+        if not values or not self.value_re:
+            return None
+        return sum(1 for v in values if self.matches_value(v)) / len(values)
+
+
+def luhn_valid(number: str) -> bool:
+    digits = [int(d) for d in number[::-1]]
+    total = sum(digits[0::2]) + sum(sum(divmod(2 * d, 10)) for d in digits[1::2])
+    return total % 10 == 0
+
+
+def normalize_value(value) -> str:
+    """Retire espaces et séparateurs (sauf pour les e-mails) avant le test du motif."""
+    value = str(value).strip()
+    return value if "@" in value else re.sub(r"[\s\-/]", "", value)
+
+
+# Ordre important : la première règle reconnue l'emporte
+RULES = [
+    PiiRule("carte", r"(^|_)(numero_carte|num_carte|card_number|pan)$", r"\d{13,19}", (4, 4, 4, 2),
+            "Numéro de carte bancaire : fraude directe possible et infraction PCI DSS grave", value_only=True, validator=luhn_valid),
+    PiiRule("cvv", r"(^|_)(cvv|cvc|cryptogramme)$", r"\d{3,4}", (4, 4, 4, 2),
+            "Cryptogramme de carte : fraude directe possible, stockage interdit par PCI DSS"),
+    PiiRule("mot_de_passe", r"(^|_)(mot_de_passe|password|passwd|pwd)$", None, (4, 4, 4, 4),
+            "Secret d'authentification : compromission des comptes et blocage grave de l'activité"),
+    PiiRule("iban", r"(^|_)(iban|rib|numero_compte|num_compte)$", r"[a-zA-Z]{2}\d{2}[a-zA-Z0-9]{10,30}|\d{24}", (4, 4, 3, 2),
+            "Identifiant de compte bancaire : dommages financiers graves et infraction loi 09-08 en cas de fuite", value_only=True),
+    PiiRule("cin", r"(^|_)(cin|num_cin|numero_cin|passeport|passport)$", r"[a-zA-Z]{1,2}\d{4,7}", (3, 4, 4, 2),
+            "Pièce d'identité : donnée personnelle identifiante, usurpation d'identité et infraction loi 09-08"),
+    PiiRule("email", r"(^|_)(email|e_mail|mail|courriel)$", r"[\w.+-]+@[\w-]+(\.[\w-]+)+", (1, 3, 2, 1),
+            "Adresse e-mail : donnée personnelle, infraction ponctuelle à la loi 09-08 en cas de fuite", value_only=True),
+    PiiRule("telephone", r"(^|_)(telephone|tel|phone|gsm|mobile)$", r"(\+?212|0)?[5-7]\d{8}", (1, 3, 2, 1),
+            "Numéro de téléphone : donnée personnelle, infraction ponctuelle à la loi 09-08 en cas de fuite"),
+    PiiRule("date_naissance", r"(^|_)(date_naissance|date_de_naissance|birth_date|birthdate|dob)$", r"\d{8}|\d{2}\.\d{2}\.\d{4}", (1, 3, 2, 1),
+            "Date de naissance : donnée personnelle, infraction ponctuelle à la loi 09-08 en cas de fuite"),
+    PiiRule("adresse_ip", r"(^|_)(ip|ip_adresse|adresse_ip|ip_address)$", r"(\d{1,3}\.){3}\d{1,3}", (1, 3, 2, 2),
+            "Adresse IP : donnée de connexion personnelle, contentieux possible au titre de la loi 09-08"),
+    PiiRule("adresse", r"^(adresse|adresse_client|address)$", None, (1, 3, 2, 1),
+            "Adresse postale : donnée personnelle, infraction ponctuelle à la loi 09-08 en cas de fuite"),
+]
+
+
+def _ratio(rule: PiiRule, values: list = None, hit_ratios: dict = None) -> float:
+    if hit_ratios and rule.name in hit_ratios:
+        return hit_ratios[rule.name]
+    return rule.value_ratio(values) if values else None
+
+
+def match_column(name: str, values: list = None, hit_ratios: dict = None) -> PiiRule:
+    """
+    Retourne la règle qui s'applique à la colonne, ou None si elle doit aller au LLM.
+
+    Args:
+        name (str): Nom de la colonne.
+        values (list): Valeurs d'exemple facultatives, utilisées pour confirmer le motif.
+        hit_ratios (dict): Taux de correspondance par règle calculés dans la base, facultatifs.
+    Returns:
+        PiiRule: Règle retenue, ou None.
+    """
+    lowered = name.lower()
+    for rule in RULES:
+        if rule.name_re.search(lowered):
+            ratio = _ratio(rule, values, hit_ratios)
+            # Nom reconnu mais valeurs contradictoires : on laisse le LLM trancher
+            if ratio is None or ratio >= MIN_MATCH_RATIO:
+                return rule
+            return None
+
+    if values or hit_ratios:
+        for rule in RULES:
+            if rule.value_only and (_ratio(rule, values, hit_ratios) or 0) >= MIN_MATCH_RATIO:
+                return rule
+    return None
+
+
+def describe_hits(hit_ratios: dict) -> str:
+    """Résumé des motifs détectés pour le contexte LLM, ex : 'email 92 %, telephone 6 %'."""
+    hits = sorted(((r, n) for n, r in (hit_ratios or {}).items() if r >= CONTEXT_MIN_RATIO), reverse=True)
+    return ", ".join(f"{name} {ratio:.0%}".replace("%", " %") for ratio, name in hits)
+
+
+def describe_column(col: dict) -> str:
+    """Ligne '- nom (type)' du contexte LLM, suivie des motifs détectés dans la base s'il y en a."""
+    hits = describe_hits(col.get("pii_hits"))
+    return f"- {col['name']} ({col['type']})" + (f" — motifs détectés : {hits}" if hits else "")
+
+
+def build_row(column: dict, rule: PiiRule) -> list:
+    """Ligne du tableau au format de la réponse LLM : [colonne, type, sensible, niveau, justification]."""
+    f, c, r, o = rule.scores
+    return [
+        column["name"],
+        column.get("type", ""),
+        "Oui" if rule.level >= 3 else "Non",
+        str(rule.level),
+        f"F:{f}, C:{c}, R:{r}, O:{o} – {rule.reason} (règle locale '{rule.name}')"
+    ]
+
+
+def pre_classify(columns: list) -> tuple:
+    """
+    Sépare les colonnes reconnues par les règles de celles à envoyer au LLM.
+
+    Args:
+        columns (list): Colonnes {"name", "type", "samples" et "pii_hits" facultatifs}.
+    Returns:
+        tuple: (lignes des colonnes reconnues, colonnes restantes pour le LLM)
+    """
+    if not PII_RULES_ENABLED:
+        return [], list(columns)
+
+    known, remaining = [], []
+    for column in columns:
+        rule = match_column(column["name"], column.get("samples"), column.get("pii_hits"))
+        if rule:
+            known.append(build_row(column, rule))
+        else:
+            remaining.append(column)
+    return known, remaining
+
+
+def _row_level(row: list) -> int:
+    return int(row[3])
+
+
+def _format_rows(rows: list) -> list:
+    return ["| " + " | ".join(str(p) for p in row[:5]) + " |" for row in rows]
+
+
+def render_output(entity_name: str, rows: list) -> str:
+    """Réponse complète, au format du LLM, quand toutes les colonnes sont couvertes par les règles."""
+    level = max(_row_level(row) for row in rows)
+    names = ", ".join(f"{row[0]} ({row[3]})" for row in rows)
+    return "\n".join([
+        f"🧾 Table : {entity_name}",
+        "",
+        "| Colonne | Type | Sensible ? | Niveau | Justification |",
+        "|---------|------|-------------|--------|---------------|",
+        *_format_rows(rows),
+        "",
+        f"🔐 Classification finale : {LEVEL_LABELS[level]} ({level - 1})",
+        "",
+        f"📝 Justification finale : Toutes les colonnes ont été classées par règles locales ; niveau maximal {level} atteint par : {names}.",
+    ])
+
+
+def merge_output(output: str, rows: list) -> str:
+    """
+    Insère les lignes issues des règles dans le tableau de la réponse LLM et relève la
+    classification finale si une colonne reconnue est plus sensible.
+    """
+    if not rows:
+        return output
+
+    lines = output.splitlines()
+    separator = next((i for i, line in enumerate(lines) if line.strip().startswith("|") and "---" in line), None)
+    if separator is None:
+        # Pas de tableau exploitable : on en ajoute un à la suite
+        lines += ["", "| Colonne | Type | Sensible ? | Niveau | Justification |",
+                  "|---------|------|-------------|--------|---------------|", *_format_rows(rows)]
+    else:
+        lines[separator + 1:separator + 1] = _format_rows(rows)
+
+    rules_level = max(_row_level(row) for row in rows)
+    names = ", ".join(f"{row[0]} ({row[3]})" for row in rows)
+    for i, line in enumerate(lines):
+        match = re.search(r"Classification finale\s*:\s*([^\(\n]+)\s*\((\d)\)", line)
+        if match and int(match.group(2)) + 1 < rules_level:
+            lines[i] = line[:match.start()] + f"Classification finale : {LEVEL_LABELS[rules_level]} ({rules_level - 1})" + line[match.end():]
+        if "Justification finale" in line:
+            lines[i] = f"{line.rstrip()} Colonnes classées par règles locales : {names}."
+    return "\n".join(lines)
@@ -0,0 +1,87 @@
+"""
+Préfixe statique des prompts CLASS-DON-01.
+
+Le barème représente l'essentiel des tokens de chaque appel. Il est compilé une fois
+par fichier : le marqueur {context} est remplacé par un renvoi vers la fin du message.
+Le texte obtenu forme alors un préfixe identique d'un appel à l'autre, et chaque requête
+n'envoie plus que le contexte de l'entité. Le préfixe est ensuite mis en cache par le
+backend (voir llm_backend.get_model) :
+
+  gemini   CachedContent (cache de contexte côté API), repli sur system_instruction
+  llama    cache KV en mémoire (LlamaRAMCache) : le préfixe n'est évalué qu'une fois
+  fake     préfixe simplement concaténé
+
+Le fichier est relu dès que sa date de modification change.
+"""
+
+import os
+import hashlib
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROMPTS_DIR = os.path.join(PROJECT_ROOT, "prompts")
+
+CONTEXT_PLACEHOLDER = "{context}"
+CONTEXT_REFERENCE = "👉 Le contexte réel est fourni à la fin de ce message."
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+class PromptTemplate:
+    """
+    Prompt lu sur disque et son préfixe statique.
+
+    Args:
+        path (str): Chemin du fichier.
+        mtime (float): Date de modification lue au chargement.
+        text (str): Contenu brut du fichier.
+    """
+
+    def __init__(self, path: str, mtime: float, text: str):
+        self.path = path
+        self.mtime = mtime
+        self.text = text
+        self.prefix = compile_prefix(text)
+        self.key = prefix_key(self.prefix)
+
+
+def compile_prefix(text: str) -> str:
+    """Préfixe réutilisable : le marqueur {context} est remplacé par un renvoi vers la fin du message."""
+    return text.replace(CONTEXT_PLACEHOLDER, CONTEXT_REFERENCE).strip()
+
+
+def prefix_key(prefix: str) -> str:
+    return hashlib.sha256(prefix.encode("utf-8")).hexdigest()[:16]
+
+
+def template_path(template_type: str) -> str:
+    return os.path.join(PROMPTS_DIR, f"prompt_{template_type}.txt")
+
+
+def load_template(path: str) -> PromptTemplate:
+    """Renvoie le prompt compilé, relu uniquement si le fichier a changé."""
+    if not os.path.isabs(path) and not os.path.exists(path):
+        path = os.path.join(PROJECT_ROOT, path)
+    try:
+        mtime = os.stat(path).st_mtime
+    except FileNotFoundError:
+        raise FileNotFoundError(f"❌ Fichier prompt introuvable : {path}")
+
+    with _templates_lock:
+        template = _templates.get(path)
+        if template is None or template.mtime != mtime:
+            with open(path, "r", encoding="utf-8") as f:
+                template = PromptTemplate(path, mtime, f.read())
+            if path in _templates:
+                print(f"🔁 Prompt rechargé : {os.path.basename(path)}")
+            _templates[path] = template
+        return template
+
+
+def load_prompt(template_type: str) -> str:
+    """Préfixe statique du prompt 'structured' ou 'unstructured'."""
+    return load_template(template_path(template_type)).prefix
@@ -0,0 +1,77 @@
+"""
+Limitation de débit des appels LLM : seau à jetons, concurrence maximale
+et reprise avec backoff exponentiel sur les réponses 429.
+"""
+
+import time
+import random
+import threading
+
+class RateLimiter:
+    """
+    Seau à jetons thread-safe combiné à un sémaphore de concurrence.
+
+    Args:
+        rate (float): Nombre de requêtes autorisées par seconde (0 = illimité).
+        burst (int): Taille du seau, c'est-à-dire le nombre d'appels autorisés d'affilée.
+        max_concurrency (int): Nombre maximal d'appels simultanés (0 = illimité).
+    """
+
+    def __init__(self, rate: float = 0, burst: int = 1, max_concurrency: int = 0):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._semaphore = threading.BoundedSemaphore(max_concurrency) if max_concurrency > 0 else None
+
+    def acquire(self) -> None:
+        """Bloque jusqu'à ce qu'un jeton soit disponible."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def __enter__(self):
+        if self._semaphore:
+            self._semaphore.acquire()
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        if self._semaphore:
+            self._semaphore.release()
+        return False
+
+
+def is_rate_limit_error(exc: Exception) -> bool:
+    """Détecte un refus pour quota (HTTP 429 / ResourceExhausted de l'API Gemini)."""
+    if type(exc).__name__ in ("ResourceExhausted", "TooManyRequests"):
+        return True
+    # Pas de recherche de "429" dans le message : un identifiant ou un montant le contiendrait
+    status = getattr(getattr(exc, "response", None), "status_code", None)
+    return 429 in (getattr(exc, "code", None), getattr(exc, "status_code", None), status)
+
+
+def call_with_backoff(fn, max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 60.0):
+    """
+    Appelle fn() et réessaie avec un backoff exponentiel (avec gigue) tant que
+    l'erreur est un dépassement de quota. Les autres erreurs sont propagées.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return fn()
+        except Exception as exc:
+            if attempt == max_retries or not is_rate_limit_error(exc):
+                raise
+            delay = min(max_delay, base_delay * (2 ** attempt)) * (0.5 + random.random() / 2)
+            print(f"⏳ Quota LLM atteint (429), nouvel essai dans {delay:.1f}s ({attempt + 1}/{max_retries})")
+            time.sleep(delay)
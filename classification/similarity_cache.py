@@ -0,0 +1,275 @@
+"""
+Cache par similarité des classifications de colonnes.
+
+Chaque colonne classée par le LLM est encodée (nom, type, table) avec
+sentence-transformers et rangée dans un index faiss avec ses scores F, C, R, O et sa
+justification. Une nouvelle colonne suffisamment proche d'une colonne connue
+(ex : id_client / client_id / num_client) reprend sa classification sans appel LLM.
+
+L'index est persisté dans .cache/similarity et mis à jour à chaque nouvelle
+classification. Le cache est à activer explicitement : le premier chargement du modèle
+le télécharge, ce qui échoue sur un hôte isolé du réseau (SIMILARITY_MODEL peut désigner
+un dossier local). Sans faiss ou sentence-transformers, ou si le modèle ne peut pas être
+chargé, le cache est désactivé pour le reste du processus.
+
+Variables d'environnement :
+  SIMILARITY_CACHE_ENABLED    1 pour activer (défaut 0)
+  SIMILARITY_THRESHOLD        Similarité cosinus minimale pour reprendre une classification (défaut 0.92)
+  SIMILARITY_MODEL            Modèle sentence-transformers, nom ou dossier local (défaut paraphrase-multilingual-MiniLM-L12-v2)
+  SIMILARITY_CACHE_DIR        Dossier de l'index (défaut .cache/similarity)
+
+Usage CLI :
+  python -m classification.similarity_cache --stats
+  python -m classification.similarity_cache --clear
+"""
+
+import os
+import re
+import json
+import argparse
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SIMILARITY_ENABLED = os.getenv("SIMILARITY_CACHE_ENABLED", "0") == "1"
+SIMILARITY_THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", "0.92"))
+SIMILARITY_MODEL = os.getenv("SIMILARITY_MODEL", "paraphrase-multilingual-MiniLM-L12-v2")
+SIMILARITY_DIR = os.getenv("SIMILARITY_CACHE_DIR", os.path.join(PROJECT_ROOT, ".cache", "similarity"))
+
+FCRO_RE = re.compile(r"F\s*:\s*(\d).*?C\s*:\s*(\d).*?R\s*:\s*(\d).*?O\s*:\s*(\d)")
+
+
+def column_text(table_name: str, name: str, col_type: str) -> str:
+    """Texte encodé pour une colonne : le nom découpé, son type et sa table."""
+    words = re.sub(r"[_\-.]+", " ", name).strip()
+    return f"{words} ({col_type}) — table {table_name}"
+
+
+def parse_rows(output: str) -> list:
+    """Lignes [colonne, type, sensible, niveau, justification] du tableau d'une réponse LLM."""
+    rows = []
+    for line in output.splitlines():
+        if "|" not in line or "---" in line or any(kw in line for kw in ["Colonne", "Sensible"]):
+            continue
+        parts = [p.strip() for p in line.strip().strip("|").split("|")]
+        if len(parts) >= 5 and parts[0]:
+            rows.append(parts[:5])
+    return rows
+
+
+class ColumnIndex:
+    """
+    Index faiss (produit scalaire sur vecteurs normalisés = cosinus) des colonnes classées.
+
+    Args:
+        path (str): Dossier de persistance (index.faiss + entries.json).
+        model_name (str): Modèle sentence-transformers.
+        threshold (float): Similarité minimale pour reprendre une classification.
+    """
+
+    def __init__(self, path: str = SIMILARITY_DIR, model_name: str = SIMILARITY_MODEL, threshold: float = SIMILARITY_THRESHOLD):
+        import faiss
+        from sentence_transformers import SentenceTransformer
+
+        self.faiss = faiss
+        self.path = path
+        self.threshold = threshold
+        self.model = SentenceTransformer(model_name)
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self._lock = threading.Lock()
+        self._load()
+
+    # ➤ Persistance
+    def _load(self):
+        try:
+            with open(os.path.join(self.path, "entries.json"), "r", encoding="utf-8") as f:
+                self.entries = {int(k): v for k, v in json.load(f).items()}
+        except (FileNotFoundError, ValueError):
+            self.entries = {}
+
+        index_path = os.path.join(self.path, "index.faiss")
+        if os.path.exists(index_path):
+            self.index = self.faiss.read_index(index_path)
+            if self.index.ntotal == len(self.entries) and self.index.d == self.dim:
+                return
+
+        # Index absent ou désynchronisé (autre modèle…) : reconstruit depuis les entrées
+        self.index = self.faiss.IndexIDMap2(self.faiss.IndexFlatIP(self.dim))
+        if self.entries:
+            ids = list(self.entries)
+            texts = [column_text(e["table"], e["name"], e["type"]) for e in self.entries.values()]
+            self.index.add_with_ids(self._encode(texts), self._ids(ids))
+
+    def save(self):
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            tmp = os.path.join(self.path, "index.faiss.tmp")
+            self.faiss.write_index(self.index, tmp)
+            os.replace(tmp, os.path.join(self.path, "index.faiss"))
+            tmp = os.path.join(self.path, "entries.json.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, ensure_ascii=False)
+            os.replace(tmp, os.path.join(self.path, "entries.json"))
+
+    def _encode(self, texts: list):
+        return self.model.encode(texts, normalize_embeddings=True, convert_to_numpy=True).astype("float32")
+
+    def _ids(self, ids: list):
+        import numpy as np
+        return np.asarray(ids, dtype="int64")
+
+    # ➤ Recherche & mise à jour
+    def lookup(self, table_name: str, columns: list) -> dict:
+        """
+        Cherche, pour chaque colonne, la colonne classée la plus proche au-dessus du seuil.
+
+        Args:
+            table_name (str): Table des colonnes recherchées.
+            columns (list): Colonnes {"name", "type"}.
+        Returns:
+            dict: {nom de colonne: (entrée stockée, similarité)}
+        """
+        if not columns or not self.index.ntotal:
+            return {}
+        vectors = self._encode([column_text(table_name, col["name"], col["type"]) for col in columns])
+        with self._lock:
+            scores, ids = self.index.search(vectors, 1)
+
+        matches = {}
+        for col, score, entry_id in zip(columns, scores[:, 0], ids[:, 0]):
+            entry = self.entries.get(int(entry_id))
+            # Une colonne ne se reprend pas elle-même : sa classification LLM fait foi
+            if entry and score >= self.threshold and (entry["table"], entry["name"]) != (table_name, col["name"]):
+                matches[col["name"]] = (entry, float(score))
+        return matches
+
+    def add(self, table_name: str, rows: list) -> int:
+        """Ajoute (ou remplace) les colonnes classées d'une table ; renvoie le nombre d'entrées écrites."""
+        new = []
+        for row in rows:
+            scores = FCRO_RE.search(row[4].replace("(", "").replace(")", ""))
+            if not scores:
+                continue
+            new.append({
+                "table": table_name,
+                "name": row[0],
+                "type": row[1],
+                "sensitive": row[2],
+                "scores": [int(s) for s in scores.groups()],
+                "justification": row[4]
+            })
+        # Réponse déjà indexée à l'identique (ex : relue depuis le cache LLM) : rien à écrire
+        with self._lock:
+            known = {(e["table"], e["name"]): e for e in self.entries.values()}
+        new = [e for e in new if known.get((e["table"], e["name"])) != e]
+        if not new:
+            return 0
+
+        vectors = self._encode([column_text(e["table"], e["name"], e["type"]) for e in new])
+        with self._lock:
+            existing = {(e["table"], e["name"]): i for i, e in self.entries.items()}
+            replaced = [existing[(e["table"], e["name"])] for e in new if (e["table"], e["name"]) in existing]
+            if replaced:
+                self.index.remove_ids(self._ids(replaced))
+                for i in replaced:
+                    del self.entries[i]
+            start = max(self.entries, default=-1) + 1
+            ids = list(range(start, start + len(new)))
+            self.index.add_with_ids(vectors, self._ids(ids))
+            self.entries.update(zip(ids, new))
+        return len(new)
+
+    def clear(self):
+        with self._lock:
+            self.index.reset()
+            self.entries = {}
+
+
+def inherited_row(column: dict, entry: dict, similarity: float) -> list:
+    """Ligne du tableau reprise d'une colonne similaire, au format de la réponse LLM."""
+    f, c, r, o = entry["scores"]
+    level = max(entry["scores"])
+    reason = FCRO_RE.sub("", entry["justification"], count=1).strip(" ,–-") or "classification reprise"
+    return [
+        column["name"],
+        column.get("type", entry["type"]),
+        "Oui" if level >= 3 else "Non",
+        str(level),
+        f"F:{f}, C:{c}, R:{r}, O:{o} – {reason} (reprise de {entry['table']}.{entry['name']}, similarité {similarity:.2f})"
+    ]
+
+
+_index = None
+_index_lock = threading.Lock()
+_unavailable = False
+
+
+def get_column_index() -> ColumnIndex:
+    """Index partagé du processus, ou None si le cache est désactivé ou ses dépendances absentes."""
+    global _index, _unavailable
+    if not SIMILARITY_ENABLED or _unavailable:
+        return None
+    with _index_lock:
+        if _index is None:
+            try:
+                _index = ColumnIndex()
+            except ImportError as e:
+                print(f"⚠️ Cache par similarité désactivé (dépendance manquante : {e.name})")
+                _unavailable = True
+                return None
+            except Exception as e:
+                # Téléchargement impossible (hôte isolé), modèle ou index illisible…
+                print(f"⚠️ Cache par similarité désactivé (chargement impossible : {e})")
+                _unavailable = True
+                return None
+        return _index
+
+
+def reuse_similar(table_name: str, columns: list) -> tuple:
+    """
+    Reprend la classification des colonnes proches d'une colonne déjà classée.
+
+    Returns:
+        tuple: (lignes reprises, colonnes restantes pour le LLM)
+    """
+    index = get_column_index()
+    if index is None or not columns:
+        return [], list(columns)
+
+    matches = index.lookup(table_name, columns)
+    rows = [inherited_row(col, *matches[col["name"]]) for col in columns if col["name"] in matches]
+    remaining = [col for col in columns if col["name"] not in matches]
+    return rows, remaining
+
+
+def learn(table_name: str, output: str, exclude: list = None) -> int:
+    """Indexe les colonnes classées par le LLM dans output (hors lignes déjà connues) et persiste l'index."""
+    index = get_column_index()
+    if index is None:
+        return 0
+    excluded = {row[0] for row in exclude or []}
+    added = index.add(table_name, [row for row in parse_rows(output) if row[0] not in excluded])
+    if added:
+        index.save()
+    return added
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gestion du cache de classifications par similarité")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--stats", action="store_true", help="Afficher le nombre de colonnes indexées")
+    group.add_argument("--clear", action="store_true", help="Vider l'index")
+    args = parser.parse_args()
+
+    index = get_column_index()
+    if index is None:
+        print("Cache par similarité indisponible.")
+    elif args.clear:
+        index.clear()
+        index.save()
+        print("🧹 Index vidé.")
+    else:
+        tables = {e["table"] for e in index.entries.values()}
+        print(f"📚 {len(index.entries)} colonne(s) indexée(s) sur {len(tables)} table(s), seuil {index.threshold}")
@@ -0,0 +1,443 @@
+"""
+Mode de sortie JSON contraint par schéma pour les classifications LLM.
+
+Au lieu d'extraire le tableau markdown par expressions régulières, le modèle reçoit
+un schéma JSON (scores F, C, R, O et justification par colonne) et sa réponse est
+lue en une seule passe dans un ClassificationResult typé. Seuls les champs invalides
+ou les colonnes manquantes font l'objet d'un appel de réparation ciblé ; la réponse
+n'est jamais régénérée en entier. Le niveau final est recalculé (MAX des scores)
+plutôt que repris du modèle.
+
+Le résultat sait se rendre au format markdown habituel (to_markdown), ce qui laisse
+inchangés l'enregistrement dans Atlas et l'affichage.
+
+Variables d'environnement :
+  LLM_OUTPUT_FORMAT    json (défaut) ou markdown pour revenir à l'ancien format
+"""
+
+import os
+import re
+import json
+from dataclasses import dataclass, field
+from dotenv import load_dotenv
+
+load_dotenv()
+
+OUTPUT_FORMAT = os.getenv("LLM_OUTPUT_FORMAT", "json").lower()
+
+LEVEL_LABELS = {1: "Public", 2: "Restreint", 3: "Confidentiel", 4: "Secret", 5: "Très secret"}
+IMPACTS = ("F", "C", "R", "O")
+FCRO_RE = re.compile(r"F\s*:\s*(\d).*?C\s*:\s*(\d).*?R\s*:\s*(\d).*?O\s*:\s*(\d)")
+
+# Schéma limité au sous-ensemble commun à Gemini (response_schema) et llama.cpp (grammaire JSON) ;
+# la plage 1-5 des scores est vérifiée à la lecture
+_SCORE = {"type": "integer"}
+
+STRUCTURED_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "table": {"type": "string"},
+        "columns": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string"},
+                    "type": {"type": "string"},
+                    "F": _SCORE, "C": _SCORE, "R": _SCORE, "O": _SCORE,
+                    "justification": {"type": "string"}
+                },
+                "required": ["name", "type", "F", "C", "R", "O", "justification"]
+            }
+        },
+        "justification_finale": {"type": "string"}
+    },
+    "required": ["table", "columns", "justification_finale"]
+}
+
+_IMPACT = {
+    "type": "object",
+    "properties": {"score": _SCORE, "justification": {"type": "string"}},
+    "required": ["score", "justification"]
+}
+
+UNSTRUCTURED_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "collection": {"type": "string"},
+        "F": _IMPACT, "C": _IMPACT, "R": _IMPACT, "O": _IMPACT,
+        "justification_finale": {"type": "string"}
+    },
+    "required": ["collection", "F", "C", "R", "O", "justification_finale"]
+}
+
+JSON_INSTRUCTIONS = {
+    "structured": (
+        "⚠️ Format de sortie : ignore le format tableau décrit plus haut. Réponds UNIQUEMENT par un objet JSON, "
+        "sans markdown, de la forme :\n"
+        '{"table": "<nom>", "columns": [{"name": "<colonne>", "type": "<type>", "F": 1, "C": 1, "R": 1, "O": 1, '
+        '"justification": "<explication claire réutilisant le vocabulaire du barème>"}], '
+        '"justification_finale": "<résumé>"}\n'
+        "Chaque score est un entier de 1 à 5. Toutes les colonnes fournies doivent figurer dans 'columns'."
+    ),
+    "unstructured": (
+        "⚠️ Format de sortie : ignore le format décrit plus haut. Réponds UNIQUEMENT par un objet JSON, "
+        "sans markdown, de la forme :\n"
+        '{"collection": "<nom>", "F": {"score": 1, "justification": "..."}, "C": {...}, "R": {...}, "O": {...}, '
+        '"justification_finale": "<résumé>"}\n'
+        "Chaque score est un entier de 1 à 5."
+    ),
+}
+
+
+def schema_for(template_type: str) -> dict:
+    return STRUCTURED_SCHEMA if template_type == "structured" else UNSTRUCTURED_SCHEMA
+
+
+def generation_config(template_type: str) -> dict:
+    """Paramètres de génération JSON (format google-generativeai, compris par tous les backends)."""
+    return {"response_mime_type": "application/json", "response_schema": schema_for(template_type)}
+
+
+def json_prompt(system_prompt: str, template_type: str) -> str:
+    """Préfixe complété des consignes de sortie JSON (clé de cache distincte du mode markdown)."""
+    return f"{system_prompt}\n\n{JSON_INSTRUCTIONS[template_type]}"
+
+
+@dataclass
+class ColumnClassification:
+    name: str
+    type: str
+    f: int
+    c: int
+    r: int
+    o: int
+    justification: str
+
+    @property
+    def level(self) -> int:
+        return max(self.f, self.c, self.r, self.o)
+
+    @property
+    def sensitive(self) -> bool:
+        return self.level >= 3
+
+    def scores_text(self) -> str:
+        return f"F:{self.f}, C:{self.c}, R:{self.r}, O:{self.o}"
+
+    def to_row(self) -> list:
+        """Ligne au format des pages Streamlit : [colonne, type, sensible, niveau, justification, MAX_FCRO]."""
+        return [
+            self.name, self.type, "Oui" if self.sensitive else "Non", str(self.level),
+            f"{self.scores_text()} – {self.justification}", self.level
+        ]
+
+    @classmethod
+    def from_row(cls, row: list):
+        """Colonne issue d'une ligne markdown déjà fiable (règles locales, similarité)."""
+        scores = FCRO_RE.search(row[4])
+        f, c, r, o = (int(s) for s in scores.groups()) if scores else (int(row[3]),) * 4
+        reason = FCRO_RE.sub("", row[4], count=1).strip(" ,–-") if scores else row[4]
+        return cls(row[0], row[1], f, c, r, o, reason)
+
+
+@dataclass
+class ClassificationResult:
+    entity: str
+    kind: str
+    columns: list = field(default_factory=list)
+    impacts: dict = field(default_factory=dict)
+    justification: str = ""
+    errors: list = field(default_factory=list)
+
+    @property
+    def level(self) -> int:
+        """MAX(F, C, R, O) de 1 à 5, sur toutes les colonnes ou sur les impacts de la collection."""
+        levels = [col.level for col in self.columns] + [score for score, _ in self.impacts.values()]
+        return max(levels, default=1)
+
+    @property
+    def label(self) -> str:
+        return LEVEL_LABELS[self.level]
+
+    @property
+    def classification(self) -> str:
+        """Libellé au format 'Secret (3)', comme la ligne 'Classification finale'."""
+        return f"{self.label} ({self.level - 1})"
+
+    def to_rows(self) -> list:
+        return [col.to_row() for col in self.columns]
+
+    def to_json(self) -> str:
+        if self.kind == "structured":
+            data = {
+                "table": self.entity,
+                "columns": [
+                    {"name": c.name, "type": c.type, "F": c.f, "C": c.c, "R": c.r, "O": c.o, "justification": c.justification}
+                    for c in self.columns
+                ],
+                "justification_finale": self.justification
+            }
+        else:
+            data = {"collection": self.entity, "justification_finale": self.justification}
+            data.update({k: {"score": s, "justification": j} for k, (s, j) in self.impacts.items()})
+        return json.dumps(data, ensure_ascii=False)
+
+    def to_markdown(self) -> str:
+        """Rendu identique à la réponse markdown attendue jusqu'ici du LLM."""
+        if self.kind == "structured":
+            lines = [
+                f"🧾 Table : {self.entity}",
+                "",
+                "| Colonne | Type | Sensible ? | Niveau | Justification |",
+                "|---------|------|-------------|--------|---------------|",
+            ]
+            lines += [f"| {' | '.join(row[:5])} |" for row in self.to_rows()]
+        else:
+            lines = [f"🧾 Collection : {self.entity}", "", "📊 Impacts :"]
+            lines += [f"- {k} = {s} – {j}" for k, (s, j) in self.impacts.items()]
+        lines += [
+            "",
+            f"🔐 Classification finale : {self.classification}",
+            "",
+            f"📝 Justification finale : {self.justification}",
+        ]
+        return "\n".join(lines)
+
+
+def _load_json(text: str):
+    """json.loads tolérant aux blocs ```json et au texte autour de l'objet."""
+    text = text.strip()
+    if text.startswith("```"):
+        text = re.sub(r"^```(?:json)?\s*|\s*```$", "", text)
+    try:
+        return json.loads(text)
+    except ValueError:
+        start, end = text.find("{"), text.rfind("}")
+        if start == -1 or end <= start:
+            raise
+        return json.loads(text[start:end + 1])
+
+
+def _score(value):
+    try:
+        score = int(value)
+    except (TypeError, ValueError):
+        return None
+    return score if 1 <= score <= 5 else None
+
+
+def _parse_column(data: dict) -> tuple:
+    """(ColumnClassification ou None, champs invalides)"""
+    bad = [] if str(data.get("name") or "").strip() else ["name"]
+    bad += [k for k in IMPACTS if _score(data.get(k)) is None]
+    if not isinstance(data.get("justification"), str) or not data["justification"].strip():
+        bad.append("justification")
+    if bad:
+        return None, bad
+    return ColumnClassification(
+        str(data["name"]), str(data.get("type", "")),
+        *(_score(data[k]) for k in IMPACTS), data["justification"].strip()
+    ), []
+
+
+def parse_response(text: str, template_type: str, entity: str, expected_columns: list = None) -> tuple:
+    """
+    Lit la réponse JSON en une passe.
+
+    Args:
+        text (str): Réponse brute du modèle.
+        template_type (str): 'structured' ou 'unstructured'.
+        entity (str): Nom de la table ou collection.
+        expected_columns (list): Colonnes {"name", "type"} envoyées, pour détecter les oublis.
+    Returns:
+        tuple: (ClassificationResult, problèmes) où chaque problème est un dict
+               {"column": nom ou None, "fields": [...], "reason": str}.
+               Le JSON illisible donne un résultat vide et un problème global.
+    """
+    result = ClassificationResult(entity, template_type)
+    try:
+        data = _load_json(text)
+    except ValueError as e:
+        return result, [{"column": None, "fields": ["*"], "reason": f"JSON invalide : {e}"}]
+    if not isinstance(data, dict):
+        return result, [{"column": None, "fields": ["*"], "reason": "objet JSON attendu"}]
+
+    problems = []
+    result.justification = str(data.get("justification_finale") or "").strip()
+
+    if template_type == "structured":
+        seen = set()
+        for item in data.get("columns") or []:
+            if not isinstance(item, dict) or not item.get("name"):
+                continue
+            column, bad = _parse_column(item)
+            seen.add(str(item["name"]))
+            if column:
+                result.columns.append(column)
+            else:
+                problems.append({"column": str(item["name"]), "type": item.get("type", ""), "fields": bad, "reason": "champs invalides"})
+        for col in expected_columns or []:
+            if col["name"] not in seen:
+                problems.append({"column": col["name"], "type": col["type"], "fields": ["*"], "reason": "colonne absente"})
+    else:
+        for key in IMPACTS:
+            impact = data.get(key) if isinstance(data.get(key), dict) else {}
+            score = _score(impact.get("score"))
+            if score is None or not str(impact.get("justification") or "").strip():
+                problems.append({"column": None, "fields": [key], "reason": "impact invalide"})
+            else:
+                result.impacts[key] = (score, str(impact["justification"]).strip())
+
+    if not result.justification:
+        problems.append({"column": None, "fields": ["justification_finale"], "reason": "justification manquante"})
+    return result, problems
+
+
+def repair_request(template_type: str, entity: str, problems: list, raw: str) -> str:
+    """Demande de réparation limitée aux champs en défaut, envoyée après le préfixe (barème + consignes JSON)."""
+    if any(p["fields"] == ["*"] and p["column"] is None for p in problems):
+        # JSON illisible : on demande une remise en forme, pas une nouvelle classification
+        return (
+            f"La réponse suivante n'est pas un JSON valide. Réécris-la au format JSON demandé, "
+            f"sans changer les scores ni les justifications :\n{raw[:8000]}"
+        )
+
+    header = "📊 Table" if template_type == "structured" else "📚 Collection"
+    lines = [f"{header} : {entity}", "", "Corrige UNIQUEMENT les éléments suivants :"]
+    for p in problems:
+        if p["column"]:
+            lines.append(f"- {p['column']} ({p.get('type', '')}) — {p['reason']} : {', '.join(p['fields'])}")
+        else:
+            lines.append(f"- {', '.join(p['fields'])} — {p['reason']}")
+    return (
+        "\n".join(lines) +
+        "\n\nRenvoie le même format JSON en ne gardant que les colonnes et champs listés."
+    )
+
+
+def apply_repair(result: ClassificationResult, problems: list, text: str) -> list:
+    """Complète result avec la réponse de réparation ; renvoie les problèmes restants."""
+    patch, patch_problems = parse_response(text, result.kind, result.entity)
+    if any(p["fields"] == ["*"] and p["column"] is None for p in patch_problems):
+        return problems
+
+    remaining = []
+    if result.kind == "structured":
+        fixed = {col.name: col for col in patch.columns}
+        for p in problems:
+            if p["column"] in fixed:
+                result.columns.append(fixed[p["column"]])
+            elif p["column"] is None and "justification_finale" in p["fields"] and patch.justification:
+                result.justification = patch.justification
+            elif p["column"] is None and p["fields"] == ["*"] and patch.columns:
+                result.columns = patch.columns
+                result.justification = result.justification or patch.justification
+            else:
+                remaining.append(p)
+    else:
+        for p in problems:
+            key = p["fields"][0]
+            if key in patch.impacts:
+                result.impacts[key] = patch.impacts[key]
+            elif key == "justification_finale" and patch.justification:
+                result.justification = patch.justification
+            else:
+                remaining.append(p)
+        # Ordre F, C, R, O pour le rendu
+        result.impacts = {k: result.impacts[k] for k in IMPACTS if k in result.impacts}
+    return remaining
+
+
+def classify_json(generate, template_type: str, entity: str, context: str,
+                  expected_columns: list = None, max_repairs: int = 1, raw: str = None) -> tuple:
+    """
+    Classification en mode JSON : une génération, une lecture, puis au plus max_repairs
+    appels de réparation limités aux champs invalides.
+
+    Args:
+        generate (callable): generate(texte) → réponse, pour un modèle dont le préfixe est
+                             json_prompt(barème) et avec la configuration JSON.
+        template_type (str): 'structured' ou 'unstructured'.
+        entity (str): Nom de la table ou collection.
+        context (str): Contexte de l'entité.
+        expected_columns (list): Colonnes envoyées (mode structured).
+        max_repairs (int): Nombre maximal d'appels de réparation.
+        raw (str): Réponse déjà obtenue (cache, flux), pour ne pas rappeler le modèle.
+    Returns:
+        tuple: (ClassificationResult, réparé : bool). Les problèmes non résolus sont dans result.errors.
+    """
+    if raw is None:
+        raw = generate(context)
+    result, problems = parse_response(raw, template_type, entity, expected_columns)
+
+    repaired = False
+    for _ in range(max_repairs):
+        if not problems:
+            break
+        print(f"🩹 Réparation ciblée pour '{entity}' : {len(problems)} élément(s) invalide(s)")
+        problems = apply_repair(result, problems, generate(repair_request(template_type, entity, problems, raw)))
+        repaired = True
+
+    if expected_columns:
+        order = {col["name"]: i for i, col in enumerate(expected_columns)}
+        result.columns.sort(key=lambda col: order.get(col.name, len(order)))
+    result.errors = problems
+    return result, repaired
+
+
+def iter_streamed_columns(chunks):
+    """
+    Lit un flux JSON {"columns": [{...}, ...]} fragment par fragment.
+
+    Renvoie des couples (objet colonne, None) dès qu'une colonne est complète, sans attendre
+    la fin de la réponse, et (None, fragment) pour chaque fragment lu.
+    """
+    depth, start, in_string, escaped = 0, None, False, False
+    buffer = ""
+    for chunk in chunks:
+        offset = len(buffer)
+        buffer += chunk
+        for i in range(offset, len(buffer)):
+            ch = buffer[i]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == "\\":
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+                continue
+            if ch == '"':
+                in_string = True
+            elif ch in "{[":
+                depth += 1
+                # Profondeur 3 : objet racine → tableau columns → objet colonne
+                if ch == "{" and depth == 3:
+                    start = i
+            elif ch in "}]":
+                if ch == "}" and depth == 3 and start is not None:
+                    try:
+                        yield json.loads(buffer[start:i + 1]), None
+                    except ValueError:
+                        pass
+                    start = None
+                depth -= 1
+        yield None, chunk
+
+
+def stream_classification(chunks, on_column=None) -> str:
+    """
+    Consomme un flux JSON structuré, appelle on_column(ColumnClassification) pour chaque colonne
+    valide reçue, et renvoie le texte complet pour la lecture finale (parse_response).
+    """
+    parts = []
+    for column, chunk in iter_streamed_columns(chunks):
+        if chunk is not None:
+            parts.append(chunk)
+        elif on_column:
+            parsed, _ = _parse_column(column)
+            if parsed:
+                on_column(parsed)
+    return "".join(parts)
+
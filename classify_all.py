@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Classifier en parallèle toutes les tables PostgreSQL et collections MongoDB,
+avec limitation de débit des appels Gemini et reprise sur les erreurs 429.
+
+Par défaut l'exécution est incrémentale : une entité dont l'empreinte de schéma
+n'a pas changé depuis sa dernière classification réussie est ignorée.
+
+Exemples :
+  python classify_all.py --workers 8 --rpm 60
+  python classify_all.py --only tables --push-atlas
+  python classify_all.py --full
+  python classify_all.py --only tables --profile
+"""
+
+import time
+import argparse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from database.postgres_utils import get_all_tables, get_table_info
+from database.pg_profiler import profile_table, annotate_columns
+from database.mongo_utils import get_all_collections, get_collection_info, get_collection_fields
+from classification import llm_classifier
+from classification.llm_backend import format_latency_summary
+from classification.fingerprints import FingerprintStore, table_fingerprint, collection_fingerprint
+from services import startup_report
+
+
+def classify_entity(kind: str, name: str, use_cache: bool = True, store: FingerprintStore = None, incremental: bool = True,
+                    profile: bool = False) -> dict:
+    """
+    Classifie une table ('postgres') ou une collection ('mongo').
+    Si un registre d'empreintes est fourni, l'empreinte est enregistrée après succès et, en mode
+    incrémental, une entité dont le schéma n'a pas changé est ignorée.
+    Avec profile=True, les taux de motifs PII des colonnes sont calculés dans PostgreSQL
+    et ajoutés au contexte de classification.
+    """
+    started = time.perf_counter()
+    key = f"{kind}:{name}"
+    if kind == "postgres":
+        columns = get_table_info(name)
+        fingerprint = table_fingerprint(columns)
+    else:
+        fingerprint = collection_fingerprint(get_collection_fields(name))
+
+    if incremental and store is not None and store.matches(key, fingerprint):
+        return {
+            "kind": kind,
+            "name": name,
+            "level": store.get(key).get("level", "Non classifié"),
+            "skipped": True,
+            "duration": time.perf_counter() - started
+        }
+
+    if kind == "postgres":
+        if profile:
+            columns = annotate_columns(columns, profile_table(name))
+        output, level = llm_classifier.classify_data("structured", name, columns, use_cache=use_cache, verbose=False)
+    else:
+        output, level = llm_classifier.classify_data("unstructured", name, get_collection_info(name), use_cache=use_cache, verbose=False)
+
+    result = {
+        "kind": kind,
+        "name": name,
+        "level": level,
+        "output": output,
+        "duration": time.perf_counter() - started
+    }
+    if level == "Erreur":
+        result["error"] = output
+    elif store is not None and level != "Non classifié":
+        store.record(key, fingerprint, level)
+    return result
+
+
+def run(entities: list, workers: int = 4, use_cache: bool = True, store: FingerprintStore = None, incremental: bool = True,
+        profile: bool = False):
+    """
+    Classifie les entités en parallèle et renvoie les résultats au fil de l'eau.
+
+    Args:
+        entities (list): Liste de tuples (kind, name) avec kind = 'postgres' ou 'mongo'.
+        workers (int): Nombre de threads de travail.
+        use_cache (bool): Réutilise les réponses LLM déjà en cache.
+        store (FingerprintStore): Registre des empreintes de schéma (None = pas de suivi).
+        incremental (bool): Ignore les entités dont l'empreinte n'a pas changé.
+        profile (bool): Profile les valeurs des tables dans PostgreSQL avant classification.
+    Yields:
+        dict: Résultat de classify_entity, ou un dict avec la clé 'error'.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(classify_entity, kind, name, use_cache, store, incremental, profile): (kind, name)
+            for kind, name in entities
+        }
+        for future in as_completed(futures):
+            kind, name = futures[future]
+            try:
+                yield future.result()
+            except Exception as exc:
+                yield {"kind": kind, "name": name, "level": "Erreur", "error": str(exc), "duration": 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classification parallèle de toutes les sources de données")
+    parser.add_argument("--workers", type=int, default=4, help="Nombre de classifications simultanées")
+    parser.add_argument("--rpm", type=float, default=60, help="Requêtes Gemini max par minute (0 = illimité)")
+    parser.add_argument("--burst", type=int, default=5, help="Nombre de requêtes Gemini autorisées en rafale")
+    parser.add_argument("--llm-concurrency", type=int, default=0, help="Appels Gemini simultanés max (0 = --workers)")
+    parser.add_argument("--only", choices=["tables", "collections"], help="Limiter à un seul type de source")
+    parser.add_argument("--no-cache", action="store_true", help="Ignorer le cache des réponses LLM")
+    parser.add_argument("--push-atlas", action="store_true", help="Enregistrer les classifications dans Apache Atlas")
+    parser.add_argument("--full", action="store_true", help="Reclassifier toutes les entités, même inchangées")
+    parser.add_argument("--profile", action="store_true", help="Mesurer les motifs PII des colonnes dans PostgreSQL (TABLESAMPLE)")
+    args = parser.parse_args()
+
+    llm_classifier.configure_rate_limit(args.rpm, burst=args.burst, max_concurrency=args.llm_concurrency or args.workers)
+    startup_report("classify_all.py")
+
+    entities = []
+    if args.only != "collections":
+        entities += [("postgres", t) for t in get_all_tables()]
+    if args.only != "tables":
+        entities += [("mongo", c) for c in get_all_collections()]
+
+    if not entities:
+        print("⚠️  Aucune table ni collection à classifier.")
+        return
+
+    print(f"🚀  {len(entities)} entité(s) à classifier avec {args.workers} worker(s), {args.rpm:g} req/min…\n")
+
+    store = FingerprintStore()
+    started = time.perf_counter()
+    levels = Counter()
+    errors = hits = 0
+    to_push = []
+    try:
+        for done, result in enumerate(run(entities, args.workers, not args.no_cache, store, not args.full, args.profile), start=1):
+            levels[result["level"]] += 1
+            if "error" in result:
+                errors += 1
+                print(f"[{done}/{len(entities)}] ❌  {result['name']} : {result['error']}")
+            elif result.get("skipped"):
+                hits += 1
+                print(f"[{done}/{len(entities)}] ⏭️  {result['name']} inchangée → {result['level']}")
+            else:
+                print(f"[{done}/{len(entities)}] ✅  {result['name']} → {result['level']} ({result['duration']:.1f}s)")
+                if result["level"] != "Non classifié":
+                    to_push.append({
+                        "name": result["name"],
+                        "type_name": "postgres_table" if result["kind"] == "postgres" else "mongo_collection",
+                        "level": result["level"],
+                        "llm_result": result["output"]
+                    })
+    finally:
+        store.save()
+
+    if args.push_atlas and to_push:
+        from governance.db_entity import push_entities_and_classify
+        print(f"\n📤  Enregistrement groupé de {len(to_push)} classification(s) dans Apache Atlas…")
+        try:
+            push_entities_and_classify(to_push)
+        except Exception as exc:
+            print(exc)
+
+    elapsed = time.perf_counter() - started
+    print("\n🏁  Classification terminée.")
+    print(f"⏱️  {len(entities)} entité(s) en {elapsed:.1f}s — {len(entities) / elapsed:.2f} entité(s)/s")
+    print(f"🧬  Empreintes : {hits} inchangée(s) ignorée(s), {len(entities) - hits} à classifier")
+    print(format_latency_summary())
+    print(f"❌  Erreurs : {errors}")
+    for level, count in levels.most_common():
+        print(f"   - {level} : {count}")
+
+
+if __name__ == "__main__":
+    main()
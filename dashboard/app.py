@@ -1,129 +1,88 @@
+# Durée d'exécution du script, affichée avec STARTUP_TIMING=1
+import time
+_started = time.perf_counter()
+
 import streamlit as st
-import pandas as pd
-import psycopg2
-import pymongo
 import os
 import re
-import json
-import requests
+import sys
 from dotenv import load_dotenv
-from google.generativeai import configure, GenerativeModel
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from classification.llm_backend import get_model, format_latency_summary, stream_text
+from classification.prompt_cache import load_template
+from classification.llm_cache import cached_stream, invalidate as invalidate_llm_cache
+from classification.llm_classifier import classify_structured
+from classification.structured_output import OUTPUT_FORMAT, ClassificationResult
+from services import startup_report
+from database.mongo_utils import get_collection_info
+from database.postgres_utils import get_table_info
+from governance.atlas_client import get_atlas_client, mutated_guids
+from streamlit_app.data_cache import postgres_tables, mongo_collections, mongo_preview, refresh_all
+from streamlit_app.preview import show_postgres_preview
 
 # 🔐 Charger les variables d'environnement
 load_dotenv()
 
 # ➤ Connexions & Configuration
-configure(api_key=os.getenv("API_KEY_GOOGLE"))
-model = GenerativeModel(os.getenv("LLM_MODEL"))
-
 ATLAS_URL = os.getenv("ATLAS_URL", "http://localhost:21000/api/atlas/v2")
 AUTH = (os.getenv("ATLAS_USER", "admin"), os.getenv("ATLAS_PASSWORD", "admin"))
-HEADERS = {"Content-Type": "application/json"}
-
-# PostgreSQL
-pg_conn = psycopg2.connect(
-    host=os.getenv("POSTGRES_HOST"),
-    port=os.getenv("POSTGRES_PORT"),
-    dbname=os.getenv("POSTGRES_DB"),
-    user=os.getenv("POSTGRES_USER"),
-    password=os.getenv("POSTGRES_PASSWORD")
-)
-
-# MongoDB
-mongo_client = pymongo.MongoClient(os.getenv("MONGO_URI"))
-mongo_db = mongo_client[os.getenv("MONGO_DB")]
+atlas = get_atlas_client(ATLAS_URL, *AUTH)
 
 PROMPT_STRUCTURED_PATH = os.getenv("PROMPT_STRUCTURED_PATH")
 PROMPT_UNSTRUCTURED_PATH = os.getenv("PROMPT_UNSTRUCTURED_PATH")
 
-# ➤ Apache Atlas: création + classification robuste
-def push_entity_to_atlas(name, niveau, libelle, source_type, justification):
+# ➤ Apache Atlas: création + classification en un seul appel
+def build_atlas_entity(name, niveau, libelle, source_type, justification):
     entity_type = "postgres_table" if source_type == "postgres" else "mongo_collection"
-    qualified_name = f"{name}@stage"
-
-    # ➤ Étape 1 : création entité
-    entity_payload = {
-        "entity": {
-            "typeName": entity_type,
-            "attributes": {
-                "qualifiedName": qualified_name,
-                "name": name,
-                "justification": justification
+    return {
+        "guid": "-1",
+        "typeName": entity_type,
+        "attributes": {
+            "qualifiedName": f"{name}@stage",
+            "name": name,
+            "justification": justification
+        },
+        "classifications": [
+            {
+                "typeName": libelle.strip().capitalize(),
+                "attributes": {
+                    "niveau": niveau,
+                    "description": justification
+                }
             }
-        }
+        ]
     }
 
-    create_response = requests.post(
-        f"{ATLAS_URL}/entity",
-        headers=HEADERS,
-        auth=AUTH,
-        data=json.dumps(entity_payload)
-    )
-
-    if create_response.status_code not in [200, 201]:
-        print(f"❌ Erreur création entité {name} :", create_response.text)
-        return False
+def push_entity_to_atlas(name, niveau, libelle, source_type, justification):
+    entity = build_atlas_entity(name, niveau, libelle, source_type, justification)
+    classification_type = entity["classifications"][0]["typeName"]
 
-    # ➤ Étape 2 : récupérer le GUID via qualifiedName
-    search_response = requests.get(
-        f"{ATLAS_URL}/entity/uniqueAttribute/type/{entity_type}?attr:qualifiedName={qualified_name}",
-        headers=HEADERS,
-        auth=AUTH
-    )
+    # ➤ Création/mise à jour de l'entité avec sa classification ; GUID lu dans la réponse
+    response = atlas.request("POST", "/entity", json={"entity": entity}, params={"replaceClassifications": "true"})
 
-    if search_response.status_code != 200:
-        print("❌ Échec récupération GUID :", search_response.text)
+    if response.status_code not in [200, 201]:
+        print(f"❌ Erreur création/classification {name} ({classification_type}) :", response.text)
         return False
 
-    try:
-        guid = search_response.json()["entity"]["guid"]
-    except:
+    guids = mutated_guids(response.json())
+    guid = guids.get(entity["guid"]) or guids.get(entity["attributes"]["qualifiedName"])
+    if not guid:
         print("❌ GUID non trouvé dans la réponse.")
         return False
 
-    # ➤ Étape 3 : classification
-    classification_type = libelle.strip().capitalize()
-    classification_payload = [
-        {
-            "typeName": classification_type,
-            "attributes": {
-                "niveau": niveau,
-                "description": justification
-            }
-        }
-    ]
-
-    classify_response = requests.post(
-        f"{ATLAS_URL}/entity/guid/{guid}/classifications",
-        headers=HEADERS,
-        auth=AUTH,
-        data=json.dumps(classification_payload)
-    )
-
-    if classify_response.status_code not in [200, 201, 204]:
-        print(f"❌ Erreur classification {classification_type} :", classify_response.text)
-        return False
-
-    print(f"✅ Entité '{name}' classifiée : {classification_type} ({niveau})")
+    print(f"✅ Entité '{name}' classifiée : {classification_type} ({niveau}) — GUID {guid}")
     return True
 
-# ➤ Fonctions auxiliaires
+# ➤ Fonctions auxiliaires (mises en cache entre les reruns, voir streamlit_app/data_cache.py)
 def get_postgres_tables():
-    with pg_conn.cursor() as cur:
-        cur.execute("SELECT table_name FROM information_schema.tables WHERE table_schema = 'public'")
-        return [row[0] for row in cur.fetchall()]
-
-def get_postgres_table_preview(table):
-    return pd.read_sql_query(f"SELECT * FROM {table} LIMIT 20", con=pg_conn)
+    return postgres_tables("public")
 
 def get_mongodb_collections():
-    return mongo_db.list_collection_names()
+    return mongo_collections()
 
 def get_mongodb_preview(collection):
-    docs = list(mongo_db[collection].find().limit(20))
-    for doc in docs:
-        doc.pop("_id", None)
-    return pd.DataFrame(docs)
+    return mongo_preview(collection)
 
 def detect_source_from_question(question):
     if "table" in question.lower(): return "postgres"
@@ -138,8 +97,8 @@ def extract_target_name(question):
     return None
 
 def load_prompt(path):
-    with open(path, "r", encoding="utf-8") as f:
-        return f.read()
+    # Préfixe statique (barème), relu seulement si le fichier change
+    return load_template(path).prefix
 
 import re
 
@@ -180,32 +139,43 @@ def parse_llm_response(response_text, source_type):
         return None
 
 # ➤ Classification complète
-def classify(question):
+def classify(question, use_cache=True, on_text=None):
+    """Classifie la table ou collection citée ; on_text(texte partiel) suit la réponse diffusée."""
     source = detect_source_from_question(question)
     target = extract_target_name(question)
     if not source or not target:
         return "❌ Question invalide."
 
     if source == "postgres":
-        try:
-            df = get_postgres_table_preview(target)
-            cols = df.dtypes.reset_index()
-            cols.columns = ["nom", "type"]
-            description = "\n".join([f"- {row['nom']} ({row['type']})" for _, row in cols.iterrows()])
-            prompt = load_prompt(PROMPT_STRUCTURED_PATH)
-        except:
+        columns = get_table_info(target)
+        if not columns:
             return "❌ Table PostgreSQL introuvable."
+        if OUTPUT_FORMAT == "json":
+            return classify_json_mode("structured", source, target, columns, use_cache, on_text)
+        description = f"🧾 Table : {target}\n\n" + "\n".join([f"- {col['name']} ({col['type']})" for col in columns])
+        prompt = load_prompt(PROMPT_STRUCTURED_PATH)
     else:
         try:
-            docs = mongo_db[target].find_one()
-            description = f"Nom de la collection : {target}\nContenu exemple : {docs if docs else 'vide'}"
-            prompt = load_prompt(PROMPT_UNSTRUCTURED_PATH)
+            # Schéma inféré sur un échantillon (mis en cache) et densité PII si le scan est activé
+            info = get_collection_info(target)
         except:
             return "❌ Collection MongoDB introuvable."
-
-    full_prompt = f"{prompt}\n\n{description}"
-    response = model.generate_content(full_prompt)
-    parsed = parse_llm_response(response.text, source)
+        if OUTPUT_FORMAT == "json":
+            return classify_json_mode("unstructured", source, target, info, use_cache, on_text)
+        description = f"Nom de la collection : {target}\n\n" + info["description"]
+        prompt = load_prompt(PROMPT_UNSTRUCTURED_PATH)
+
+    response_text = ""
+    for chunk in cached_stream(
+        os.getenv("LLM_MODEL"), prompt, description,
+        lambda: stream_text(get_model(os.getenv("LLM_MODEL"), prompt), description),
+        entity=target, bypass=not use_cache
+    ):
+        response_text += chunk
+        # Rafraîchissement à chaque ligne complète, pas à chaque fragment
+        if on_text and "\n" in chunk:
+            on_text(response_text)
+    parsed = parse_llm_response(response_text, source)
 
     if not parsed:
         return "❌ Échec parsing réponse LLM."
@@ -218,7 +188,35 @@ def classify(question):
         justification=parsed["justification"]
     )
 
-    return response.text
+    return response_text
+
+def classify_json_mode(template_type, source, target, data, use_cache=True, on_text=None):
+    """Variante JSON de classify : même chaîne que llm_classifier (flux, réparation ciblée, cache)."""
+    prompt_path = PROMPT_STRUCTURED_PATH if template_type == "structured" else PROMPT_UNSTRUCTURED_PATH
+
+    # Le tableau partiel s'affiche à chaque colonne reçue
+    partial = ClassificationResult(target, template_type)
+
+    def show_column(column):
+        partial.columns.append(column)
+        on_text("\n".join(partial.to_markdown().splitlines()[:4 + len(partial.columns)]))
+
+    result = classify_structured(
+        template_type, target, data, use_cache=use_cache, verbose=False,
+        on_column=show_column if on_text else None,
+        prompt=load_prompt(prompt_path), model_name=os.getenv("LLM_MODEL")
+    )
+    if not result.columns and not result.impacts:
+        return "❌ Échec parsing réponse LLM."
+
+    push_entity_to_atlas(
+        name=target,
+        niveau=result.level - 1,
+        libelle=result.label,
+        source_type=source,
+        justification=result.justification
+    )
+    return result.to_markdown()
 
 # ➤ UI Streamlit
 st.set_page_config(layout="wide")
@@ -227,9 +225,12 @@ st.title("🔐 Classification des Données Sensibles")
 source_type = st.radio("Type de source à afficher :", ["Table PostgreSQL", "Collection MongoDB"], horizontal=True)
 
 if source_type == "Table PostgreSQL":
+    if st.button("🔄 Rafraîchir le schéma PostgreSQL"):
+        refresh_all()
     tables = get_postgres_tables()
     selected_table = st.selectbox("Choisir une table :", tables)
-    st.dataframe(get_postgres_table_preview(selected_table), use_container_width=True)
+    if selected_table:
+        show_postgres_preview(selected_table, key="dashboard")
 else:
     collections = get_mongodb_collections()
     selected_collection = st.selectbox("Choisir une collection :", collections)
@@ -239,7 +240,20 @@ st.markdown("---")
 st.header("🤖 Chatbot de Classification")
 
 question = st.text_input("Posez votre question (ex: classifie la table assurances)")
+ignore_cache = st.checkbox("♻️ Ignorer le cache (nouvel appel au LLM)")
 if st.button("Envoyer"):
+    # La réponse du LLM s'affiche au fur et à mesure ; le résultat final la remplace
+    stream_placeholder = st.empty()
     with st.spinner("⏳ Classification en cours..."):
-        reponse = classify(question)
-        st.markdown(reponse)
+        reponse = classify(question, use_cache=not ignore_cache, on_text=stream_placeholder.markdown)
+    stream_placeholder.markdown(reponse)
+    st.caption(format_latency_summary())
+
+if st.button("🧹 Vider le cache de cette entité"):
+    target = extract_target_name(question)
+    if target:
+        st.info(f"{invalidate_llm_cache(target)} réponse(s) supprimée(s) du cache pour '{target}'.")
+    else:
+        st.warning("Indiquez une table ou une collection dans la question.")
+
+startup_report("dashboard/app.py", _started)
@@ -0,0 +1,266 @@
+"""
+Scanner PII des collections MongoDB non structurées.
+
+Les documents sont lus en flux (curseur par lots, avec projection), regroupés en
+paquets et analysés dans un pool de processus par des détecteurs compilés (e-mail,
+téléphone, CIN, IP, montants, IBAN, carte). Seules des statistiques par champ
+remontent : la mémoire reste bornée par le nombre de paquets en vol, quelle que
+soit la taille de la collection. Le parcours peut être plafonné en documents et
+en secondes.
+
+Le scan est à activer explicitement pour les classifications (get_collection_info) ;
+son résultat est alors mis en cache par collection (cached_scan), invalidé après
+MONGO_SCAN_CACHE_TTL secondes ou quand le nombre estimé de documents change. Les
+processus d'analyse sont démarrés en mode « spawn » : un fork depuis un processus
+multithreadé (Streamlit, pymongo) peut hériter de verrous tenus et se bloquer.
+
+Variables d'environnement :
+  MONGO_SCAN_ENABLED       1 pour ajouter la densité PII au contexte des classifications (défaut 0)
+  MONGO_SCAN_CACHE_TTL     Durée de vie d'un résultat de scan en cache, en secondes (défaut 3600)
+  MONGO_SCAN_MAX_DOCS      Documents analysés au maximum, 0 = tous (défaut 20000)
+  MONGO_SCAN_MAX_SECONDS   Durée maximale du parcours, 0 = illimitée (défaut 30)
+  MONGO_SCAN_WORKERS       Processus d'analyse (défaut : nombre de CPU)
+  MONGO_SCAN_BATCH_SIZE    Documents par paquet envoyé à un processus (défaut 500)
+
+Usage CLI :
+  python -m database.mongo_scanner Emails --max-docs 5000 --max-seconds 10
+"""
+
+import os
+import re
+import time
+import argparse
+import threading
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SCAN_ENABLED = os.getenv("MONGO_SCAN_ENABLED", "0") == "1"
+SCAN_CACHE_TTL = float(os.getenv("MONGO_SCAN_CACHE_TTL", "3600"))
+SCAN_MAX_DOCS = int(os.getenv("MONGO_SCAN_MAX_DOCS", "20000"))
+SCAN_MAX_SECONDS = float(os.getenv("MONGO_SCAN_MAX_SECONDS", "30"))
+SCAN_WORKERS = int(os.getenv("MONGO_SCAN_WORKERS", "0")) or os.cpu_count() or 1
+SCAN_BATCH_SIZE = int(os.getenv("MONGO_SCAN_BATCH_SIZE", "500"))
+
+# Texte conservé par champ et par document : borne la taille des paquets envoyés aux processus
+MAX_FIELD_CHARS = 10000
+
+# Détecteurs appliqués au texte libre (recherche, et non correspondance exacte)
+DETECTORS = {
+    "email": re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+"),
+    "telephone": re.compile(r"(?<!\d)(?:\+212|00212|0)[5-7](?:[\s.-]?\d{2}){4}(?!\d)"),
+    "cin": re.compile(r"\b[A-Z]{1,2}\d{5,7}\b"),
+    "adresse_ip": re.compile(r"\b(?:(?:25[0-5]|2[0-4]\d|1?\d?\d)\.){3}(?:25[0-5]|2[0-4]\d|1?\d?\d)\b"),
+    "montant": re.compile(r"\b\d{1,3}(?:[\s.,]?\d{3})*(?:[.,]\d{1,2})?\s?(?:MAD|DH|DHS|dirhams?|EUR|€)(?!\w)", re.IGNORECASE),
+    "iban": re.compile(r"\b[A-Z]{2}\d{2}(?:\s?[A-Z0-9]{4}){4,7}\b"),
+    "carte": re.compile(r"(?<!\d)\d{4}(?:[\s-]?\d{4}){3}(?!\d)"),
+}
+
+
+def flatten_document(doc: dict, prefix: str = "") -> dict:
+    """Aplati un document en {chemin.du.champ: texte} ; les listes sont concaténées."""
+    flat = {}
+    for key, value in doc.items():
+        if key == "_id" and not prefix:
+            continue
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten_document(value, f"{path}."))
+        elif isinstance(value, list):
+            parts = []
+            for item in value:
+                if isinstance(item, dict):
+                    for sub_path, text in flatten_document(item, f"{path}.").items():
+                        flat[sub_path] = (flat.get(sub_path, "") + " " + text)[:MAX_FIELD_CHARS]
+                elif item is not None:
+                    parts.append(str(item))
+            if parts:
+                flat[path] = " ".join(parts)[:MAX_FIELD_CHARS]
+        elif value is not None:
+            flat[path] = str(value)[:MAX_FIELD_CHARS]
+    return flat
+
+
+def scan_batch(docs: list) -> dict:
+    """
+    Analyse un paquet de documents aplatis (exécuté dans un processus du pool).
+
+    Returns:
+        dict: {"documents": n, "present": Counter(champ), "hits": Counter((champ, détecteur)),
+               "matches": Counter((champ, détecteur))}
+    """
+    present, hits, matches = Counter(), Counter(), Counter()
+    for doc in docs:
+        for field, text in doc.items():
+            present[field] += 1
+            for name, pattern in DETECTORS.items():
+                count = sum(1 for _ in pattern.finditer(text))
+                if count:
+                    hits[(field, name)] += 1
+                    matches[(field, name)] += count
+    return {"documents": len(docs), "present": present, "hits": hits, "matches": matches}
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_scan_pool() -> ProcessPoolExecutor:
+    """Pool de processus partagé, créé au premier scan volumineux."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=SCAN_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def scan_collection(collection_name: str, fields: list = None, max_docs: int = SCAN_MAX_DOCS,
+                    max_seconds: float = SCAN_MAX_SECONDS, batch_size: int = SCAN_BATCH_SIZE) -> dict:
+    """
+    Parcourt la collection en flux et calcule la densité de motifs PII par champ.
+
+    Args:
+        collection_name (str): Nom de la collection.
+        fields (list): Champs à lire (projection), None pour tous.
+        max_docs (int): Plafond de documents analysés, 0 = aucun.
+        max_seconds (float): Plafond de durée du parcours, 0 = aucun.
+        batch_size (int): Documents par paquet d'analyse.
+    Returns:
+        dict: {
+            "documents": documents analysés, "duration": secondes, "truncated": bool,
+            "fields": {champ: {"present": n, "hits": {détecteur: documents touchés},
+                               "matches": {détecteur: occurrences}}}
+        }
+    """
+    from services import get_mongo_db
+
+    collection = get_mongo_db()[collection_name]
+    projection = {field: 1 for field in fields} if fields else None
+    if projection is not None:
+        projection["_id"] = 0
+
+    started = time.perf_counter()
+    totals = {"documents": 0, "present": Counter(), "hits": Counter(), "matches": Counter()}
+
+    def merge(partial):
+        totals["documents"] += partial["documents"]
+        for key in ("present", "hits", "matches"):
+            totals[key].update(partial[key])
+
+    # Petite collection : l'analyse sur place coûte moins que l'envoi à un processus
+    in_process = collection.estimated_document_count() <= batch_size
+    pool = None if in_process else get_scan_pool()
+    max_in_flight = 2 * SCAN_WORKERS
+    in_flight = set()
+
+    cursor = collection.find({}, projection, batch_size=batch_size)
+    if max_docs:
+        cursor = cursor.limit(max_docs)
+
+    truncated = False
+    batch = []
+    try:
+        for doc in cursor:
+            batch.append(flatten_document(doc))
+            if len(batch) < batch_size:
+                continue
+
+            if pool is None:
+                merge(scan_batch(batch))
+            else:
+                # Contre-pression : on attend qu'un paquet se termine avant d'en lire d'autres
+                if len(in_flight) >= max_in_flight:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        merge(future.result())
+                in_flight.add(pool.submit(scan_batch, batch))
+            batch = []
+
+            if max_seconds and time.perf_counter() - started > max_seconds:
+                truncated = True
+                break
+    finally:
+        cursor.close()
+
+    if batch:
+        merge(scan_batch(batch))
+    for future in in_flight:
+        merge(future.result())
+
+    if max_docs and totals["documents"] >= max_docs:
+        truncated = truncated or collection.estimated_document_count() > max_docs
+
+    stats = {}
+    for field, present in totals["present"].items():
+        stats[field] = {
+            "present": present,
+            "hits": {name: totals["hits"][(field, name)] for name in DETECTORS if totals["hits"][(field, name)]},
+            "matches": {name: totals["matches"][(field, name)] for name in DETECTORS if totals["matches"][(field, name)]}
+        }
+
+    return {
+        "documents": totals["documents"],
+        "duration": time.perf_counter() - started,
+        "truncated": truncated,
+        "fields": stats
+    }
+
+
+# {(collection, max_docs, max_seconds): (instant, documents estimés, résultat)}
+_scans = {}
+_scans_lock = threading.Lock()
+
+
+def cached_scan(collection_name: str, max_docs: int = SCAN_MAX_DOCS, max_seconds: float = SCAN_MAX_SECONDS) -> dict:
+    """scan_collection servi depuis le cache tant que la collection garde le même nombre estimé de documents."""
+    from services import get_mongo_db
+
+    key = (collection_name, max_docs, max_seconds)
+    estimated = get_mongo_db()[collection_name].estimated_document_count()
+    with _scans_lock:
+        cached = _scans.get(key)
+    if cached is not None and time.time() - cached[0] < SCAN_CACHE_TTL and cached[1] == estimated:
+        return cached[2]
+
+    result = scan_collection(collection_name, max_docs=max_docs, max_seconds=max_seconds)
+    with _scans_lock:
+        _scans[key] = (time.time(), estimated, result)
+    return result
+
+
+def clear_scan_cache() -> None:
+    with _scans_lock:
+        _scans.clear()
+
+
+def describe_scan(scan: dict) -> str:
+    """Résumé lisible des densités PII, destiné au prompt non structuré."""
+    if not scan["documents"]:
+        return "Collection vide"
+
+    scope = f"{scan['documents']} documents analysés" + (" (parcours plafonné)" if scan["truncated"] else "")
+    lines = [f"📊 Densité de données personnelles par champ ({scope}) :"]
+    for field, stats in sorted(scan["fields"].items()):
+        densities = sorted(
+            ((count / stats["present"], name) for name, count in stats["hits"].items()),
+            reverse=True
+        )
+        detail = ", ".join(f"{name} dans {ratio:.0%} des documents".replace("%", " %") for ratio, name in densities)
+        lines.append(f"- {field} : {detail or 'aucun motif détecté'}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Densité de données personnelles d'une collection MongoDB")
+    parser.add_argument("collection")
+    parser.add_argument("--field", action="append", help="Champ à analyser (option répétable, défaut : tous)")
+    parser.add_argument("--max-docs", type=int, default=SCAN_MAX_DOCS, help="Documents analysés au maximum (0 = tous)")
+    parser.add_argument("--max-seconds", type=float, default=SCAN_MAX_SECONDS, help="Durée maximale (0 = illimitée)")
+    args = parser.parse_args()
+
+    result = scan_collection(args.collection, args.field, args.max_docs, args.max_seconds)
+    print(describe_scan(result))
+    print(f"\n⏱️  {result['documents']} document(s) en {result['duration']:.2f}s")
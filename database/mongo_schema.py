@@ -0,0 +1,235 @@
+"""
+Inférence du schéma des collections MongoDB, calculée dans le serveur.
+
+Une seule agrégation tire un échantillon ($sample), éclate chaque document en paires
+clé/valeur ($objectToArray) et regroupe par champ et par type BSON. Seuls des
+compteurs et quelques exemples par champ reviennent. Les exemples sont réduits dans
+le serveur avant le regroupement (chaînes tronquées, clés des sous-documents, taille
+des tableaux) et le groupe n'en garde que MONGO_SCHEMA_EXAMPLES ($firstN, MongoDB 5.2+ ;
+sur les versions antérieures, $push d'exemples tronqués puis $slice) : la mémoire de
+l'agrégation reste bornée quelle que soit la taille des valeurs. En Python, les
+exemples sont enfin réduits à leur forme (lettres → a/A, chiffres → 9), si bien que
+le prompt reçoit la liste fidèle des champs, leur fréquence et leurs types sans
+contenu réel.
+
+Le résultat est mis en cache par collection. Il est recalculé après MONGO_SCHEMA_TTL
+secondes ou quand le nombre estimé de documents change.
+
+Variables d'environnement :
+  MONGO_SCHEMA_SAMPLE     Documents échantillonnés (défaut 1000)
+  MONGO_SCHEMA_TTL        Durée de vie du cache en secondes (défaut 600)
+  MONGO_SCHEMA_EXAMPLES   Valeurs d'exemple conservées par champ et par type (défaut 3)
+
+Usage CLI :
+  python -m database.mongo_schema Emails --sample 5000
+"""
+
+import os
+import re
+import time
+import argparse
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SCHEMA_SAMPLE = int(os.getenv("MONGO_SCHEMA_SAMPLE", "1000"))
+SCHEMA_TTL = float(os.getenv("MONGO_SCHEMA_TTL", "600"))
+SCHEMA_EXAMPLES = int(os.getenv("MONGO_SCHEMA_EXAMPLES", "3"))
+
+# Longueur maximale d'une forme de chaîne affichée dans le prompt, clés de sous-document affichées
+MAX_SHAPE_CHARS = 24
+MAX_SHAPE_KEYS = 8
+
+# {collection: (instant, documents estimés, taille d'échantillon, schéma)}
+_schemas = {}
+_schemas_lock = threading.Lock()
+
+
+def _example_expr() -> dict:
+    """Exemple réduit dans le serveur : [début, longueur] d'une chaîne, clés d'un sous-document, taille d'un tableau."""
+    return {"$switch": {
+        "branches": [
+            {"case": {"$eq": ["$bson_type", "string"]},
+             "then": [{"$substrCP": ["$field.v", 0, MAX_SHAPE_CHARS]}, {"$strLenCP": "$field.v"}]},
+            {"case": {"$eq": ["$bson_type", "object"]},
+             "then": {"$map": {"input": {"$slice": [{"$objectToArray": "$field.v"}, MAX_SHAPE_KEYS + 1]}, "in": "$$this.k"}}},
+            {"case": {"$eq": ["$bson_type", "array"]}, "then": {"$size": "$field.v"}},
+            {"case": {"$in": ["$bson_type", ["binData", "javascript", "regex"]]}, "then": None}
+        ],
+        "default": "$field.v"
+    }}
+
+
+def build_schema_pipeline(sample_size: int = SCHEMA_SAMPLE, examples: int = SCHEMA_EXAMPLES,
+                          first_n: bool = True) -> list:
+    """
+    Agrégation d'inférence : nombre de documents échantillonnés, et pour chaque
+    (champ de premier niveau, type BSON) le nombre de documents et quelques exemples réduits.
+
+    Args:
+        first_n (bool): $firstN disponible (MongoDB 5.2+) ; sinon $push puis $slice.
+    """
+    if first_n:
+        collect, keep = {"$firstN": {"input": "$example", "n": examples}}, "$examples"
+    else:
+        collect, keep = {"$push": "$example"}, {"$slice": ["$examples", examples]}
+    return [
+        {"$sample": {"size": sample_size}},
+        {"$facet": {
+            "documents": [{"$count": "n"}],
+            "fields": [
+                {"$project": {"_id": 0, "field": {"$objectToArray": "$$ROOT"}}},
+                {"$unwind": "$field"},
+                {"$match": {"field.k": {"$ne": "_id"}}},
+                {"$addFields": {"bson_type": {"$type": "$field.v"}}},
+                {"$addFields": {"example": _example_expr()}},
+                {"$group": {
+                    "_id": {"name": "$field.k", "type": "$bson_type"},
+                    "count": {"$sum": 1},
+                    "examples": collect
+                }},
+                {"$project": {"count": 1, "examples": keep}}
+            ]
+        }}
+    ]
+
+
+def value_shape(value) -> str:
+    """Forme d'une valeur, sans son contenu : 'aaaa@aaaa.aa', '99 99 99', '{nom, ville}', 'tableau[3]'…"""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "booléen"
+    if isinstance(value, dict):
+        keys = list(value)
+        return "{" + ", ".join(keys[:MAX_SHAPE_KEYS]) + (", …" if len(keys) > MAX_SHAPE_KEYS else "") + "}"
+    if isinstance(value, list):
+        return f"tableau[{len(value)}]"
+    if hasattr(value, "isoformat"):
+        return "date"
+    text = str(value)
+    shape = re.sub(r"\d", "9", re.sub(r"[^\W\d_]", lambda m: "A" if m.group().isupper() else "a", text))
+    if len(shape) > MAX_SHAPE_CHARS:
+        shape = f"{shape[:MAX_SHAPE_CHARS]}… ({len(text)} car.)"
+    return shape
+
+
+def example_shape(bson_type: str, example) -> str:
+    """Forme d'un exemple réduit par _example_expr."""
+    if bson_type == "string" and isinstance(example, list) and len(example) == 2:
+        text, length = example
+        return value_shape(text[:MAX_SHAPE_CHARS]) + (f"… ({length} car.)" if length > MAX_SHAPE_CHARS else "")
+    if bson_type == "object" and isinstance(example, list):
+        return value_shape(dict.fromkeys(example))
+    if bson_type == "array" and isinstance(example, int):
+        return f"tableau[{example}]"
+    return value_shape(example) if example is not None else bson_type
+
+
+def _supports_first_n(collection) -> bool:
+    try:
+        return tuple(collection.database.client.server_info()["versionArray"][:2]) >= (5, 2)
+    except Exception:
+        return False
+
+
+def _run_inference(collection, sample_size: int) -> dict:
+    started = time.perf_counter()
+    pipeline = build_schema_pipeline(sample_size, first_n=_supports_first_n(collection))
+    facet = next(collection.aggregate(pipeline, allowDiskUse=True), None) or {}
+    documents = facet["documents"][0]["n"] if facet.get("documents") else 0
+
+    fields = {}
+    for group in facet.get("fields", []):
+        name, bson_type = group["_id"]["name"], group["_id"]["type"]
+        field = fields.setdefault(name, {"present": 0, "types": {}, "shapes": []})
+        field["present"] += group["count"]
+        field["types"][bson_type] = group["count"]
+        for shape in (example_shape(bson_type, example) for example in group["examples"]):
+            if shape not in field["shapes"]:
+                field["shapes"].append(shape)
+
+    for field in fields.values():
+        field["presence"] = field["present"] / documents if documents else 0.0
+
+    return {
+        "documents": documents,
+        "sample_size": sample_size,
+        "duration": time.perf_counter() - started,
+        "fields": fields
+    }
+
+
+def infer_schema(collection_name: str, sample_size: int = SCHEMA_SAMPLE, refresh: bool = False) -> dict:
+    """
+    Schéma inféré de la collection, servi depuis le cache tant qu'il est valide.
+
+    Args:
+        collection_name (str): Nom de la collection.
+        sample_size (int): Documents tirés par $sample.
+        refresh (bool): Ignore le cache.
+    Returns:
+        dict: {
+            "documents": documents échantillonnés, "sample_size": int, "duration": secondes,
+            "fields": {champ: {"present": n, "presence": fréquence 0-1,
+                               "types": {type BSON: n}, "shapes": [formes d'exemple]}}
+        }
+    """
+    from services import get_mongo_db
+
+    collection = get_mongo_db()[collection_name]
+    # Lu dans les métadonnées de la collection, sans parcours
+    estimated = collection.estimated_document_count()
+
+    with _schemas_lock:
+        cached = _schemas.get(collection_name)
+    if (
+        not refresh and cached is not None
+        and time.time() - cached[0] < SCHEMA_TTL
+        and cached[1] == estimated and cached[2] == sample_size
+    ):
+        return cached[3]
+
+    schema = _run_inference(collection, sample_size)
+    with _schemas_lock:
+        _schemas[collection_name] = (time.time(), estimated, sample_size, schema)
+    return schema
+
+
+def clear_schema_cache(collection_name: str = None) -> None:
+    """Oublie le schéma d'une collection (ou de toutes)."""
+    with _schemas_lock:
+        if collection_name:
+            _schemas.pop(collection_name, None)
+        else:
+            _schemas.clear()
+
+
+def describe_schema(schema: dict) -> str:
+    """Liste des champs avec fréquence, types et formes d'exemple, destinée au prompt non structuré."""
+    if not schema["documents"]:
+        return "Collection vide"
+
+    lines = [f"🧬 Champs observés sur {schema['documents']} documents échantillonnés :"]
+    ordered = sorted(schema["fields"].items(), key=lambda item: (-item[1]["presence"], item[0]))
+    for name, field in ordered:
+        types = ", ".join(
+            f"{bson_type} {count / field['present']:.0%}".replace("%", " %") if len(field["types"]) > 1 else bson_type
+            for bson_type, count in sorted(field["types"].items(), key=lambda item: -item[1])
+        )
+        shapes = " | ".join(field["shapes"][:SCHEMA_EXAMPLES])
+        presence = f"{field['presence']:.0%}".replace("%", " %")
+        lines.append(f"- {name} (présent dans {presence}) : {types}" + (f" — ex. {shapes}" if shapes else ""))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Schéma inféré d'une collection MongoDB par échantillonnage")
+    parser.add_argument("collection")
+    parser.add_argument("--sample", type=int, default=SCHEMA_SAMPLE, help="Documents échantillonnés")
+    args = parser.parse_args()
+
+    result = infer_schema(args.collection, args.sample)
+    print(describe_schema(result))
+    print(f"\n⏱️  {result['documents']} document(s) en {result['duration']:.2f}s")
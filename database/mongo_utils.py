@@ -1,22 +1,52 @@
-import os
-import pymongo
 from dotenv import load_dotenv
+from services import registry, get_mongo_db
 
 load_dotenv()
 
-mongo_client = pymongo.MongoClient(os.getenv("MONGO_URI"))
-mongo_db = mongo_client[os.getenv("MONGO_DB")]
-
-def get_collection_info(collection_name: str):
-    collection = mongo_db[collection_name]
-    # Option 1: Return description or list of keys from first doc
-    first_doc = collection.find_one()
-    if first_doc:
-        # Remove _id for privacy
-        first_doc.pop("_id", None)
-        return {"description": "Exemple de document:\n" + str(first_doc)}
-    else:
+def __getattr__(name):
+    # Compatibilité : mongo_client / mongo_db créés au premier accès, plus à l'import
+    if name == "mongo_client":
+        return registry.get("mongo")
+    if name == "mongo_db":
+        return get_mongo_db()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def get_collection_info(collection_name: str, scan: bool = None, max_docs: int = None, max_seconds: float = None):
+    """
+    Description d'une collection pour le prompt non structuré : schéma inféré sur un
+    échantillon (champs, fréquence, types, formes de valeurs) et, si le scan est activé,
+    la densité de données personnelles de chaque champ mesurée sur l'ensemble (ou une
+    partie plafonnée) de la collection, mise en cache par collection.
+    """
+    from database import mongo_scanner
+    from database.mongo_schema import infer_schema, describe_schema
+
+    # Calculé dans MongoDB ($sample + $objectToArray) et mis en cache par collection
+    schema = infer_schema(collection_name)
+    if not schema["documents"]:
         return {"description": "Collection vide"}
 
+    description = describe_schema(schema)
+
+    if mongo_scanner.SCAN_ENABLED if scan is None else scan:
+        result = mongo_scanner.cached_scan(
+            collection_name,
+            max_docs=mongo_scanner.SCAN_MAX_DOCS if max_docs is None else max_docs,
+            max_seconds=mongo_scanner.SCAN_MAX_SECONDS if max_seconds is None else max_seconds
+        )
+        description += "\n\n" + mongo_scanner.describe_scan(result)
+    return {"description": description}
+
 def get_all_collections():
-    return mongo_db.list_collection_names()
+    return get_mongo_db().list_collection_names()
+
+def get_collection_fields(collection_name: str, min_presence: float = 0.05) -> list:
+    """
+    Champs de premier niveau du schéma inféré, présents dans au moins min_presence des
+    documents échantillonnés : les champs rares, tirés ou non selon l'échantillon,
+    ne font pas varier l'empreinte d'un passage à l'autre.
+    """
+    from database.mongo_schema import infer_schema
+
+    fields = infer_schema(collection_name)["fields"]
+    return sorted(name for name, field in fields.items() if field["presence"] >= min_presence)
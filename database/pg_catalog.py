@@ -0,0 +1,92 @@
+"""
+Instantané du schéma PostgreSQL chargé en une seule requête sur pg_catalog.
+
+Toutes les colonnes de toutes les tables (types, nullabilité, clés primaires et
+étrangères) sont lues d'un coup, au lieu d'une requête information_schema par table.
+L'instantané reste en mémoire jusqu'à un rafraîchissement explicite.
+"""
+
+import time
+
+SNAPSHOT_QUERY = """
+    SELECT n.nspname AS table_schema,
+           c.relname AS table_name,
+           c.relkind,
+           a.attname AS column_name,
+           format_type(a.atttypid, a.atttypmod) AS data_type,
+           NOT a.attnotnull AS is_nullable,
+           COALESCE(a.attnum = ANY(pk.conkey), false) AS is_primary_key,
+           array_position(pk.conkey, a.attnum) AS key_position,
+           fk.reference
+    FROM pg_catalog.pg_class c
+    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+    JOIN pg_catalog.pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+    LEFT JOIN pg_catalog.pg_constraint pk ON pk.conrelid = c.oid AND pk.contype = 'p'
+    LEFT JOIN LATERAL (
+        SELECT rn.nspname || '.' || rc.relname || '.' || ra.attname AS reference
+        FROM pg_catalog.pg_constraint f
+        JOIN pg_catalog.pg_class rc ON rc.oid = f.confrelid
+        JOIN pg_catalog.pg_namespace rn ON rn.oid = rc.relnamespace
+        JOIN pg_catalog.pg_attribute ra
+          ON ra.attrelid = f.confrelid AND ra.attnum = f.confkey[array_position(f.conkey, a.attnum)]
+        WHERE f.conrelid = c.oid AND f.contype = 'f' AND a.attnum = ANY(f.conkey)
+        LIMIT 1
+    ) fk ON true
+    WHERE c.relkind IN ('r', 'p', 'v', 'm')
+      AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+      AND n.nspname NOT LIKE 'pg_toast%'
+    ORDER BY n.nspname, c.relname, a.attnum
+"""
+
+# relkind PostgreSQL → équivalent information_schema.tables.table_type
+BASE_TABLE_KINDS = ("r", "p")
+
+
+class SchemaSnapshot:
+    """
+    Vue en mémoire du catalogue : {(schéma, table): {"kind": relkind, "columns": [...]}}.
+    Chaque colonne est un dict {name, type, nullable, primary_key, key_position, references}.
+    """
+
+    def __init__(self, tables: dict):
+        self.tables = tables
+        self.loaded_at = time.time()
+
+    def table_names(self, schema: str = "public", base_only: bool = False) -> list:
+        return [
+            table for (table_schema, table), info in self.tables.items()
+            if table_schema == schema and (not base_only or info["kind"] in BASE_TABLE_KINDS)
+        ]
+
+    def schemas(self) -> list:
+        return sorted({table_schema for table_schema, _ in self.tables})
+
+    def has_table(self, table: str, schema: str = "public") -> bool:
+        return (schema, table) in self.tables
+
+    def columns(self, table: str, schema: str = "public") -> list:
+        info = self.tables.get((schema, table))
+        return list(info["columns"]) if info else []
+
+    def primary_key(self, table: str, schema: str = "public") -> list:
+        """Colonnes de la clé primaire dans l'ordre de la contrainte, qui est celui de son index."""
+        key = [col for col in self.columns(table, schema) if col["primary_key"]]
+        return [col["name"] for col in sorted(key, key=lambda col: col["key_position"])]
+
+
+def load_schema_snapshot(conn) -> SchemaSnapshot:
+    """Charge l'ensemble du catalogue en une seule requête."""
+    tables = {}
+    with conn.cursor() as cur:
+        cur.execute(SNAPSHOT_QUERY)
+        for table_schema, table_name, relkind, column, data_type, nullable, is_pk, key_position, reference in cur.fetchall():
+            entry = tables.setdefault((table_schema, table_name), {"kind": relkind, "columns": []})
+            entry["columns"].append({
+                "name": column,
+                "type": data_type,
+                "nullable": nullable,
+                "primary_key": is_pk,
+                "key_position": key_position,
+                "references": reference
+            })
+    return SchemaSnapshot(tables)
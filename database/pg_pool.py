@@ -0,0 +1,136 @@
+"""
+Pool de connexions PostgreSQL partagé par tous les modules et threads du processus.
+
+Usage :
+    from database.pg_pool import get_connection
+
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+
+La connexion est validée (commit) à la sortie du bloc, annulée (rollback) en cas
+d'exception, puis rendue au pool. Une connexion fermée ou inutilisable est
+remplacée automatiquement : après un échec (redémarrage du serveur…), toutes les
+connexions rendues avant celui-ci sont testées avant d'être prêtées, et les connexions
+mortes sont écartées jusqu'à en trouver une valide. psycopg2 n'est importé qu'à la
+création du pool.
+"""
+
+import os
+import time
+import weakref
+import threading
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PG_POOL_MIN = int(os.getenv("PG_POOL_MIN", "1"))
+PG_POOL_MAX = int(os.getenv("PG_POOL_MAX", "10"))
+# Délai d'inactivité au-delà duquel une connexion est testée avant d'être prêtée
+PG_POOL_HEALTHCHECK_SECS = float(os.getenv("PG_POOL_HEALTHCHECK_SECS", "30"))
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(PG_POOL_MAX)
+# Date de dernier retour au pool, par connexion (clés faibles : pas de réutilisation d'id)
+_last_used = weakref.WeakKeyDictionary()
+# Date du dernier échec de connexion : les connexions rendues avant sont testées
+_last_failure = 0.0
+
+
+def _dsn() -> dict:
+    # Les variables POSTGRES_* sont prioritaires ; PG_* est utilisé par import_postgres_tables.py
+    return {
+        "host": os.getenv("POSTGRES_HOST") or os.getenv("PG_HOST", "localhost"),
+        "port": os.getenv("POSTGRES_PORT") or os.getenv("PG_PORT", "5432"),
+        "dbname": os.getenv("POSTGRES_DB") or os.getenv("PG_DB"),
+        "user": os.getenv("POSTGRES_USER") or os.getenv("PG_USER"),
+        "password": os.getenv("POSTGRES_PASSWORD") or os.getenv("PG_PASSWORD")
+    }
+
+
+def get_pool():
+    """ThreadedConnectionPool partagé, créé (et psycopg2 importé) au premier emprunt."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.closed:
+            from psycopg2 import pool
+            _pool = pool.ThreadedConnectionPool(PG_POOL_MIN, PG_POOL_MAX, **_dsn())
+        return _pool
+
+
+def _is_healthy(conn) -> bool:
+    import psycopg2
+
+    if conn.closed:
+        return False
+    last_used = _last_used.get(conn, 0.0)
+    if last_used > _last_failure and time.monotonic() - last_used < PG_POOL_HEALTHCHECK_SECS:
+        return True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def _mark_failure() -> None:
+    global _last_failure
+    _last_failure = time.monotonic()
+
+
+def _checkout(pg_pool):
+    import psycopg2
+
+    # Après un redémarrage du serveur, toutes les connexions inactives sont mortes :
+    # on les écarte une à une, le pool finit par en ouvrir une nouvelle
+    for _ in range(PG_POOL_MAX + 1):
+        conn = pg_pool.getconn()
+        if _is_healthy(conn):
+            return conn
+        _mark_failure()
+        pg_pool.putconn(conn, close=True)
+    raise psycopg2.OperationalError("❌ Aucune connexion PostgreSQL valide disponible dans le pool")
+
+
+@contextmanager
+def get_connection():
+    """Emprunte une connexion au pool, en attendant qu'une place se libère si besoin."""
+    from services import registry
+
+    with _slots:
+        # Résolu par le registre : la création du pool est chronométrée (STARTUP_TIMING)
+        pg_pool = registry.get("postgres")
+        import psycopg2
+
+        conn = _checkout(pg_pool)
+        broken = False
+        try:
+            yield conn
+            conn.commit()
+        except Exception as exc:
+            broken = conn.closed or isinstance(exc, (psycopg2.OperationalError, psycopg2.InterfaceError))
+            if not conn.closed:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    broken = True
+            if broken:
+                _mark_failure()
+            raise
+        finally:
+            _last_used[conn] = time.monotonic()
+            pg_pool.putconn(conn, close=broken)
+
+
+def close_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None and not _pool.closed:
+            _pool.closeall()
+        _pool = None
+        _last_used.clear()
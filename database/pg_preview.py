@@ -0,0 +1,185 @@
+"""
+Aperçu paginé des tables PostgreSQL.
+
+Deux modes :
+
+  pagination   pagination par clé (keyset) sur la clé primaire :
+               WHERE (clé) > (dernière clé vue) ORDER BY clé LIMIT n. L'index est
+               parcouru à partir de la dernière ligne affichée, sans OFFSET : une page
+               coûte la même chose quelle que soit la taille de la table ou le rang
+               de la page. Les tables sans clé primaire et les vues sont paginées par
+               OFFSET, dont le coût croît avec le rang de la page ; pour parcourir une
+               grande table sans clé, le mode échantillon est à privilégier. Les tables
+               sans clé sont triées sur leur position physique (tableoid, ctid), stable
+               tant que les lignes ne sont pas modifiées ; une vue n'a pas d'ordre
+               garanti et ses pages sont approximatives.
+  échantillon  TABLESAMPLE SYSTEM dimensionné d'après reltuples pour ramener environ
+               le nombre de lignes demandé, à coût constant. Les lignes sont lues par
+               paquets via un curseur serveur (stream_sample).
+
+Les identifiants sont quotés avec psycopg2.sql et les colonnes projetées sont
+vérifiées contre l'instantané du catalogue.
+
+Variables d'environnement :
+  PG_PREVIEW_PAGE_SIZE    Lignes par page (défaut 20)
+  PG_PREVIEW_TIMEOUT_MS   statement_timeout des requêtes d'aperçu (défaut 5000)
+"""
+
+import os
+from dotenv import load_dotenv
+
+from database.pg_pool import get_connection
+from database.postgres_utils import get_schema_snapshot
+
+load_dotenv()
+
+PREVIEW_PAGE_SIZE = int(os.getenv("PG_PREVIEW_PAGE_SIZE", "20"))
+PREVIEW_TIMEOUT_MS = int(os.getenv("PG_PREVIEW_TIMEOUT_MS", "5000"))
+
+# Marge de l'échantillon : SYSTEM tire des blocs entiers, le nombre de lignes obtenu varie
+SAMPLE_OVERSAMPLING = 2
+
+ESTIMATE_QUERY = """
+    SELECT c.reltuples::bigint, c.relkind
+    FROM pg_catalog.pg_class c
+    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = %s AND c.relname = %s
+"""
+
+
+def _projection(table: str, schema: str, columns: list = None) -> list:
+    """Colonnes demandées qui existent dans la table, dans l'ordre de la table ; toutes par défaut."""
+    known = [col["name"] for col in get_schema_snapshot().columns(table, schema)]
+    if not known:
+        raise ValueError(f"❌ Table introuvable : {schema}.{table}")
+    if not columns:
+        return known
+    wanted = set(columns)
+    return [name for name in known if name in wanted] or known
+
+
+def build_page_query(table: str, schema: str, columns: list, key: list, after: tuple = None,
+                     page_size: int = PREVIEW_PAGE_SIZE, offset: int = 0, physical_order: bool = False):
+    """
+    Requête d'une page : colonnes projetées + colonnes de clé, triée sur la clé.
+
+    Args:
+        after (tuple): Valeurs de clé de la dernière ligne de la page précédente.
+        offset (int): Décalage, utilisé seulement sans clé primaire (vues, tables sans clé).
+        physical_order (bool): Sans clé, trie sur (tableoid, ctid) pour que les pages OFFSET
+            ne se chevauchent pas ; réservé aux tables, une vue n'a pas de ctid.
+    Returns:
+        sql.Composed: Requête prête pour cursor.execute.
+    """
+    from psycopg2 import sql
+
+    selected = [sql.Identifier(name) for name in columns]
+    selected += [sql.Identifier(name) for name in key if name not in columns]
+    query = sql.SQL("SELECT {} FROM {}").format(sql.SQL(", ").join(selected), sql.Identifier(schema, table))
+
+    if key:
+        keys = sql.SQL(", ").join(sql.Identifier(name) for name in key)
+        if after is not None:
+            query += sql.SQL(" WHERE ({}) > ({})").format(keys, sql.SQL(", ").join(sql.Literal(v) for v in after))
+        query += sql.SQL(" ORDER BY {}").format(keys)
+    elif physical_order:
+        query += sql.SQL(" ORDER BY tableoid, ctid")
+    query += sql.SQL(" LIMIT {}").format(sql.Literal(page_size))
+    if not key and offset:
+        query += sql.SQL(" OFFSET {}").format(sql.Literal(offset))
+    return query
+
+
+def preview_page(table: str, schema: str = "public", columns: list = None, after: tuple = None,
+                 page_size: int = PREVIEW_PAGE_SIZE, offset: int = 0) -> dict:
+    """
+    Une page de la table, dans l'ordre de sa clé primaire (position physique sans clé,
+    ordre de lecture pour une vue).
+
+    Args:
+        table (str): Nom de la table.
+        schema (str): Schéma PostgreSQL.
+        columns (list): Colonnes à afficher (projection), None pour toutes.
+        after (tuple): Curseur renvoyé par la page précédente ('next'), None pour la première page.
+        page_size (int): Nombre de lignes.
+        offset (int): Décalage pour les vues et tables sans clé primaire.
+    Returns:
+        dict: {"columns": [...], "rows": [tuples], "key": [...],
+               "ordering": "key" | "physical" | None (vue : pages approximatives),
+               "next": curseur de la page suivante ou None, "next_offset": int}
+    """
+    columns = _projection(table, schema, columns)
+    # Sans clé primaire, pas de pagination par clé : ctid n'est pas indexé, il sert seulement au tri
+    snapshot = get_schema_snapshot()
+    key = snapshot.primary_key(table, schema)
+    physical_order = not key and snapshot.tables[(schema, table)]["kind"] != "v"
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL statement_timeout = %s", (PREVIEW_TIMEOUT_MS,))
+            # Une ligne de plus que la page : indique s'il reste une page suivante
+            cur.execute(build_page_query(table, schema, columns, key, after, page_size + 1, offset, physical_order))
+            rows = cur.fetchall()
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    extra = [name for name in key if name not in columns]
+    positions = [columns.index(name) if name in columns else len(columns) + extra.index(name) for name in key]
+    next_key = tuple(rows[-1][i] for i in positions) if has_more and key and rows else None
+
+    return {
+        "columns": columns,
+        "rows": [row[:len(columns)] for row in rows],
+        "key": key,
+        "ordering": "key" if key else "physical" if physical_order else None,
+        "next": next_key,
+        "next_offset": offset + len(rows) if has_more and not key else None
+    }
+
+
+def build_sample_query(table: str, schema: str, columns: list, sample_percent: float = None,
+                       row_limit: int = PREVIEW_PAGE_SIZE, seed: int = 0):
+    """Échantillon TABLESAMPLE SYSTEM reproductible (seed), ou simple LIMIT sans pourcentage."""
+    from psycopg2 import sql
+
+    source = sql.Identifier(schema, table)
+    if sample_percent is not None:
+        source = sql.SQL("{} TABLESAMPLE SYSTEM ({}) REPEATABLE ({})").format(
+            source, sql.Literal(sample_percent), sql.Literal(seed)
+        )
+    return sql.SQL("SELECT {} FROM {} LIMIT {}").format(
+        sql.SQL(", ").join(sql.Identifier(name) for name in columns), source, sql.Literal(row_limit)
+    )
+
+
+def stream_sample(table: str, schema: str = "public", columns: list = None, rows: int = 200,
+                  page_size: int = PREVIEW_PAGE_SIZE, seed: int = 0):
+    """
+    Échantillon représentatif de la table, lu par paquets de page_size lignes.
+
+    Le pourcentage TABLESAMPLE est calculé pour ramener environ rows lignes : seuls les
+    blocs tirés sont lus, quelle que soit la taille de la table. Une table non analysée
+    (reltuples inconnu) ou plus petite que rows est lue avec un LIMIT.
+
+    Yields:
+        dict: {"columns": [...], "rows": [tuples], "sampled": bool} pour chaque paquet.
+    """
+    columns = _projection(table, schema, columns)
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(ESTIMATE_QUERY, (schema, table))
+            estimated, relkind = cur.fetchone() or (-1, "r")
+            cur.execute("SET LOCAL statement_timeout = %s", (PREVIEW_TIMEOUT_MS,))
+
+        sample_percent = None
+        if relkind in ("r", "p", "m") and estimated > rows:
+            sample_percent = round(min(100.0, 100.0 * rows * SAMPLE_OVERSAMPLING / estimated), 6)
+
+        # Curseur serveur : les lignes arrivent par paquets au lieu d'être toutes chargées
+        with conn.cursor(name=f"preview_{table}_{seed}") as cur:
+            cur.itersize = page_size
+            cur.execute(build_sample_query(table, schema, columns, sample_percent, rows, seed))
+            while True:
+                batch = cur.fetchmany(page_size)
+                if not batch:
+                    break
+                yield {"columns": columns, "rows": batch, "sampled": sample_percent is not None}
@@ -0,0 +1,205 @@
+"""
+Profilage PII exécuté dans PostgreSQL.
+
+Au lieu de ramener des lignes en Python, une seule requête d'agrégation compte, pour
+chaque colonne de la table, les valeurs qui respectent les motifs des règles PII
+(CIN, téléphone, e-mail, IP, carte, IBAN). Seuls les taux par colonne reviennent.
+Au-delà de PG_PROFILE_TARGET_ROWS lignes estimées, le parcours se fait sur un
+échantillon TABLESAMPLE ; les vues sont lues avec un LIMIT.
+
+Les motifs sont ceux de classification.pii_rules (syntaxe compatible avec les
+expressions régulières PostgreSQL). Les règles munies d'un validateur (clé de Luhn des
+cartes) ne peuvent pas être contrôlées par une regex : pour chaque colonne où leur motif
+apparaît, jusqu'à VALIDATION_SAMPLE valeurs correspondantes sont relues et validées en
+Python, et le taux est ramené à la part des valeurs valides. Sans valeur relue, le taux
+est écarté.
+
+Variables d'environnement :
+  PG_PROFILE_TARGET_ROWS   Nombre de lignes visé par l'échantillon (défaut 10000)
+  PG_PROFILE_METHOD        SYSTEM (par blocs, rapide) ou BERNOULLI (par lignes) (défaut SYSTEM)
+  PG_PROFILE_TIMEOUT_MS    statement_timeout de la requête de profilage (défaut 30000)
+"""
+
+import os
+import time
+from dotenv import load_dotenv
+
+from classification.pii_rules import RULES
+from database.pg_pool import get_connection
+from database.postgres_utils import get_schema_snapshot
+
+load_dotenv()
+
+PROFILE_TARGET_ROWS = int(os.getenv("PG_PROFILE_TARGET_ROWS", "10000"))
+PROFILE_METHOD = os.getenv("PG_PROFILE_METHOD", "SYSTEM").upper()
+PROFILE_TIMEOUT_MS = int(os.getenv("PG_PROFILE_TIMEOUT_MS", "30000"))
+PROFILE_SEED = 42
+
+# Valeurs relues par colonne pour appliquer le validateur d'une règle (Luhn)
+VALIDATION_SAMPLE = 50
+
+# Règles dont le motif de valeur est recherché dans la base
+PROFILED_RULES = [r for r in RULES if r.name in ("cin", "telephone", "email", "adresse_ip", "carte", "iban")]
+
+# Types sans intérêt pour la recherche de motifs textuels
+SKIPPED_TYPES = ("boolean", "bytea", "json", "jsonb", "date", "timestamp", "time", "interval", "uuid", "point", "polygon")
+
+ESTIMATE_QUERY = """
+    SELECT c.reltuples::bigint, c.relkind
+    FROM pg_catalog.pg_class c
+    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = %s AND c.relname = %s
+"""
+
+
+def _profiled_columns(columns: list) -> list:
+    return [
+        col["name"] for col in columns
+        if not col["type"].startswith(SKIPPED_TYPES) and not col["type"].endswith("[]")
+    ]
+
+
+def _value_expr(column: str, rule):
+    from psycopg2 import sql
+
+    # Même normalisation que pii_rules.normalize_value : e-mails tels quels, sinon sans espaces ni séparateurs
+    if rule.name == "email":
+        return sql.SQL("btrim({}::text)").format(sql.Identifier(column))
+    return sql.SQL(r"regexp_replace({}::text, '[\s/-]', '', 'g')").format(sql.Identifier(column))
+
+
+def build_profile_query(schema: str, table: str, columns: list, sample_percent: float = None,
+                        row_limit: int = None):
+    """
+    Construit la requête d'agrégation : count(*), puis pour chaque colonne le nombre de
+    valeurs non nulles et le nombre de correspondances par règle.
+
+    Args:
+        schema (str): Schéma PostgreSQL.
+        table (str): Table ou vue.
+        columns (list): Noms des colonnes à profiler.
+        sample_percent (float): Pourcentage TABLESAMPLE, None pour un parcours complet.
+        row_limit (int): LIMIT appliqué à la source (vues), None sinon.
+    Returns:
+        sql.Composed: Requête prête pour cursor.execute.
+    """
+    from psycopg2 import sql
+
+    aggregates = [sql.SQL("count(*)")]
+    for column in columns:
+        aggregates.append(sql.SQL("count({})").format(sql.Identifier(column)))
+        for rule in PROFILED_RULES:
+            aggregates.append(sql.SQL("count(*) FILTER (WHERE {} ~ {})").format(
+                _value_expr(column, rule), sql.Literal(f"^(?:{rule.value_re.pattern})$")
+            ))
+
+    return sql.SQL("SELECT {} FROM {}").format(
+        sql.SQL(", ").join(aggregates), _source(schema, table, sample_percent, row_limit)
+    )
+
+
+def _source(schema: str, table: str, sample_percent: float = None, row_limit: int = None):
+    from psycopg2 import sql
+
+    source = sql.Identifier(schema, table)
+    if sample_percent is not None:
+        return sql.SQL("{} TABLESAMPLE {} ({}) REPEATABLE ({})").format(
+            source, sql.SQL(PROFILE_METHOD), sql.Literal(sample_percent), sql.Literal(PROFILE_SEED)
+        )
+    if row_limit is not None:
+        return sql.SQL("(SELECT * FROM {} LIMIT {}) AS profiled").format(source, sql.Literal(row_limit))
+    return source
+
+
+def build_matches_query(schema: str, table: str, column: str, rule, sample_percent: float = None,
+                        row_limit: int = None):
+    """Valeurs normalisées de la colonne qui respectent le motif de la règle (au plus VALIDATION_SAMPLE)."""
+    from psycopg2 import sql
+
+    value = _value_expr(column, rule)
+    return sql.SQL("SELECT {} FROM {} WHERE {} ~ {} LIMIT {}").format(
+        value, _source(schema, table, sample_percent, row_limit), value,
+        sql.Literal(f"^(?:{rule.value_re.pattern})$"), sql.Literal(VALIDATION_SAMPLE)
+    )
+
+
+def profile_table(table_name: str, schema: str = "public", target_rows: int = PROFILE_TARGET_ROWS) -> dict:
+    """
+    Calcule les taux de correspondance des motifs PII de toutes les colonnes en un seul parcours,
+    puis relit les valeurs correspondantes des règles à validateur (Luhn) pour corriger leur taux.
+
+    Args:
+        table_name (str): Nom de la table.
+        schema (str): Schéma PostgreSQL.
+        target_rows (int): Nombre de lignes visé ; au-delà la table est échantillonnée.
+    Returns:
+        dict: {
+            "rows": lignes parcourues, "sampled": bool, "duration": secondes,
+            "columns": {colonne: {"non_null": int, "hits": {règle: taux}}}
+        }
+    """
+    columns = _profiled_columns(get_schema_snapshot().columns(table_name, schema))
+    if not columns:
+        return {"rows": 0, "sampled": False, "duration": 0.0, "columns": {}}
+
+    started = time.perf_counter()
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(ESTIMATE_QUERY, (schema, table_name))
+            estimated, relkind = cur.fetchone() or (-1, "r")
+
+            sample_percent = row_limit = None
+            if relkind in ("r", "p", "m"):
+                # reltuples vaut -1 (PG14+) ou 0 tant que la table n'a pas été analysée
+                if estimated > target_rows:
+                    sample_percent = round(min(100.0, 100.0 * target_rows / estimated), 4)
+            else:
+                row_limit = target_rows
+
+            cur.execute("SET LOCAL statement_timeout = %s", (PROFILE_TIMEOUT_MS,))
+            cur.execute(build_profile_query(schema, table_name, columns, sample_percent, row_limit))
+            counts = cur.fetchone()
+
+            rows, values = counts[0], iter(counts[1:])
+            profile = {}
+            for column in columns:
+                non_null = next(values)
+                hits = {rule.name: next(values) for rule in PROFILED_RULES}
+                ratios = {name: count / non_null for name, count in hits.items()} if non_null else {}
+                for rule in PROFILED_RULES:
+                    if rule.validator and ratios.get(rule.name):
+                        cur.execute(build_matches_query(schema, table_name, column, rule, sample_percent, row_limit))
+                        ratios[rule.name] *= _valid_share(rule, [value for value, in cur.fetchall()])
+                profile[column] = {"non_null": non_null, "hits": ratios}
+
+    return {
+        "rows": rows,
+        "sampled": sample_percent is not None,
+        "duration": time.perf_counter() - started,
+        "columns": profile
+    }
+
+
+def _valid_share(rule, matches: list) -> float:
+    """Part des valeurs relues qui passent le validateur ; 0 sans valeur (taux non vérifiable)."""
+    if not matches:
+        return 0.0
+    return sum(1 for value in matches if rule.validator(value)) / len(matches)
+
+
+def annotate_columns(columns: list, profile: dict) -> list:
+    """Copie des colonnes avec leurs taux de correspondance sous la clé 'pii_hits'."""
+    annotated = []
+    for col in columns:
+        col = dict(col)
+        hits = profile["columns"].get(col["name"], {}).get("hits")
+        if hits:
+            col["pii_hits"] = hits
+        annotated.append(col)
+    return annotated
+
+
+def get_profiled_columns(table_name: str, schema: str = "public") -> list:
+    """Colonnes de la table enrichies de leurs taux PII, prêtes pour classify_data."""
+    columns = get_schema_snapshot().columns(table_name, schema)
+    return annotate_columns(columns, profile_table(table_name, schema))
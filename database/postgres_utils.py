@@ -1,32 +1,46 @@
-import os
-import psycopg2
-from dotenv import load_dotenv
+import threading
+from database.pg_catalog import load_schema_snapshot
+from database.pg_pool import get_connection
 
-load_dotenv()
+_snapshot = None
+_snapshot_lock = threading.Lock()
 
-pg_conn = psycopg2.connect(
-    host=os.getenv("POSTGRES_HOST"),
-    port=os.getenv("POSTGRES_PORT"),
-    dbname=os.getenv("POSTGRES_DB"),
-    user=os.getenv("POSTGRES_USER"),
-    password=os.getenv("POSTGRES_PASSWORD")
-)
+def get_schema_snapshot(refresh: bool = False):
+    """Instantané du catalogue, chargé à la première demande puis sur refresh=True."""
+    global _snapshot
+    with _snapshot_lock:
+        if _snapshot is None or refresh:
+            with get_connection() as conn:
+                _snapshot = load_schema_snapshot(conn)
+        return _snapshot
 
-def get_table_info(table_name: str):
-    with pg_conn.cursor() as cur:
-        cur.execute("""
-            SELECT column_name, data_type 
-            FROM information_schema.columns 
-            WHERE table_schema = 'public' AND table_name = %s
-        """, (table_name,))
-        rows = cur.fetchall()
-        return [{"name": row[0], "type": row[1]} for row in rows]
+def refresh_schema_snapshot():
+    return get_schema_snapshot(refresh=True)
 
-def get_all_tables():
-    with pg_conn.cursor() as cur:
-        cur.execute("""
-            SELECT table_name 
-            FROM information_schema.tables 
-            WHERE table_schema = 'public'
-        """)
-        return [row[0] for row in cur.fetchall()]
+def get_table_info(table_name: str, schema: str = "public"):
+    return get_schema_snapshot().columns(table_name, schema)
+
+def get_all_tables(schema: str = "public"):
+    return get_schema_snapshot().table_names(schema)
+
+TABLE_VERSIONS_QUERY = """
+    SELECT c.relname,
+           c.relnatts,
+           COALESCE(s.n_tup_ins + s.n_tup_upd + s.n_tup_del, 0) AS modifications,
+           COALESCE(s.n_live_tup, 0) AS live_rows
+    FROM pg_catalog.pg_class c
+    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+    LEFT JOIN pg_catalog.pg_stat_user_tables s ON s.relid = c.oid
+    WHERE n.nspname = %s AND c.relkind IN ('r', 'p', 'v', 'm')
+"""
+
+def get_table_versions(schema: str = "public") -> dict:
+    """
+    Compteurs de modification par table, lus dans pg_stat_user_tables (une requête, sans
+    parcourir les tables) : {table: (nombre de colonnes, insert+update+delete, lignes vivantes)}.
+    Une table créée, supprimée ou altérée change l'ensemble des clés ou le nombre de colonnes.
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(TABLE_VERSIONS_QUERY, (schema,))
+            return {name: (natts, modifications, live_rows) for name, natts, modifications, live_rows in cur.fetchall()}
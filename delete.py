@@ -1,42 +1,131 @@
-import requests
-from requests.auth import HTTPBasicAuth
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
 
-ATLAS_BASE_URL = "http://localhost:21000/api/atlas/v2"
-USERNAME = "admin"
-PASSWORD = "admin"
+"""
+Supprimer des entités Apache Atlas filtrées par nom, type et qualifiedName.
 
-def get_entity_guid_by_name(entity_name):
-    url = f"{ATLAS_BASE_URL}/search/basic"
+Le type, le qualifiedName et les noms sont filtrés côté Atlas (search/basic +
+entityFilters). L'opérateur '=' d'Atlas étant sensible à la casse, les noms passent
+par 'contains', insensible à la casse mais plus large (client ⊂ clients) : l'égalité
+sans tenir compte de la casse (clients = Clients) est vérifiée ensuite côté client.
+Tous les résultats sont parcourus page par page, puis supprimés par paquets via
+DELETE /entity/bulk.
+
+Exemples :
+  python delete.py --name clients --name assurances --dry-run
+  python delete.py --type mongo_collection --qualified-name "*@stage"
+"""
+
+import os
+import argparse
+from dotenv import load_dotenv
+from governance.atlas_client import get_atlas_client, AtlasError
+from services import startup_report
+
+load_dotenv()
+
+ATLAS_BASE_URL = os.getenv("ATLAS_BASE_URL", "http://localhost:21000/api/atlas/v2")
+USERNAME = os.getenv("ATLAS_USER", "admin")
+PASSWORD = os.getenv("ATLAS_PASSWORD", "admin")
+
+PAGE_SIZE = 500
+
+client = get_atlas_client(ATLAS_BASE_URL, USERNAME, PASSWORD)
+
+
+def build_filters(names: list = None, qualified_name: str = None) -> dict:
+    """
+    Construit les entityFilters Atlas : OU des noms (contains, insensible à la casse)
+    et qualifiedName (exact, ou motif avec *).
+    """
+    criteria = []
+    if names:
+        by_name = [{"attributeName": "name", "operator": "contains", "attributeValue": name} for name in names]
+        criteria.append(by_name[0] if len(by_name) == 1 else {"condition": "OR", "criterion": by_name})
+    if qualified_name:
+        operator = "like" if "*" in qualified_name else "="
+        criteria.append({"attributeName": "qualifiedName", "operator": operator, "attributeValue": qualified_name})
+
+    if not criteria:
+        return None
+    if len(criteria) == 1:
+        return criteria[0]
+    return {"condition": "AND", "criterion": criteria}
+
+
+def find_entities(type_name: str, names: list = None, qualified_name: str = None) -> list:
+    """
+    Retourne les en-têtes de toutes les entités correspondant au filtre, toutes pages confondues.
+    Les noms sont présélectionnés par Atlas puis comparés exactement, sans tenir compte de la casse.
+    """
     payload = {
-        "typeName": "postgres_table",
+        "typeName": type_name,
         "excludeDeletedEntities": True,
-        "limit": 100
+        "attributes": ["name", "qualifiedName"],
+        "limit": PAGE_SIZE,
+        "offset": 0
     }
-    response = requests.post(url, json=payload, auth=HTTPBasicAuth(USERNAME, PASSWORD))
-    if response.status_code != 200:
-        print(f"Erreur lors de la récupération des entités : {response.status_code}")
-        return None
+    filters = build_filters(names, qualified_name)
+    if filters:
+        payload["entityFilters"] = filters
+
+    wanted = {name.lower() for name in names or []}
+    entities = []
+    while True:
+        page = client.search_basic(payload).get("entities", []) or []
+        entities.extend(
+            e for e in page
+            if not wanted or str((e.get("attributes") or {}).get("name") or "").lower() in wanted
+        )
+        if len(page) < PAGE_SIZE:
+            return entities
+        payload["offset"] += PAGE_SIZE
+
+
+def delete_entities(guids: list, chunk_size: int = 100) -> int:
+    """Supprime les GUID par paquets ; retourne le nombre d'entités supprimées."""
+    deleted = 0
+    for i in range(0, len(guids), chunk_size):
+        chunk = guids[i:i + chunk_size]
+        try:
+            client.delete_entities(chunk)
+            deleted += len(chunk)
+            print(f"Suppression réussie de {len(chunk)} entité(s) ({deleted}/{len(guids)})")
+        except AtlasError as e:
+            print(f"Erreur suppression du paquet {i // chunk_size + 1} : {e}")
+    return deleted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Suppression groupée d'entités Apache Atlas")
+    parser.add_argument("--name", action="append", default=[], help="Nom de l'entité, insensible à la casse (option répétable)")
+    parser.add_argument("--type", default="postgres_table", help="Type Atlas (défaut : postgres_table)")
+    parser.add_argument("--qualified-name", help="qualifiedName exact, ou motif avec * (ex: '*@stage')")
+    parser.add_argument("--chunk-size", type=int, default=100, help="GUID supprimés par appel")
+    parser.add_argument("--dry-run", action="store_true", help="Lister les entités sans les supprimer")
+    parser.add_argument("--all", action="store_true", help="Autoriser la suppression sans filtre de nom")
+    args = parser.parse_args()
+
+    if not args.name and not args.qualified_name and not args.all:
+        parser.error("indiquez --name et/ou --qualified-name (ou --all pour tout le type)")
+    startup_report("delete.py")
+
+    try:
+        entities = find_entities(args.type, args.name, args.qualified_name)
+    except AtlasError as e:
+        print(f"Erreur lors de la récupération des entités : {e}")
+        exit(1)
+
+    if not entities:
+        print("Aucune entité trouvée.")
+        exit(0)
 
-    entities = response.json().get("entities", [])
     for entity in entities:
         attr = entity.get("attributes", {})
-        name = attr.get("name")
-        if name and name.lower() == entity_name.lower():  # comparaison insensible à la casse
-            print(f"Trouvé '{name}' avec GUID : {entity['guid']}")
-            return entity["guid"]
-    print(f"Entité '{entity_name}' non trouvée.")
-    return None
-
-def delete_entity_by_guid(guid):
-    url = f"{ATLAS_BASE_URL}/entity/guid/{guid}"
-    response = requests.delete(url, auth=HTTPBasicAuth(USERNAME, PASSWORD))
-    if response.status_code == 200:
-        print(f"Suppression réussie pour GUID : {guid}")
-    else:
-        print(f"Erreur suppression GUID {guid} : {response.status_code} - {response.text}")
+        print(f"Trouvé '{attr.get('name')}' ({attr.get('qualifiedName')}) avec GUID : {entity['guid']}")
 
-# Supprimer les tables Clients et Assurances (insensible à la casse)
-for table_name in ["clients", "assurances"]:
-    guid = get_entity_guid_by_name(table_name)
-    if guid:
-        delete_entity_by_guid(guid)
+    if args.dry_run:
+        print(f"\n[dry-run] {len(entities)} entité(s) seraient supprimées.")
+    else:
+        deleted = delete_entities([e["guid"] for e in entities], args.chunk_size)
+        print(f"\n{deleted}/{len(entities)} entité(s) supprimée(s).")
@@ -0,0 +1,245 @@
+"""
+Client HTTP unique pour l'API REST v2 d'Apache Atlas.
+
+Une session requests est partagée par URL/utilisateur : les connexions TCP restent
+ouvertes entre deux appels (keep-alive) et chaque appel a un timeout. Les réponses
+429/5xx et les erreurs réseau sont rejouées avec un backoff exponentiel, seulement pour
+les méthodes idempotentes (GET, PUT, DELETE…) et pour les POST sans effet de bord en cas
+de répétition : upserts par qualifiedName (/entity, /entity/bulk) et recherche. Un POST
+d'ajout de classification n'est jamais rejoué : s'il a été appliqué avant l'erreur, la
+répétition échouerait (« classification already associated »).
+
+Variables d'environnement :
+  ATLAS_BASE_URL / ATLAS_HOST   URL du serveur (ex: http://localhost:21000)
+  ATLAS_USER / ATLAS_PASSWORD   Identifiants
+  ATLAS_TIMEOUT                 Timeout de lecture en secondes (défaut 30)
+  ATLAS_MAX_RETRIES             Nombre de nouvelles tentatives (défaut 3)
+  ATLAS_POOL_SIZE               Connexions HTTP conservées par hôte (défaut 10)
+"""
+
+import os
+import time
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ATLAS_TIMEOUT = float(os.getenv("ATLAS_TIMEOUT", "30"))
+ATLAS_CONNECT_TIMEOUT = float(os.getenv("ATLAS_CONNECT_TIMEOUT", "5"))
+ATLAS_MAX_RETRIES = int(os.getenv("ATLAS_MAX_RETRIES", "3"))
+ATLAS_POOL_SIZE = int(os.getenv("ATLAS_POOL_SIZE", "10"))
+
+API_PREFIX = "/api/atlas/v2"
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+RETRY_BACKOFF = 0.5
+
+# POST rejouables sans risque : upserts par qualifiedName et recherche en lecture seule
+IDEMPOTENT_POSTS = ("/entity", "/entity/bulk", "/search/basic")
+
+
+def _server_url(base_url: str) -> str:
+    base_url = base_url.rstrip("/")
+    if base_url.endswith(API_PREFIX):
+        base_url = base_url[:-len(API_PREFIX)]
+    return base_url
+
+
+class AtlasError(Exception):
+    """Réponse HTTP en erreur renvoyée par Atlas."""
+
+    def __init__(self, message: str, status_code: int = None, body: str = ""):
+        super().__init__(message)
+        self.status_code = status_code
+        self.body = body
+
+
+class AtlasClient:
+    """
+    Client Atlas avec session persistante, timeouts et reprise sur 429/5xx.
+
+    Args:
+        base_url (str): URL du serveur, avec ou sans le suffixe /api/atlas/v2.
+        user (str): Utilisateur Atlas.
+        password (str): Mot de passe Atlas.
+        timeout (float): Timeout de lecture en secondes.
+        max_retries (int): Nombre de nouvelles tentatives sur 429/5xx ou erreur réseau (requêtes idempotentes).
+        pool_size (int): Nombre de connexions HTTP conservées.
+    """
+
+    def __init__(self, base_url: str, user: str, password: str, timeout: float = ATLAS_TIMEOUT,
+                 max_retries: int = ATLAS_MAX_RETRIES, pool_size: int = ATLAS_POOL_SIZE):
+        base_url = _server_url(base_url)
+        self.base_url = base_url
+        self.api_url = f"{base_url}{API_PREFIX}"
+        self.timeout = (ATLAS_CONNECT_TIMEOUT, timeout)
+
+        self.max_retries = max_retries
+
+        # Méthodes idempotentes uniquement ; les POST rejouables passent par _request_with_retry
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=RETRY_BACKOFF,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
+
+        self.session = requests.Session()
+        self.session.auth = (user, password)
+        self.session.headers.update({"Content-Type": "application/json", "Accept": "application/json"})
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    # ➤ Appels bas niveau
+    def request(self, method: str, path: str, idempotent: bool = None, **kwargs) -> requests.Response:
+        """
+        Appel brut ; la réponse est renvoyée quel que soit son code HTTP.
+
+        Args:
+            idempotent (bool): Force (True) ou interdit (False) la reprise d'un POST sur
+                               429/5xx ou erreur réseau ; par défaut, seuls les POST de
+                               IDEMPOTENT_POSTS sont rejoués.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        url = f"{self.api_url}{path}"
+        if method.upper() == "POST" and (path in IDEMPOTENT_POSTS if idempotent is None else idempotent):
+            return self._request_with_retry(method, url, **kwargs)
+        return self.session.request(method, url, **kwargs)
+
+    def _request_with_retry(self, method: str, url: str, **kwargs) -> requests.Response:
+        for attempt in range(self.max_retries + 1):
+            last = attempt == self.max_retries
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if last:
+                    raise
+                delay = RETRY_BACKOFF * 2 ** attempt
+            else:
+                if response.status_code not in RETRY_STATUSES or last:
+                    return response
+                retry_after = response.headers.get("Retry-After", "")
+                delay = float(retry_after) if retry_after.isdigit() else RETRY_BACKOFF * 2 ** attempt
+            time.sleep(delay)
+
+    def call(self, method: str, path: str, **kwargs):
+        """Appel qui lève AtlasError si la réponse n'est pas 2xx, et renvoie le JSON (ou None)."""
+        response = self.request(method, path, **kwargs)
+        if not response.ok:
+            raise AtlasError(
+                f"Atlas {method} {path} → {response.status_code} : {response.text[:500]}",
+                status_code=response.status_code,
+                body=response.text
+            )
+        if not response.content:
+            return None
+        try:
+            return response.json()
+        except ValueError:
+            return None
+
+    # ➤ Entités
+    def create_entity(self, entity: dict, replace_classifications: bool = False) -> dict:
+        """Crée ou met à jour une entité (AtlasEntity) et renvoie l'EntityMutationResponse."""
+        params = {"replaceClassifications": "true"} if replace_classifications else None
+        return self.call("POST", "/entity", json={"entity": entity}, params=params)
+
+    def create_entities(self, entities: list, replace_classifications: bool = False) -> dict:
+        """Crée ou met à jour plusieurs entités en un seul appel /entity/bulk."""
+        params = {"replaceClassifications": "true"} if replace_classifications else None
+        return self.call("POST", "/entity/bulk", json={"entities": entities}, params=params)
+
+    def get_entity(self, guid: str) -> dict:
+        """Renvoie l'entité (avec ses classifications) ou None si elle n'existe pas."""
+        response = self.request("GET", f"/entity/guid/{guid}")
+        if response.status_code == 404:
+            return None
+        if not response.ok:
+            raise AtlasError(f"Atlas GET entité {guid} → {response.status_code}", response.status_code, response.text)
+        return response.json().get("entity")
+
+    def get_entities(self, guids: list, chunk_size: int = 100) -> list:
+        """Récupère plusieurs entités par GUID via /entity/bulk, par paquets."""
+        entities = []
+        for i in range(0, len(guids), chunk_size):
+            params = [("guid", guid) for guid in guids[i:i + chunk_size]]
+            params.append(("minExtInfo", "true"))
+            result = self.call("GET", "/entity/bulk", params=params) or {}
+            entities.extend(result.get("entities", []))
+        return entities
+
+    def get_entity_by_unique_attribute(self, type_name: str, qualified_name: str) -> dict:
+        response = self.request(
+            "GET", f"/entity/uniqueAttribute/type/{type_name}",
+            params={"attr:qualifiedName": qualified_name}
+        )
+        if response.status_code == 404:
+            return None
+        if not response.ok:
+            raise AtlasError(f"Atlas GET {type_name}:{qualified_name} → {response.status_code}", response.status_code, response.text)
+        return response.json().get("entity")
+
+    def delete_entity(self, guid: str) -> dict:
+        return self.call("DELETE", f"/entity/guid/{guid}")
+
+    def delete_entities(self, guids: list) -> dict:
+        """Supprime plusieurs entités en un seul appel DELETE /entity/bulk."""
+        return self.call("DELETE", "/entity/bulk", params=[("guid", guid) for guid in guids])
+
+    # ➤ Classifications
+    def add_classifications(self, guid: str, classifications: list) -> None:
+        self.call("POST", f"/entity/guid/{guid}/classifications", json=classifications)
+
+    def add_classification_to_entities(self, classification: dict, guids: list) -> None:
+        """Associe une même classification à plusieurs entités en un seul appel."""
+        self.call("POST", "/entity/bulk/classification", json={"classification": classification, "entityGuids": guids})
+
+    # ➤ Recherche & types
+    def search_basic(self, payload: dict) -> dict:
+        return self.call("POST", "/search/basic", json=payload) or {}
+
+    def get_typedefs(self) -> dict:
+        return self.call("GET", "/types/typedefs")
+
+    def create_typedefs(self, typedefs: dict) -> dict:
+        return self.call("POST", "/types/typedefs", json=typedefs)
+
+
+def mutated_guids(result: dict) -> dict:
+    """
+    Extrait les GUID d'une EntityMutationResponse.
+
+    Returns:
+        dict: {qualifiedName: guid} pour les entités créées ou mises à jour, ainsi que
+              {guid provisoire: guid} issu de guidAssignments.
+    """
+    guids = dict((result or {}).get("guidAssignments") or {})
+    for headers in ((result or {}).get("mutatedEntities") or {}).values():
+        for header in headers:
+            qualified_name = (header.get("attributes") or {}).get("qualifiedName")
+            if qualified_name and header.get("guid"):
+                guids[qualified_name] = header["guid"]
+    return guids
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_atlas_client(base_url: str = None, user: str = None, password: str = None) -> AtlasClient:
+    """Renvoie le client partagé pour cette URL et cet utilisateur (créé au premier appel)."""
+    base_url = base_url or os.getenv("ATLAS_BASE_URL") or os.getenv("ATLAS_HOST") or "http://localhost:21000"
+    user = user or os.getenv("ATLAS_USER", "admin")
+    password = password or os.getenv("ATLAS_PASSWORD", "admin")
+
+    key = (_server_url(base_url), user)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = AtlasClient(base_url, user, password)
+        return _clients[key]
@@ -1,8 +1,11 @@
 import os
-import requests
+import sys
 import json
 from dotenv import load_dotenv
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from governance.atlas_client import get_atlas_client
+
 load_dotenv()
 
 ATLAS_URL = os.getenv("ATLAS_BASE_URL")
@@ -12,12 +15,8 @@ ATLAS_PASSWORD = os.getenv("ATLAS_PASSWORD")
 with open("types_def_banque.json", "r") as f:
     types_data = json.load(f)
 
-response = requests.post(
-    f"{ATLAS_URL}/api/atlas/v2/types/typedefs",
-    auth=(ATLAS_USER, ATLAS_PASSWORD),
-    headers={"Content-Type": "application/json"},
-    json=types_data
-)
+client = get_atlas_client(ATLAS_URL, ATLAS_USER, ATLAS_PASSWORD)
+response = client.request("POST", "/types/typedefs", json=types_data)
 
 if response.status_code == 200:
     print("✅ Types enregistrés dans Apache Atlas")
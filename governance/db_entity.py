@@ -1,6 +1,6 @@
 import os
-import requests
 from dotenv import load_dotenv
+from governance.atlas_client import get_atlas_client, mutated_guids, AtlasError
 
 load_dotenv()
 
@@ -8,12 +8,36 @@ ATLAS_URL = os.getenv("ATLAS_BASE_URL")
 ATLAS_USER = os.getenv("ATLAS_USER")
 ATLAS_PASSWORD = os.getenv("ATLAS_PASSWORD")
 
-HEADERS = {"Content-Type": "application/json"}
+CLASSIFICATION_NAME = "classification_tag"
+
+def build_classified_entity(name: str, type_name: str, level: str, llm_result: str, guid: str = None) -> dict:
+    """Construit l'entité Atlas avec sa classification incluse dans le même payload."""
+    entity = {
+        "typeName": type_name,
+        "attributes": {
+            "name": name,
+            "qualifiedName": f"{name}@mycluster",
+            "description": llm_result,
+            "level": level
+        },
+        "classifications": [
+            {
+                "typeName": CLASSIFICATION_NAME,
+                "attributes": {
+                    "level": level,
+                    "justification": llm_result
+                }
+            }
+        ]
+    }
+    if guid:
+        entity["guid"] = guid
+    return entity
 
 def push_entity_and_classify(name: str, type_name: str, level: str, llm_result: str):
     """
-    Crée ou récupère une entité dans Apache Atlas,
-    puis lui assigne une classification.
+    Crée ou met à jour une entité dans Apache Atlas avec sa classification,
+    en un seul appel.
 
     Args:
         name (str): Nom de l'entité (table ou collection).
@@ -23,74 +47,69 @@ def push_entity_and_classify(name: str, type_name: str, level: str, llm_result:
     Returns:
         guid (str): Identifiant unique de l'entité dans Atlas.
     """
+    client = get_atlas_client(ATLAS_URL, ATLAS_USER, ATLAS_PASSWORD)
+    entity_data = build_classified_entity(name, type_name, level, llm_result, guid="-1")
 
-    # Exemple simplifié : création entité JSON
-    entity_data = {
-        "entity": {
-            "typeName": type_name,
-            "attributes": {
-                "name": name,
-                "qualifiedName": f"{name}@mycluster",
-                "description": llm_result,
-                "level": level
-            }
-        }
-    }
-
-    # Création entité dans Atlas
-    url = f"{ATLAS_URL}/api/atlas/v2/entity"
-    response = requests.post(url, auth=(ATLAS_USER, ATLAS_PASSWORD), json=entity_data, headers=HEADERS)
-    if not response.ok:
-        # En cas d'erreur, vérifier si entité existe déjà, récupérer son GUID
-        # Pour simplifier, on raise l’erreur
-        raise Exception(f"❌ Erreur lors de l'envoi vers Atlas : {response.text}")
-
-    # Récupérer GUID entité créée
-    guid = response.json().get("guidAssignments", {}).get(name)
-    if not guid:
-        # Si pas dans guidAssignments, essayer dans entities
-        entities = response.json().get("entities", [])
-        if entities and "guid" in entities[0]:
-            guid = entities[0]["guid"]
+    # Création/mise à jour de l'entité et de sa classification ; le GUID est dans la réponse
+    try:
+        result = client.create_entity(entity_data, replace_classifications=True)
+    except AtlasError as e:
+        raise Exception(f"❌ Erreur lors de l'envoi vers Atlas : {e.body}")
 
+    guids = mutated_guids(result)
+    guid = guids.get("-1") or guids.get(entity_data["attributes"]["qualifiedName"])
     if not guid:
         raise Exception("❌ Impossible de récupérer le GUID de l'entité.")
 
-    # Assigner la classification avec le nom de tag, par exemple 'classification_tag'
-    classification_name = "classification_tag"
-    classification_url = f"{ATLAS_URL}/api/atlas/v2/entity/guid/{guid}/classifications"
-    classification_data = {
-        "classificationName": classification_name,
-        "attributes": {
-            "level": level,
-            "justification": llm_result
-        }
-    }
-
-    class_response = requests.post(classification_url, auth=(ATLAS_USER, ATLAS_PASSWORD), json=classification_data, headers=HEADERS)
-    # Gestion si classification déjà existante
-    if class_response.status_code == 400 and "already associated with classification" in class_response.text:
-        print(f"ℹ️ Classification '{classification_name}' déjà présente sur {name}.")
-    elif not class_response.ok:
-        raise Exception(f"❌ Erreur lors de l'ajout de classification : {class_response.text}")
-
     print(f"✅ Entité '{name}' créée et classifiée avec niveau {level}.")
 
     return guid
 
 
+def push_entities_and_classify(items: list, chunk_size: int = 50) -> dict:
+    """
+    Version groupée de push_entity_and_classify : un appel /entity/bulk par paquet.
+
+    Args:
+        items (list): Liste de dicts {name, type_name, level, llm_result}.
+        chunk_size (int): Nombre d'entités par appel.
+    Returns:
+        dict: {nom: guid} des entités enregistrées.
+    """
+    client = get_atlas_client(ATLAS_URL, ATLAS_USER, ATLAS_PASSWORD)
+    pushed = {}
+    for i in range(0, len(items), chunk_size):
+        chunk = items[i:i + chunk_size]
+        entities = [
+            build_classified_entity(item["name"], item["type_name"], item["level"], item["llm_result"], guid=f"-{n}")
+            for n, item in enumerate(chunk, start=1)
+        ]
+        try:
+            result = client.create_entities(entities, replace_classifications=True)
+        except AtlasError as e:
+            raise Exception(f"❌ Erreur lors de l'envoi groupé vers Atlas : {e.body}")
+
+        guids = mutated_guids(result)
+        for entity, item in zip(entities, chunk):
+            guid = guids.get(entity["guid"]) or guids.get(entity["attributes"]["qualifiedName"])
+            if guid:
+                pushed[item["name"]] = guid
+    print(f"✅ {len(pushed)}/{len(items)} entité(s) créée(s) et classifiée(s).")
+    return pushed
+
+
 def get_all_entities_from_atlas():
     """
     Récupère toutes les entités de type postgres_table et mongo_collection
     avec leurs classifications depuis Apache Atlas.
     """
-    url = f"{ATLAS_URL}/api/atlas/v2/search/basic"
+    client = get_atlas_client(ATLAS_URL, ATLAS_USER, ATLAS_PASSWORD)
     params = {
         "typeName": "postgres_table,mongo_collection",
         "excludeDeletedEntities": "true",
         "includeClassification": "true"
     }
-    response = requests.get(url, auth=(ATLAS_USER, ATLAS_PASSWORD), params=params, headers=HEADERS)
+    response = client.request("GET", "/search/basic", params=params)
     if not response.ok:
         raise Exception(f"Erreur lors de la récupération des entités : {response.text}")
     results = response.json().get("entities", [])
@@ -0,0 +1,326 @@
+"""
+Serveur Apache Atlas factice, en mémoire, pour les exécutions hors ligne.
+
+Implémente le sous-ensemble de l'API REST v2 utilisé par le projet : entity,
+entity/bulk, entity/guid, uniqueAttribute, classifications, search/basic et
+types/typedefs. L'authentification est ignorée. Il suffit de pointer les variables
+ATLAS_BASE_URL / ATLAS_HOST / ATLAS_URL habituelles vers lui.
+
+Usage :
+  python -m governance.fake_atlas --port 21000 --latency-ms 20 --error-rate 0.01
+
+Ou dans un processus :
+  server = start_fake_atlas(port=0)    # port libre choisi automatiquement
+  ...
+  server.shutdown()
+"""
+
+import re
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+API_PREFIX = "/api/atlas/v2"
+
+
+class AtlasStore:
+    """État en mémoire : entités par GUID et définitions de types."""
+
+    def __init__(self):
+        self.entities = {}
+        self.typedefs = {"entityDefs": [], "classificationDefs": [], "enumDefs": [], "structDefs": [], "relationshipDefs": []}
+        self.lock = threading.RLock()
+
+    def find_guid(self, type_name: str, qualified_name: str):
+        for guid, entity in self.entities.items():
+            if entity["typeName"] == type_name and entity["attributes"].get("qualifiedName") == qualified_name:
+                return guid
+        return None
+
+    def upsert(self, entities: list, replace_classifications: bool = False) -> dict:
+        mutated = {"CREATE": [], "UPDATE": []}
+        assignments = {}
+        with self.lock:
+            for incoming in entities:
+                type_name = incoming.get("typeName")
+                attributes = dict(incoming.get("attributes") or {})
+                classifications = incoming.get("classifications")
+                guid = self.find_guid(type_name, attributes.get("qualifiedName"))
+
+                if guid and self.entities[guid]["status"] == "ACTIVE":
+                    entity = self.entities[guid]
+                    entity["attributes"].update(attributes)
+                    if classifications is not None and replace_classifications:
+                        entity["classifications"] = self._classifications(guid, classifications)
+                    mutated["UPDATE"].append(self.header(entity))
+                else:
+                    guid = str(uuid.uuid4())
+                    entity = {
+                        "guid": guid,
+                        "typeName": type_name,
+                        "status": "ACTIVE",
+                        "attributes": attributes,
+                        "relationshipAttributes": incoming.get("relationshipAttributes") or {},
+                        "classifications": self._classifications(guid, classifications or []),
+                        "createTime": int(time.time() * 1000)
+                    }
+                    self.entities[guid] = entity
+                    mutated["CREATE"].append(self.header(entity))
+
+                placeholder = incoming.get("guid")
+                if placeholder and str(placeholder).startswith("-"):
+                    assignments[placeholder] = guid
+
+        return {
+            "mutatedEntities": {k: v for k, v in mutated.items() if v},
+            "guidAssignments": assignments
+        }
+
+    @staticmethod
+    def _classifications(guid: str, classifications: list) -> list:
+        return [dict(c, entityGuid=guid, entityStatus="ACTIVE") for c in classifications]
+
+    @staticmethod
+    def header(entity: dict) -> dict:
+        return {
+            "guid": entity["guid"],
+            "typeName": entity["typeName"],
+            "status": entity["status"],
+            "attributes": {
+                "name": entity["attributes"].get("name"),
+                "qualifiedName": entity["attributes"].get("qualifiedName")
+            },
+            "displayText": entity["attributes"].get("name"),
+            "classificationNames": [c["typeName"] for c in entity["classifications"]],
+            "classifications": entity["classifications"]
+        }
+
+    def delete(self, guids: list) -> dict:
+        deleted = []
+        with self.lock:
+            for guid in guids:
+                entity = self.entities.get(guid)
+                if entity and entity["status"] == "ACTIVE":
+                    entity["status"] = "DELETED"
+                    deleted.append(self.header(entity))
+        return {"mutatedEntities": {"DELETE": deleted}} if deleted else {}
+
+    def search(self, params: dict) -> dict:
+        type_names = [t for t in str(params.get("typeName") or "").split(",") if t]
+        exclude_deleted = str(params.get("excludeDeletedEntities", "false")).lower() == "true"
+        filters = params.get("entityFilters")
+        limit = int(params.get("limit") or 100)
+        offset = int(params.get("offset") or 0)
+
+        with self.lock:
+            matches = [
+                e for e in self.entities.values()
+                if (not type_names or e["typeName"] in type_names)
+                and (not exclude_deleted or e["status"] == "ACTIVE")
+                and (not filters or _matches(e, filters))
+            ]
+        matches.sort(key=lambda e: e["createTime"])
+        page = matches[offset:offset + limit]
+        return {
+            "queryType": "BASIC",
+            "approximateCount": len(matches),
+            "entities": [self.header(e) for e in page]
+        }
+
+
+def _matches(entity: dict, criteria: dict) -> bool:
+    if "criterion" in criteria:
+        results = (_matches(entity, c) for c in criteria["criterion"])
+        return any(results) if criteria.get("condition", "AND").upper() == "OR" else all(results)
+
+    value = str(entity["attributes"].get(criteria.get("attributeName"), ""))
+    expected = str(criteria.get("attributeValue", ""))
+    operator = criteria.get("operator", "=").lower()
+    if operator in ("=", "eq"):
+        return value == expected
+    if operator in ("!=", "neq"):
+        return value != expected
+    if operator == "like":
+        return re.fullmatch(re.escape(expected).replace(r"\*", ".*"), value) is not None
+    if operator in ("startswith", "begins_with"):
+        return value.startswith(expected)
+    if operator in ("endswith", "ends_with"):
+        return value.endswith(expected)
+    if operator == "contains":
+        return expected in value
+    return False
+
+
+class FakeAtlasHandler(BaseHTTPRequestHandler):
+    server_version = "FakeAtlas/0.1"
+    protocol_version = "HTTP/1.1"  # keep-alive, comme un vrai serveur
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            super().log_message(fmt, *args)
+
+    # ➤ Utilitaires
+    def _send(self, status: int, body=None):
+        payload = b"" if body is None else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return None
+        return json.loads(self.rfile.read(length).decode("utf-8"))
+
+    def _dispatch(self, method: str):
+        server = self.server
+        if server.latency_ms:
+            time.sleep(server.latency_ms / 1000 * (0.5 + server.rng.random()))
+        if server.error_rate and server.rng.random() < server.error_rate:
+            self._body()
+            return self._send(503, {"errorMessage": "Erreur simulée"})
+
+        url = urlparse(self.path)
+        if not url.path.startswith(API_PREFIX):
+            return self._send(404, {"errorMessage": f"Chemin inconnu : {url.path}"})
+        path = url.path[len(API_PREFIX):]
+        query = parse_qs(url.query)
+        body = self._body() if method in ("POST", "PUT") else None
+
+        try:
+            status, result = self.route(method, path, query, body)
+        except (ValueError, KeyError, TypeError) as exc:
+            status, result = 400, {"errorMessage": f"Requête invalide : {exc}"}
+        self._send(status, result)
+
+    def route(self, method: str, path: str, query: dict, body):
+        store = self.server.store
+        replace = query.get("replaceClassifications", ["false"])[0].lower() == "true"
+
+        if path == "/entity" and method == "POST":
+            return 200, store.upsert([body["entity"]], replace)
+
+        if path == "/entity/bulk":
+            if method == "POST":
+                return 200, store.upsert(body["entities"], replace)
+            if method == "GET":
+                with store.lock:
+                    found = [store.entities[g] for g in query.get("guid", []) if g in store.entities]
+                return 200, {"entities": found}
+            if method == "DELETE":
+                return 200, store.delete(query.get("guid", []))
+
+        if path == "/entity/bulk/classification" and method == "POST":
+            with store.lock:
+                for guid in body["entityGuids"]:
+                    entity = store.entities.get(guid)
+                    if entity:
+                        entity["classifications"].append(dict(body["classification"], entityGuid=guid))
+            return 204, None
+
+        match = re.fullmatch(r"/entity/uniqueAttribute/type/([^/]+)", path)
+        if match and method == "GET":
+            guid = store.find_guid(match.group(1), query.get("attr:qualifiedName", [None])[0])
+            if not guid:
+                return 404, {"errorCode": "ATLAS-404-00-009", "errorMessage": "Entité introuvable"}
+            return 200, {"entity": store.entities[guid]}
+
+        match = re.fullmatch(r"/entity/guid/([^/]+)(/classifications)?", path)
+        if match:
+            guid, classifications_path = match.groups()
+            entity = store.entities.get(guid)
+            if not entity:
+                return 404, {"errorCode": "ATLAS-404-00-005", "errorMessage": f"GUID {guid} introuvable"}
+            if classifications_path and method == "POST":
+                incoming = body if isinstance(body, list) else [{
+                    "typeName": body.get("classificationName") or body.get("typeName"),
+                    "attributes": body.get("attributes", {})
+                }]
+                with store.lock:
+                    existing = {c["typeName"] for c in entity["classifications"]}
+                    for c in incoming:
+                        if c["typeName"] in existing:
+                            return 400, {"errorMessage": f"entity {guid} is already associated with classification {c['typeName']}"}
+                    entity["classifications"] += store._classifications(guid, incoming)
+                return 204, None
+            if method == "GET":
+                return 200, {"entity": entity}
+            if method == "DELETE":
+                return 200, store.delete([guid])
+
+        if path == "/search/basic":
+            params = body if method == "POST" else {k: v[0] for k, v in query.items()}
+            return 200, store.search(params or {})
+
+        if path == "/types/typedefs":
+            if method == "GET":
+                return 200, store.typedefs
+            if method == "POST":
+                with store.lock:
+                    for key, defs in (body or {}).items():
+                        store.typedefs.setdefault(key, []).extend(defs)
+                return 200, body
+
+        return 404, {"errorMessage": f"Endpoint non simulé : {method} {path}"}
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+
+class FakeAtlasServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 21000, latency_ms: float = 0,
+                 error_rate: float = 0, seed: int = 0, verbose: bool = False):
+        super().__init__((host, port), FakeAtlasHandler)
+        self.store = AtlasStore()
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.verbose = verbose
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_fake_atlas(host: str = "127.0.0.1", port: int = 0, **kwargs) -> FakeAtlasServer:
+    """Démarre le serveur dans un thread de fond et le renvoie (server.url donne l'adresse)."""
+    server = FakeAtlasServer(host, port, **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serveur Apache Atlas factice en mémoire")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=21000)
+    parser.add_argument("--latency-ms", type=float, default=0, help="Latence moyenne injectée par requête")
+    parser.add_argument("--error-rate", type=float, default=0, help="Probabilité de réponse 503, entre 0 et 1")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="Journaliser chaque requête")
+    args = parser.parse_args()
+
+    server = FakeAtlasServer(args.host, args.port, args.latency_ms, args.error_rate, args.seed, args.verbose)
+    print(f"🛰️  Atlas factice à l'écoute sur {server.url}{API_PREFIX}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑  Arrêt du serveur.")
@@ -1,13 +1,12 @@
 import os
-import requests
 from dotenv import load_dotenv
+from governance.atlas_client import get_atlas_client
 
 load_dotenv()
 
 ATLAS_URL = os.getenv("ATLAS_BASE_URL")
 ATLAS_USER = os.getenv("ATLAS_USER")
 ATLAS_PASSWORD = os.getenv("ATLAS_PASSWORD")
-HEADERS = {"Content-Type": "application/json"}
 
 def push_llm_justification(source_name, source_type, fcro, justification):
     """
@@ -28,12 +27,8 @@ def push_llm_justification(source_name, source_type, fcro, justification):
         }
     }
 
-    res = requests.post(
-        f"{ATLAS_URL}/api/atlas/v2/entity",
-        auth=(ATLAS_USER, ATLAS_PASSWORD),
-        headers=HEADERS,
-        json=entity
-    )
+    client = get_atlas_client(ATLAS_URL, ATLAS_USER, ATLAS_PASSWORD)
+    res = client.request("POST", "/entity", json=entity)
 
     if res.status_code == 200:
         print(f"✅ Justification LLM ajoutée pour {source_name}")
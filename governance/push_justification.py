@@ -1,12 +1,11 @@
 import os
-import requests
 from dotenv import load_dotenv
+from governance.atlas_client import get_atlas_client
 
 load_dotenv()
 
 ATLAS_URL = os.getenv("ATLAS_URL", "http://localhost:21000/api/atlas/v2")
 AUTH = (os.getenv("ATLAS_USER", "admin"), os.getenv("ATLAS_PASSWORD", "admin"))
-HEADERS = {"Content-Type": "application/json"}
 
 def push_justification_to_atlas(parent_guid, related_entity_type, related_entity_name, justification_text, niveau):
     """
@@ -40,12 +39,8 @@ def push_justification_to_atlas(parent_guid, related_entity_type, related_entity
         }
     }
 
-    response = requests.post(
-        f"{ATLAS_URL}/entity",
-        headers=HEADERS,
-        auth=AUTH,
-        json=entity_data
-    )
+    client = get_atlas_client(ATLAS_URL, *AUTH)
+    response = client.request("POST", "/entity", json=entity_data)
 
     if response.status_code == 200:
         print("✅ Justification poussée avec succès")
@@ -1,7 +1,6 @@
-import requests
 import os
 from dotenv import load_dotenv
-from requests.auth import HTTPBasicAuth
+from governance.atlas_client import get_atlas_client
 
 load_dotenv()
 
@@ -14,8 +13,6 @@ def push_llm_justification(entity_name: str, entity_type: str, justification_tex
     """
     Enregistre une justification LLM dans Apache Atlas en tant qu'entité 'llm_justification'
     """
-    url = f"{ATLAS_URL}/api/atlas/v2/entity"
-
     # 📦 Définition de l'entité justification
     entity_data = {
         "entities": [
@@ -33,13 +30,9 @@ def push_llm_justification(entity_name: str, entity_type: str, justification_tex
         ]
     }
 
-    headers = {"Content-Type": "application/json"}
-    response = requests.post(
-        url,
-        json=entity_data,
-        headers=headers,
-        auth=HTTPBasicAuth(ATLAS_USER, ATLAS_PASSWORD)
-    )
+    # Payload au format AtlasEntitiesWithExtInfo → endpoint bulk
+    client = get_atlas_client(ATLAS_URL, ATLAS_USER, ATLAS_PASSWORD)
+    response = client.request("POST", "/entity/bulk", json=entity_data)
 
     if response.status_code == 200:
         print(f"✅ Justification ajoutée pour : {entity_name}")
@@ -1,5 +1,8 @@
 import os
+import sys
 from dotenv import load_dotenv
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from push_justification import push_justification_to_atlas
 
 # 🔐 Charger les variables d’environnement (.env)
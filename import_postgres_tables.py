@@ -2,96 +2,98 @@
 # -*- coding: utf-8 -*-
 
 """
-Importer automatiquement toutes les tables PostgreSQL (schéma public)
+Importer automatiquement toutes les tables PostgreSQL (schéma public par défaut)
 comme entités postgres_table dans Apache Atlas.
 
 Prérequis :
   pip install psycopg2-binary requests python-dotenv
+
+Exemples :
+  python import_postgres_tables.py
+  python import_postgres_tables.py --bulk --chunk-size 100 --workers 4 --schemas public,finance
 """
 
 import os
 import json
-import psycopg2
+import argparse
 import requests
-from requests.auth import HTTPBasicAuth
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
+from governance.atlas_client import get_atlas_client
+from database.pg_catalog import load_schema_snapshot
+from database.pg_pool import get_connection
+from services import startup_report
 
 # Chargement des variables d'environnement depuis .env
 load_dotenv()
 
-# DEBUG temporaire: vérifier que la variable est bien chargée
-print("DEBUG PG_PASSWORD:", repr(os.getenv("PG_PASSWORD")))
-
-# Paramètres PostgreSQL
-PG_DB       = os.getenv("PG_DB",       "banque")
-PG_USER     = os.getenv("PG_USER",     "postgres")
-PG_PASSWORD = os.getenv("PG_PASSWORD", "postgres")
-PG_HOST     = os.getenv("PG_HOST",     "localhost")
-PG_PORT     = int(os.getenv("PG_PORT", "5433"))  # Met 5432 par défaut
-
 # Paramètres Apache Atlas
 ATLAS_HOST      = os.getenv("ATLAS_HOST", "http://localhost:21000")
 ATLAS_USER      = os.getenv("ATLAS_USER", "admin")
 ATLAS_PASSWORD  = os.getenv("ATLAS_PASSWORD", "admin")
 ATLAS_CLUSTER   = os.getenv("ATLAS_CLUSTER", "cluster01")   # suffixe du qualifiedName
-ATLAS_API       = f"{ATLAS_HOST.rstrip('/')}/api/atlas/v2/entity"
 
-HEADERS = {"Content-Type": "application/json"}
+
+def get_database_identity() -> tuple:
+    """
+    (base, utilisateur) de la connexion du pool : le qualifiedName suit la base réellement
+    lue, quelle que soit la variable qui l'a fournie (POSTGRES_* ou PG_*).
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT current_database(), current_user")
+            return cur.fetchone()
+
 
 def get_tables(schema: str = "public") -> list:
     """Retourne la liste des tables d'un schéma PostgreSQL."""
-    conn = psycopg2.connect(
-        host     = PG_HOST,
-        port     = PG_PORT,
-        dbname   = PG_DB,
-        user     = PG_USER,
-        password = PG_PASSWORD
-    )
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT table_name
-        FROM information_schema.tables
-        WHERE table_schema = %s AND table_type = 'BASE TABLE';
-        """,
-        (schema,)
-    )
-    tables = [row[0] for row in cur.fetchall()]
-    cur.close()
-    conn.close()
-    return tables
-
-
-def build_payload(table_name: str, schema: str = "public") -> dict:
+    return get_tables_by_schema([schema])[schema]
+
+
+def get_tables_by_schema(schemas: list) -> dict:
+    """Retourne {schéma: [tables]} pour plusieurs schémas, en une seule lecture du catalogue."""
+    with get_connection() as conn:
+        snapshot = load_schema_snapshot(conn)
+    return {schema: snapshot.table_names(schema, base_only=True) for schema in schemas}
+
+
+def build_payload(table_name: str, schema: str, db_name: str, owner: str) -> dict:
     """Construit le JSON attendu par Atlas pour une table PostgreSQL."""
-    qualified_name = f"{PG_DB}.{schema}.{table_name}@{ATLAS_CLUSTER}"
-    schema_qualified_name = f"{PG_DB}.{schema}@{ATLAS_CLUSTER}"
-    db_qualified_name = f"{PG_DB}@{ATLAS_CLUSTER}"
+    return {"entities": [build_entity(table_name, schema, db_name, owner)]}
+
+
+def build_entity(table_name: str, schema: str, db_name: str, owner: str) -> dict:
+    """
+    Construit l'entité postgres_table d'une table PostgreSQL.
+
+    Args:
+        db_name (str): Base PostgreSQL, préfixe du qualifiedName (voir get_database_identity).
+        owner (str): Utilisateur PostgreSQL, reporté comme propriétaire.
+    """
+    qualified_name = f"{db_name}.{schema}.{table_name}@{ATLAS_CLUSTER}"
+    schema_qualified_name = f"{db_name}.{schema}@{ATLAS_CLUSTER}"
+    db_qualified_name = f"{db_name}@{ATLAS_CLUSTER}"
 
     return {
-        "entities": [
-            {
-                "typeName": "postgres_table",
-                "attributes": {
-                    "name": table_name,
-                    "qualifiedName": qualified_name,
-                    "owner": PG_USER,
-                    "description": f"Table PostgreSQL '{schema}.{table_name}' importée automatiquement",
-                    "schema": {
-                        "typeName": "postgres_schema",
-                        "uniqueAttributes": {
-                            "qualifiedName": schema_qualified_name
-                        }
-                    },
-                    "db": {
-                        "typeName": "postgres_db",
-                        "uniqueAttributes": {
-                            "qualifiedName": db_qualified_name
-                        }
-                    }
+        "typeName": "postgres_table",
+        "attributes": {
+            "name": table_name,
+            "qualifiedName": qualified_name,
+            "owner": owner,
+            "description": f"Table PostgreSQL '{schema}.{table_name}' importée automatiquement",
+            "schema": {
+                "typeName": "postgres_schema",
+                "uniqueAttributes": {
+                    "qualifiedName": schema_qualified_name
+                }
+            },
+            "db": {
+                "typeName": "postgres_db",
+                "uniqueAttributes": {
+                    "qualifiedName": db_qualified_name
                 }
             }
-        ]
+        }
     }
 
 
@@ -103,13 +105,9 @@ def send_to_atlas(payload: dict) -> None:
     print(json.dumps(payload, indent=2, ensure_ascii=False))
 
     try:
-        resp = requests.post(
-            ATLAS_API,
-            headers=HEADERS,
-            data=json.dumps(payload),
-            auth=HTTPBasicAuth(ATLAS_USER, ATLAS_PASSWORD),
-            timeout=30
-        )
+        # Le payload est au format AtlasEntitiesWithExtInfo ("entities") → endpoint bulk
+        client = get_atlas_client(ATLAS_HOST, ATLAS_USER, ATLAS_PASSWORD)
+        resp = client.request("POST", "/entity/bulk", json=payload)
     except requests.exceptions.RequestException as exc:
         print(f"💥  Exception réseau : {exc}")
         return
@@ -124,22 +122,104 @@ def send_to_atlas(payload: dict) -> None:
             print(resp.text)
 
 
+def send_chunk(entities: list) -> tuple:
+    """Envoie un paquet d'entités via /entity/bulk. Retourne (succès, message d'erreur)."""
+    try:
+        client = get_atlas_client(ATLAS_HOST, ATLAS_USER, ATLAS_PASSWORD)
+        resp = client.request("POST", "/entity/bulk", json={"entities": entities})
+    except requests.exceptions.RequestException as exc:
+        return False, f"Exception réseau : {exc}"
+
+    if resp.status_code in (200, 201):
+        return True, ""
+    return False, f"Erreur {resp.status_code} : {resp.text[:300]}"
+
+
+def send_bulk(entities: list, chunk_size: int = 50, workers: int = 4, retries: int = 2) -> list:
+    """
+    Envoie les entités à Atlas par paquets concurrents.
+
+    Un appel /entity/bulk est atomique : si un paquet échoue, seules ses entités sont
+    renvoyées au tour suivant, en paquets deux fois plus petits pour isoler les fautives.
+
+    Args:
+        entities (list): Entités construites par build_entity.
+        chunk_size (int): Nombre d'entités par appel.
+        workers (int): Nombre d'appels simultanés.
+        retries (int): Nombre de tours de renvoi des entités en échec.
+    Returns:
+        list: Entités toujours en échec après les renvois.
+    """
+    pending = entities
+    for attempt in range(retries + 1):
+        if attempt:
+            chunk_size = max(1, chunk_size // 2)
+            print(f"\n🔁  Renvoi de {len(pending)} entité(s) en échec (paquets de {chunk_size})…")
+
+        chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+        failed = []
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(send_chunk, chunk): (n, chunk) for n, chunk in enumerate(chunks, start=1)}
+            for future in as_completed(futures):
+                n, chunk = futures[future]
+                ok, error = future.result()
+                if ok:
+                    print(f"✅  Paquet {n}/{len(chunks)} : {len(chunk)} table(s) importée(s).")
+                else:
+                    names = [e["attributes"]["name"] for e in chunk]
+                    print(f"❌  Paquet {n}/{len(chunks)} ({len(chunk)} table(s)) : {error}")
+                    print(f"    Tables : {', '.join(names)}")
+                    failed.extend(chunk)
+
+        pending = failed
+        if not pending:
+            break
+    return pending
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import des tables PostgreSQL dans Apache Atlas")
+    parser.add_argument("--schemas", default="public", help="Schémas à importer, séparés par des virgules")
+    parser.add_argument("--bulk", action="store_true", help="Envoyer les tables par paquets via /entity/bulk")
+    parser.add_argument("--chunk-size", type=int, default=50, help="Nombre de tables par paquet (mode --bulk)")
+    parser.add_argument("--workers", type=int, default=4, help="Paquets envoyés simultanément (mode --bulk)")
+    parser.add_argument("--retries", type=int, default=2, help="Tours de renvoi des tables en échec (mode --bulk)")
+    args = parser.parse_args()
+    schemas = [s.strip() for s in args.schemas.split(",") if s.strip()]
+    startup_report("import_postgres_tables.py")
+
+    import psycopg2
     print("📡  Connexion à PostgreSQL…")
     try:
-        tables = get_tables()
+        db_name, owner = get_database_identity()
+        tables_by_schema = get_tables_by_schema(schemas)
     except psycopg2.Error as db_err:
         print(f"💥  Impossible de se connecter à PostgreSQL : {db_err}")
         exit(1)
 
-    if not tables:
-        print("⚠️  Aucune table trouvée dans le schéma 'public'.")
-        exit(0)
+    for schema, tables in tables_by_schema.items():
+        if not tables:
+            print(f"⚠️  Aucune table trouvée dans le schéma '{schema}'.")
+        else:
+            print(f"🔎  {len(tables)} table(s) détectée(s) dans '{schema}' : {tables}")
 
-    print(f"🔎  {len(tables)} table(s) détectée(s) : {tables}")
+    if not any(tables_by_schema.values()):
+        exit(0)
 
-    for tbl in tables:
-        payload = build_payload(tbl)
-        send_to_atlas(payload)
+    if args.bulk:
+        entities = [
+            build_entity(tbl, schema, db_name, owner)
+            for schema, tables in tables_by_schema.items()
+            for tbl in tables
+        ]
+        failed = send_bulk(entities, args.chunk_size, args.workers, args.retries)
+        print(f"\n📊  {len(entities) - len(failed)}/{len(entities)} table(s) importée(s).")
+        if failed:
+            print(f"❌  Échec définitif : {', '.join(e['attributes']['qualifiedName'] for e in failed)}")
+    else:
+        for schema, tables in tables_by_schema.items():
+            for tbl in tables:
+                payload = build_payload(tbl, schema, db_name, owner)
+                send_to_atlas(payload)
 
     print("\n🏁  Import terminé.")
@@ -0,0 +1,182 @@
+"""
+Registre des services partagés, initialisés à la première utilisation.
+
+Aucun import de SDK lourd ni aucune connexion n'a lieu à l'import des modules : un
+outil qui ne touche qu'Atlas ne charge ni psycopg2, ni pymongo, ni google.generativeai.
+Chaque service est créé une fois par processus, au premier get(), et sa durée
+d'initialisation est mesurée.
+
+  postgres   pool de connexions (psycopg2), résolu par database.pg_pool.get_connection
+  mongo      client MongoDB (pymongo), MONGO_URI / MONGO_DB, résolu par get_mongo_db
+
+Le client Atlas (governance.atlas_client.get_atlas_client) et les modèles LLM
+(classification.llm_backend.get_model) dépendent de leurs arguments (URL, préfixe de
+prompt) : ils gardent leurs propres caches et sont eux aussi créés au premier appel.
+
+Variables d'environnement :
+  STARTUP_TIMING   1 pour afficher le temps de démarrage des points d'entrée (défaut 0)
+
+Usage CLI (temps d'import de chaque point d'entrée dans un processus neuf) :
+  python -m services
+  python -m services delete import_postgres_tables
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+import subprocess
+
+STARTUP_TIMING = os.getenv("STARTUP_TIMING", "0") == "1"
+
+# Instant de référence si la date de lancement du processus n'est pas lisible
+_imported_at = time.time()
+
+# Modules dont la présence après import signale un chargement anticipé
+HEAVY_MODULES = ["psycopg2", "pymongo", "pandas", "google.generativeai", "llama_cpp", "faiss", "sentence_transformers", "streamlit"]
+ENTRY_POINTS = ["delete", "import_postgres_tables", "classify_all"]
+
+
+class ServiceRegistry:
+    """
+    Fabriques de services nommés ; chaque instance est créée au premier get().
+
+    Un service enregistré avec cache=False gère lui-même son cycle de vie (pool recréé
+    après fermeture, client par URL…) : sa fabrique est rappelée à chaque get(), seul
+    le premier appel est chronométré.
+    """
+
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        self._timings = {}
+        self._lock = threading.RLock()
+
+    def register(self, name: str, factory, cache: bool = True) -> None:
+        self._factories[name] = (factory, cache)
+
+    def get(self, name: str):
+        if name in self._instances:
+            return self._instances[name]
+        if name not in self._factories:
+            raise KeyError(f"❌ Service inconnu : {name}")
+        factory, cache = self._factories[name]
+        if not cache and name in self._timings:
+            return factory()
+        with self._lock:
+            if name in self._instances:
+                return self._instances[name]
+            started = time.perf_counter()
+            instance = factory()
+            if name not in self._timings:
+                self._timings[name] = time.perf_counter() - started
+                if STARTUP_TIMING:
+                    print(f"🔌 Service '{name}' initialisé en {self._timings[name]:.2f}s")
+            if cache:
+                self._instances[name] = instance
+            return instance
+
+    def is_ready(self, name: str) -> bool:
+        return name in self._instances
+
+    def reset(self, name: str = None) -> None:
+        """Oublie un service (ou tous) ; il sera recréé au prochain get()."""
+        with self._lock:
+            for key in [name] if name else list(self._instances):
+                instance = self._instances.pop(key, None)
+                self._timings.pop(key, None)
+                close = getattr(instance, "close", None)
+                if callable(close):
+                    close()
+
+    def timings(self) -> dict:
+        return dict(self._timings)
+
+
+registry = ServiceRegistry()
+
+
+def _postgres():
+    from database.pg_pool import get_pool
+    return get_pool()
+
+
+def _mongo():
+    import pymongo
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    return pymongo.MongoClient(os.getenv("MONGO_URI"))
+
+
+registry.register("postgres", _postgres, cache=False)
+registry.register("mongo", _mongo)
+
+
+def get_mongo_db():
+    """Base MongoDB (MONGO_DB) du client partagé."""
+    return registry.get("mongo")[os.getenv("MONGO_DB")]
+
+
+def process_uptime() -> float:
+    """Secondes écoulées depuis le lancement de l'interpréteur (Linux), sinon depuis l'import de ce module."""
+    try:
+        with open("/proc/self/stat", "r") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime", "r") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return time.time() - _imported_at
+
+
+def startup_report(entry_point: str, started: float = None) -> None:
+    """
+    Affiche le temps de démarrage d'un point d'entrée si STARTUP_TIMING=1.
+
+    Args:
+        entry_point (str): Nom affiché (script ou page).
+        started (float): time.perf_counter() au début du script ; par défaut, lancement du processus.
+                         Les pages Streamlit le passent : leur processus sert plusieurs reruns.
+    """
+    if not STARTUP_TIMING:
+        return
+    elapsed = time.perf_counter() - started if started is not None else process_uptime()
+    loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+    services = ", ".join(f"{name} {duration:.2f}s" for name, duration in registry.timings().items())
+    print(
+        f"⏱️  {entry_point} prêt en {elapsed:.2f}s — SDK chargés : {', '.join(loaded) or 'aucun'}"
+        + (f" — services : {services}" if services else "")
+    )
+
+
+def measure_imports(module: str) -> tuple:
+    """Importe module dans un interpréteur neuf ; renvoie (secondes, SDK lourds chargés) ou (None, erreur)."""
+    code = (
+        "import sys, time; started = time.perf_counter(); import " + module + "; "
+        "print('@@', time.perf_counter() - started, ','.join(m for m in " + repr(HEAVY_MODULES) + " if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        return None, (result.stderr.strip().splitlines() or ["erreur inconnue"])[-1]
+    # Dernière ligne : '@@ <secondes> <modules>' (le module importé peut lui-même afficher du texte)
+    marker = [line for line in result.stdout.splitlines() if line.startswith("@@ ")][-1].split(" ")
+    return float(marker[1]), marker[2] if len(marker) > 2 else ""
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Temps d'import des points d'entrée, chacun dans un processus neuf")
+    parser.add_argument("modules", nargs="*", default=ENTRY_POINTS, help="Modules à importer (défaut : scripts du projet)")
+    args = parser.parse_args()
+
+    for module in args.modules:
+        duration, detail = measure_imports(module)
+        if duration is None:
+            print(f"❌ {module} : {detail}")
+        else:
+            print(f"⏱️  {module:<32} {duration:.2f}s — SDK chargés : {detail or 'aucun'}")
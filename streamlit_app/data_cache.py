@@ -0,0 +1,114 @@
+"""
+Caches Streamlit partagés par les pages et le dashboard.
+
+Streamlit réexécute le script de la page à chaque interaction : sans cache, chaque clic
+relisait le catalogue PostgreSQL, la liste des collections et les aperçus. Ici :
+
+  - les listes et aperçus sont mis en cache (st.cache_data) avec une durée de vie ;
+  - côté PostgreSQL, la clé de cache inclut les compteurs de modification de
+    pg_stat_user_tables : une table modifiée, créée, supprimée ou altérée est relue
+    au rerun suivant, sans attendre l'expiration. Les compteurs eux-mêmes sont relus
+    au plus toutes les PG_VERSIONS_TTL secondes ;
+  - refresh_all() vide tout, pour les boutons « Rafraîchir ».
+
+Les connexions (pool PostgreSQL, client MongoDB, client Atlas, modèles LLM) sont des
+ressources du processus (voir services.py), partagées entre les reruns et les sessions.
+
+Variables d'environnement :
+  PG_VERSIONS_TTL     Intervalle de relecture des compteurs PostgreSQL en secondes (défaut 5)
+  LIST_CACHE_TTL      Durée de vie des listes de tables et collections (défaut 600)
+  PREVIEW_CACHE_TTL   Durée de vie des aperçus (défaut 300)
+
+Les pages d'aperçu PostgreSQL (pagination par clé, projection de colonnes) viennent de
+database.pg_preview ; chaque page est mise en cache avec la version de la table.
+"""
+
+import os
+import pandas as pd
+import streamlit as st
+from dotenv import load_dotenv
+
+from database.mongo_scanner import clear_scan_cache
+from database.mongo_schema import clear_schema_cache
+from database.pg_preview import preview_page
+from database.postgres_utils import get_schema_snapshot, get_table_versions
+from services import get_mongo_db
+
+load_dotenv()
+
+PG_VERSIONS_TTL = int(os.getenv("PG_VERSIONS_TTL", "5"))
+LIST_CACHE_TTL = int(os.getenv("LIST_CACHE_TTL", "600"))
+PREVIEW_CACHE_TTL = int(os.getenv("PREVIEW_CACHE_TTL", "300"))
+PREVIEW_LIMIT = 20
+
+# Dernière structure connue par schéma : un changement force la relecture du catalogue
+_schema_tokens = {}
+
+
+# ➤ PostgreSQL
+@st.cache_data(ttl=PG_VERSIONS_TTL, show_spinner=False)
+def table_versions(schema: str = "public") -> dict:
+    return get_table_versions(schema)
+
+
+def _schema_token(versions: dict) -> tuple:
+    # Noms et nombre de colonnes : les insertions seules ne changent pas la liste des tables
+    return tuple(sorted((name, version[0]) for name, version in versions.items()))
+
+
+@st.cache_data(ttl=LIST_CACHE_TTL, show_spinner=False)
+def _postgres_tables(schema: str, schema_token: tuple) -> list:
+    previous = _schema_tokens.get(schema)
+    _schema_tokens[schema] = schema_token
+    snapshot = get_schema_snapshot(refresh=previous is not None and previous != schema_token)
+    return snapshot.table_names(schema)
+
+
+def postgres_tables(schema: str = "public") -> list:
+    """Tables du schéma, relues quand une table est créée, supprimée ou altérée."""
+    return _postgres_tables(schema, _schema_token(table_versions(schema)))
+
+
+@st.cache_data(ttl=PREVIEW_CACHE_TTL, max_entries=256, show_spinner=False)
+def _postgres_page(table: str, schema: str, columns: tuple, after: tuple, offset: int, version: tuple) -> dict:
+    page = preview_page(table, schema, list(columns) or None, after, offset=offset)
+    page["frame"] = pd.DataFrame(page.pop("rows"), columns=page["columns"])
+    return page
+
+
+def postgres_page(table: str, schema: str = "public", columns: list = None, after: tuple = None, offset: int = 0) -> dict:
+    """
+    Page d'aperçu (voir pg_preview.preview_page), relue dès que les compteurs de la table changent.
+
+    Returns:
+        dict: {"frame": DataFrame, "columns": [...], "key": [...], "ordering": str ou None,
+               "next": curseur ou None, "next_offset": int ou None}
+    """
+    return _postgres_page(table, schema, tuple(columns or ()), after, offset, table_versions(schema).get(table))
+
+
+def postgres_preview(table: str, schema: str = "public") -> pd.DataFrame:
+    """Première page de la table, dans l'ordre de sa clé primaire."""
+    return postgres_page(table, schema)["frame"]
+
+
+# ➤ MongoDB
+@st.cache_data(ttl=LIST_CACHE_TTL, show_spinner=False)
+def mongo_collections() -> list:
+    return get_mongo_db().list_collection_names()
+
+
+@st.cache_data(ttl=PREVIEW_CACHE_TTL, max_entries=64, show_spinner=False)
+def mongo_preview(collection: str) -> pd.DataFrame:
+    docs = list(get_mongo_db()[collection].find({}, {"_id": 0}).limit(PREVIEW_LIMIT))
+    return pd.DataFrame(docs)
+
+
+def refresh_all() -> None:
+    """Vide les caches de données, les schémas et scans MongoDB et relit le catalogue PostgreSQL (bouton « Rafraîchir »)."""
+    for cached in (table_versions, _postgres_tables, _postgres_page, mongo_collections, mongo_preview):
+        cached.clear()
+    _schema_tokens.clear()
+    clear_schema_cache()
+    clear_scan_cache()
+    get_schema_snapshot(refresh=True)
@@ -1,38 +1,37 @@
+# Durée d'exécution du script, affichée avec STARTUP_TIMING=1
+import time
+_started = time.perf_counter()
+
 import streamlit as st
 import os
-import json
-import requests
-import psycopg2
+import sys
 from dotenv import load_dotenv
-import google.generativeai as genai
 import re
 import pandas as pd
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from services import startup_report
+from classification.llm_backend import get_model, stream_text, stream_lines
+from classification.prompt_cache import load_template
+from classification.llm_cache import cached_generate, cached_stream, invalidate as invalidate_llm_cache
+from classification.llm_classifier import classify_structured
+from classification.structured_output import OUTPUT_FORMAT
+from classification.pii_rules import pre_classify, merge_output, render_output, describe_column
+from classification.similarity_cache import reuse_similar, learn as learn_similar
+from database.postgres_utils import get_schema_snapshot
+from database.pg_profiler import get_profiled_columns
+from governance.atlas_client import get_atlas_client
+from streamlit_app.data_cache import postgres_tables, refresh_all
+
 # Chargement des variables d’environnement
 load_dotenv()
 API_KEY = os.getenv("API_KEY_GOOGLE")
 LLM_MODEL = os.getenv("LLM_MODEL")
 PROMPT_STRUCTURED_PATH = os.getenv("PROMPT_STRUCTURED_PATH")
-POSTGRES_HOST = os.getenv("POSTGRES_HOST")
-POSTGRES_PORT = os.getenv("POSTGRES_PORT")
-POSTGRES_DB = os.getenv("POSTGRES_DB")
-POSTGRES_USER = os.getenv("POSTGRES_USER")
-POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD")
 ATLAS_URL = os.getenv("ATLAS_BASE_URL")
 ATLAS_USER = os.getenv("ATLAS_USER")
 ATLAS_PASSWORD = os.getenv("ATLAS_PASSWORD")
 
-# Connexion PostgreSQL
-pg_conn = psycopg2.connect(
-    host=POSTGRES_HOST, port=POSTGRES_PORT,
-    dbname=POSTGRES_DB, user=POSTGRES_USER,
-    password=POSTGRES_PASSWORD
-)
-pg_cursor = pg_conn.cursor()
-
-genai.configure(api_key=API_KEY)
-model = genai.GenerativeModel(LLM_MODEL)
-
 level_mapping = {
     1: ("0", "Public"),
     2: ("1", "Restreint"),
@@ -47,7 +46,7 @@ def format_classification(level_key):
 
 def extract_fcros_structured(justification):
     try:
-        match = re.findall(r'F\s*:\s*(\d).?C\s:\s*(\d).?R\s:\s*(\d).?O\s:\s*(\d)', justification.replace("(", "").replace(")", ""))
+        match = re.findall(r'F\s*:\s*(\d).*?C\s*:\s*(\d).*?R\s*:\s*(\d).*?O\s*:\s*(\d)', justification.replace("(", "").replace(")", ""))
         if match:
             f, c, r, o = map(int, match[0])
             return max(f, c, r, o)
@@ -82,8 +81,9 @@ def detect_level_from_comment(comment):
 
 st.title("🤖 Chatbot Intelligent – Classification des Données Sensibles")
 
-pg_cursor.execute("SELECT table_name FROM information_schema.tables WHERE table_schema='public'")
-tables = [row[0] for row in pg_cursor.fetchall()]
+if st.button("🔄 Rafraîchir le schéma PostgreSQL"):
+    refresh_all()
+tables = postgres_tables("public")
 
 entity_name = st.selectbox("Sélectionnez une table PostgreSQL :", options=tables)
 
@@ -102,39 +102,154 @@ if "justification_finale" not in st.session_state:
 if "commentaires" not in st.session_state:
     st.session_state.commentaires = {}
 
-def classify_table(table_name):
-    pg_cursor.execute("SELECT column_name, data_type FROM information_schema.columns WHERE table_name = %s", (table_name,))
-    columns = pg_cursor.fetchall()
-    context = f"🧾 Table : {table_name}\n\nColonnes :\n" + "\n".join([f"- {col[0]} ({col[1]})" for col in columns])
+def parse_classification_row(line):
+    """Ligne du tableau markdown → [colonne, type, sensible, niveau, justification, MAX_FCRO], ou None."""
+    if "|" in line and not any(kw in line for kw in ["Colonne", "Sensible", "Justification"]) and "---" not in line:
+        parts = [p.strip() for p in line.strip().strip("|").split("|")]
+        if len(parts) >= 5:
+            parts.append(extract_fcros_structured(parts[4]))
+            return parts
+    return None
 
-    with open(PROMPT_STRUCTURED_PATH, "r", encoding="utf-8") as f:
-        prompt = f.read()
+def known_row(row):
+    """Ligne d'une colonne connue (règles, similarité) → format d'affichage, sans repasser par le markdown."""
+    return list(row[:5]) + [extract_fcros_structured(row[4])]
 
-    full_prompt = prompt.replace("{context}", context)
-    response = model.generate_content(full_prompt)
-    result = response.text.strip()
+def in_table_order(rows, columns):
+    """Lignes triées dans l'ordre des colonnes de la table, comme en mode JSON (classify_structured)."""
+    order = {col["name"]: i for i, col in enumerate(columns)}
+    return sorted(rows, key=lambda row: order.get(row[0], len(order)))
 
+def parse_classification_rows(result):
     justification_finale = ""
     rows = []
     max_niveau_global = 1
     for line in result.splitlines():
         if "Justification finale" in line:
             justification_finale = line.split(":", 1)[-1].strip()
-        if "|" in line and not any(kw in line for kw in ["Colonne", "Sensible", "Justification"]) and "---" not in line:
-            parts = [p.strip() for p in line.strip().strip("|").split("|")]
-            if len(parts) >= 5:
-                niveau = extract_fcros_structured(parts[4])
-                max_niveau_global = max(max_niveau_global, niveau)
-                parts.append(niveau)
-                rows.append(parts)
-
+        row = parse_classification_row(line)
+        if row:
+            max_niveau_global = max(max_niveau_global, row[-1])
+            rows.append(row)
+    return rows, max_niveau_global, justification_finale
+
+def classify_table(table_name, use_cache=True, profile=False, on_row=None):
+    """
+    Classifie la table ; la réponse du LLM est diffusée et on_row(row) est appelé pour
+    chaque ligne du tableau dès qu'elle arrive. Le niveau global est calculé à la fin.
+    """
+    # En mode profilage, les taux de motifs PII sont calculés dans PostgreSQL
+    columns = get_profiled_columns(table_name) if profile else get_schema_snapshot().columns(table_name, "public")
+    all_columns = list(columns)
+
+    if OUTPUT_FORMAT == "json":
+        # Même chaîne que llm_classifier : règles locales, similarité, flux JSON, réparation, cache
+        structured = classify_structured(
+            "structured", table_name, all_columns, use_cache=use_cache, verbose=False,
+            on_column=(lambda col: on_row(col.to_row())) if on_row else None,
+            prompt=load_template(PROMPT_STRUCTURED_PATH).prefix, model_name=LLM_MODEL
+        )
+        rows = structured.to_rows()
+        classification_level, tag = level_mapping.get(structured.level, ("0", "Public"))
+        return rows, structured.level, classification_level, tag, structured.to_markdown(), structured.justification
+
+    # Les identifiants évidents (CIN, e-mail, IBAN…) sont classés localement,
+    # puis les colonnes proches d'une colonne déjà classée reprennent sa classification
+    known_rows, columns = pre_classify(columns)
+    similar_rows, columns = reuse_similar(table_name, columns)
+    known_rows += similar_rows
+    if on_row:
+        for row in known_rows:
+            on_row(known_row(row))
+
+    if known_rows and not columns:
+        result = render_output(table_name, known_rows)
+    else:
+        context = f"🧾 Table : {table_name}\n\nColonnes :\n" + "\n".join([describe_column(col) for col in columns])
+
+        prompt = load_template(PROMPT_STRUCTURED_PATH).prefix
+        chunks = cached_stream(
+            LLM_MODEL, prompt, context,
+            lambda: stream_text(get_model(LLM_MODEL, prompt), context),
+            entity=table_name, bypass=not use_cache
+        )
+        lines = []
+        for line in stream_lines(chunks):
+            lines.append(line)
+            row = parse_classification_row(line) if on_row else None
+            if row:
+                on_row(row)
+        result = "\n".join(lines).strip()
+        learn_similar(table_name, result)
+        result = merge_output(result, known_rows)
+
+    rows, max_niveau_global, justification_finale = parse_classification_rows(result)
+    rows = in_table_order(rows, all_columns)
     classification_level, tag = level_mapping.get(max_niveau_global, ("0", "Public"))
 
     return rows, max_niveau_global, classification_level, tag, result, justification_finale
 
+def classify_columns(table_name, selected_rows, use_cache=True):
+    """Reclassifie uniquement les colonnes sélectionnées, en un seul appel Gemini."""
+    context = (
+        f"🧾 Table : {table_name}\n\n"
+        "Reclassifie UNIQUEMENT les colonnes ci-dessous (classification actuelle indiquée pour contexte) :\n"
+        + "\n".join([f"- {row[0]} ({row[1]}) — niveau actuel : {row[3]} — {row[4]}" for row in selected_rows])
+    )
+
+    # Le LLM peut renvoyer d'autres colonnes que celles demandées : elles sont ignorées
+    selected_names = {row[0] for row in selected_rows}
+
+    if OUTPUT_FORMAT == "json":
+        structured = classify_structured(
+            "structured", table_name, [{"name": row[0], "type": row[1]} for row in selected_rows],
+            use_cache=use_cache, verbose=False, context=context,
+            prompt=load_template(PROMPT_STRUCTURED_PATH).prefix, model_name=LLM_MODEL
+        )
+        rows = {col.name: col.to_row() for col in structured.columns if col.name in selected_names}
+        return rows, structured.to_markdown(), structured.justification
+
+    prompt = load_template(PROMPT_STRUCTURED_PATH).prefix
+    result = cached_generate(
+        LLM_MODEL, prompt, context,
+        lambda: get_model(LLM_MODEL, prompt).generate_content(context).text,
+        entity=table_name, bypass=not use_cache
+    ).strip()
+
+    rows, _, justification_finale = parse_classification_rows(result)
+    return {row[0]: row for row in rows if row[0] in selected_names}, result, justification_finale
+
+def merge_reclassified_rows(rows, new_rows_by_name):
+    """Remplace les lignes reclassifiées et recalcule le niveau global (max des MAX_FCRO)."""
+    rows_updated = []
+    max_niveau_global = 1
+    for row in rows:
+        new_row = new_rows_by_name.get(row[0])
+        row = new_row if new_row else row
+        max_niveau_global = max(max_niveau_global, row[-1])
+        rows_updated.append(row)
+    return rows_updated, max_niveau_global
+
+ignore_cache = st.checkbox("♻️ Ignorer le cache (nouvel appel Gemini)")
+profile_values = st.checkbox("🔬 Profiler les valeurs dans PostgreSQL (motifs PII sur échantillon)")
+if st.button("🧹 Vider le cache de cette table"):
+    st.info(f"{invalidate_llm_cache(entity_name)} réponse(s) supprimée(s) du cache pour '{entity_name}'.")
+
 # Lancer la classification initiale
 if st.button("🚀 Lancer la classification"):
-    rows, max_level_key, classification_level, tag, result, justification_finale = classify_table(entity_name)
+    # Les lignes s'affichent au fil de la réponse du LLM
+    progress_placeholder = st.empty()
+    streamed_rows = []
+
+    def show_row(row):
+        streamed_rows.append(row)
+        df_progress = pd.DataFrame(streamed_rows, columns=["Colonne", "Type", "Sensible ?", "Niveau LLM", "Justification", "MAX_FCRO"])
+        progress_placeholder.dataframe(df_progress.drop(columns=["MAX_FCRO"]), use_container_width=True)
+
+    rows, max_level_key, classification_level, tag, result, justification_finale = classify_table(
+        entity_name, use_cache=not ignore_cache, profile=profile_values, on_row=show_row
+    )
+    progress_placeholder.empty()
     st.session_state.rows = rows
     st.session_state.entity_name = entity_name
     st.session_state.classification_level = classification_level
@@ -190,34 +305,15 @@ if st.session_state.rows:
         if not cols_to_reclassify:
             st.warning("Veuillez sélectionner au moins une colonne pour la reclassification.")
         else:
-            # Récupérer la classification actuelle dans st.session_state.rows
-            rows_updated = []
-            max_niveau_global = 1
-
-            for row in st.session_state.rows:
-                col_name, col_type, sens, niveau_llm, justification, max_score = row
-                if col_name in cols_to_reclassify:
-                    # Faire reclassification Gemini pour cette colonne seulement
-                    # Ici, on peut soit appeler classify_table pour toute la table et ne garder que les colonnes,
-                    # ou idéalement, envoyer uniquement la colonne à Gemini.
-                    # Pour simplifier, on fait une requête globale et on remplace uniquement les colonnes sélectionnées
-
-                    # Appel Gemini pour la table entière (option simple)
-                    rows_gemini, max_level_key, classification_level, tag, result, justification_finale = classify_table(entity_name)
-
-                    # Trouver la nouvelle ligne pour la colonne actuelle
-                    new_row = next((r for r in rows_gemini if r[0] == col_name), None)
-                    if new_row:
-                        niveau = new_row[-1]  # MAX_FCRO
-                        max_niveau_global = max(max_niveau_global, niveau)
-                        rows_updated.append(new_row)
-                    else:
-                        # Si non trouvée, garder l'ancienne ligne
-                        max_niveau_global = max(max_niveau_global, max_score)
-                        rows_updated.append(row)
-                else:
-                    max_niveau_global = max(max_niveau_global, max_score)
-                    rows_updated.append(row)
+            # Un seul appel Gemini limité aux colonnes sélectionnées
+            selected_rows = [row for row in st.session_state.rows if row[0] in cols_to_reclassify]
+            new_rows, result, justification_finale = classify_columns(entity_name, selected_rows, use_cache=not ignore_cache)
+
+            missing = [col for col in cols_to_reclassify if col not in new_rows]
+            if missing:
+                st.warning(f"Colonnes non renvoyées par Gemini (classification conservée) : {', '.join(missing)}")
+
+            rows_updated, max_niveau_global = merge_reclassified_rows(st.session_state.rows, new_rows)
 
             st.session_state.rows = rows_updated
             st.session_state.classification_level, st.session_state.tag = level_mapping.get(max_niveau_global, ("0", "Public"))
@@ -250,12 +346,12 @@ if st.session_state.rows and st.button("💾 Enregistrer la classification dans
         }
     }
 
-    res = requests.post(f"{ATLAS_URL}/api/atlas/v2/entity",
-                        auth=(ATLAS_USER, ATLAS_PASSWORD),
-                        headers={"Content-Type": "application/json"},
-                        data=json.dumps(main_entity_data))
+    atlas = get_atlas_client(ATLAS_URL, ATLAS_USER, ATLAS_PASSWORD)
+    res = atlas.request("POST", "/entity", json=main_entity_data)
 
     if res.status_code == 200:
         st.success("✅ Classification globale enregistrée dans Apache Atlas.")
     else:
         st.error(f"❌ Erreur lors de l'enregistrement globale : {res.status_code} - {res.text}")
+
+startup_report("Chatbot_Intelligent", _started)
@@ -1,44 +1,30 @@
+# Durée d'exécution du script, affichée avec STARTUP_TIMING=1
+import time
+_started = time.perf_counter()
+
 import streamlit as st
 import os
-import pandas as pd
-import psycopg2
-import pymongo
+import sys
 from dotenv import load_dotenv
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from services import startup_report
+from streamlit_app.data_cache import postgres_tables, mongo_collections, mongo_preview, refresh_all
+from streamlit_app.preview import show_postgres_preview
+
 # 🌍 Configuration Streamlit
 st.set_page_config(page_title="Visualisation des Données", layout="wide")
 load_dotenv()
 
-# Connexion PostgreSQL
-pg_conn = psycopg2.connect(
-    host=os.getenv("POSTGRES_HOST", "127.0.0.1"),
-    port=os.getenv("POSTGRES_PORT"),
-    dbname=os.getenv("POSTGRES_DB"),
-    user=os.getenv("POSTGRES_USER"),
-    password=os.getenv("POSTGRES_PASSWORD")
-)
-
-# Connexion MongoDB
-mongo_client = pymongo.MongoClient(os.getenv("MONGO_URI"))
-mongo_db = mongo_client[os.getenv("MONGO_DB")]
-
-# Fonctions de récupération
+# Fonctions de récupération (mises en cache entre les reruns, voir streamlit_app/data_cache.py)
 def get_postgres_tables():
-    with pg_conn.cursor() as cur:
-        cur.execute("SELECT table_name FROM information_schema.tables WHERE table_schema = 'public'")
-        return [row[0] for row in cur.fetchall()]
-
-def get_postgres_table_preview(table):
-    return pd.read_sql_query(f"SELECT * FROM {table} LIMIT 20", con=pg_conn)
+    return postgres_tables("public")
 
 def get_mongodb_collections():
-    return mongo_db.list_collection_names()
+    return mongo_collections()
 
 def get_mongodb_preview(collection):
-    docs = list(mongo_db[collection].find().limit(20))
-    for doc in docs:
-        doc.pop("_id", None)
-    return pd.DataFrame(docs)
+    return mongo_preview(collection)
 
 # --- Interface Streamlit ---
 st.markdown("## 📊 Visualisation des données existantes")
@@ -47,11 +33,15 @@ col1, col2 = st.columns([1, 3])
 
 with col1:
     source_type = st.radio("Source à afficher :", ["PostgreSQL", "MongoDB"])
+    if st.button("🔄 Rafraîchir les données"):
+        refresh_all()
 
 # Initialisation variable sélection stockée dans session_state
 if 'selected' not in st.session_state:
     st.session_state.selected = None
 
+# Listes lues une seule fois par rendu (et servies par le cache entre les reruns)
+tables, collections = [], []
 with col2:
     if source_type == "PostgreSQL":
         tables = get_postgres_tables()
@@ -82,14 +72,12 @@ if selected:
     try:
         if source_type == "PostgreSQL":
             # Vérifie si la table existe encore avant de charger
-            tables = get_postgres_tables()
             if selected not in tables:
                 st.error(f"La table PostgreSQL '{selected}' n'existe pas.")
             else:
-                df = get_postgres_table_preview(selected)
-                st.dataframe(df, use_container_width=True)
+                # Pagination par clé / échantillon, colonnes projetées (voir streamlit_app/preview.py)
+                show_postgres_preview(selected, key="classification")
         else:
-            collections = get_mongodb_collections()
             if selected not in collections:
                 st.error(f"La collection MongoDB '{selected}' n'existe pas.")
             else:
@@ -100,3 +88,5 @@ if selected:
 
 else:
     st.info("Veuillez sélectionner une table ou une collection pour voir l'aperçu.")
+
+startup_report("Classification", _started)
@@ -1,11 +1,17 @@
+# Durée d'exécution du script, affichée avec STARTUP_TIMING=1
+import time
+_started = time.perf_counter()
+
 import streamlit as st
 import os
-import psycopg2
-from pymongo import MongoClient
-import requests
+import sys
 from dotenv import load_dotenv
 import pandas as pd
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from services import startup_report
+from governance.atlas_client import get_atlas_client
+
 # Charger les variables d’environnement depuis .env
 load_dotenv()
 
@@ -39,6 +45,7 @@ atlas_status = "❌ Erreur"
 
 # ✅ Test PostgreSQL
 try:
+    import psycopg2
     conn = psycopg2.connect(
         host=POSTGRES_HOST,
         port=POSTGRES_PORT,
@@ -53,6 +60,7 @@ except:
 
 # ✅ Test MongoDB
 try:
+    from pymongo import MongoClient
     client = MongoClient(MONGO_URI)
     if MONGO_DBNAME in client.list_database_names():
         mongo_status = "✅ Connecté"
@@ -63,7 +71,7 @@ except:
 
 # ✅ Test Apache Atlas
 try:
-    response = requests.get(f"{ATLAS_BASE_URL}/api/atlas/v2/types/typedefs", auth=(ATLAS_USER, ATLAS_PASSWORD))
+    response = get_atlas_client(ATLAS_BASE_URL, ATLAS_USER, ATLAS_PASSWORD).request("GET", "/types/typedefs")
     if response.status_code == 200:
         atlas_status = "✅ Connecté"
     else:
@@ -96,3 +104,5 @@ with st.expander("🔹 Apache Atlas"):
 
 st.markdown("---")
 st.caption("📁 Fichier `.env` chargé automatiquement depuis la racine du projet.")
+
+startup_report("Configuration", _started)
@@ -1,42 +1,75 @@
+# Durée d'exécution du script, affichée avec STARTUP_TIMING=1
+import time
+_started = time.perf_counter()
+
 import streamlit as st
-import requests
+import os
+import sys
 import pandas as pd
-from requests.auth import HTTPBasicAuth
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from services import startup_report
+from governance.atlas_client import get_atlas_client
 
 # 🔧 Configuration Atlas
-ATLAS_BASE_URL = "http://localhost:21000/api/atlas/v2"
-USERNAME = "admin"
-PASSWORD = "admin"
+ATLAS_BASE_URL = os.getenv("ATLAS_BASE_URL", "http://localhost:21000/api/atlas/v2")
+USERNAME = os.getenv("ATLAS_USER", "admin")
+PASSWORD = os.getenv("ATLAS_PASSWORD", "admin")
 
-# 📥 Obtenir toutes les entités postgres_table
-def get_all_postgres_tables():
-    url = f"{ATLAS_BASE_URL}/search/basic"
+atlas = get_atlas_client(ATLAS_BASE_URL, USERNAME, PASSWORD)
+
+PAGE_SIZE = 500          # entités par page search/basic
+PARALLEL_PAGES = 4       # pages demandées simultanément
+CACHE_TTL = 300          # secondes
+
+# 📥 Une page de résultats search/basic (classifications incluses dans les en-têtes)
+def search_postgres_tables_page(offset, limit=PAGE_SIZE):
     payload = {
         "typeName": "postgres_table",
         "excludeDeletedEntities": True,
-        "limit": 100
+        "includeClassificationAttributes": True,
+        "attributes": ["name"],
+        "limit": limit,
+        "offset": offset
     }
-    response = requests.post(url, json=payload, auth=HTTPBasicAuth(USERNAME, PASSWORD))
-    if response.status_code == 200:
-        return response.json().get("entities", [])
-    else:
-        st.error(f"Erreur Atlas : {response.status_code}")
-        return []
-
-# 📄 Obtenir détails d'une table par GUID
-def get_entity_with_classification(guid):
-    url = f"{ATLAS_BASE_URL}/entity/guid/{guid}"
-    response = requests.get(url, auth=HTTPBasicAuth(USERNAME, PASSWORD))
-    if response.status_code == 200:
-        return response.json().get("entity", {})
-    else:
-        return None
+    response = atlas.request("POST", "/search/basic", json=payload)
+    if response.status_code != 200:
+        raise RuntimeError(f"Erreur Atlas : {response.status_code}")
+    return response.json().get("entities", []) or []
+
+# 📥 Obtenir toutes les entités postgres_table, page par page
+def get_all_postgres_tables():
+    """
+    Parcourt tout le catalogue par vagues de PARALLEL_PAGES pages demandées en parallèle,
+    jusqu'à la première page incomplète.
+    """
+    entities = []
+    offset = 0
+    with ThreadPoolExecutor(max_workers=PARALLEL_PAGES) as pool:
+        while True:
+            offsets = [offset + i * PAGE_SIZE for i in range(PARALLEL_PAGES)]
+            pages = list(pool.map(search_postgres_tables_page, offsets))
+            for page in pages:
+                entities.extend(page)
+            if any(len(page) < PAGE_SIZE for page in pages):
+                break
+            offset += PARALLEL_PAGES * PAGE_SIZE
+
+    # Anciennes versions d'Atlas : classifications absentes des en-têtes → lecture groupée par GUID
+    missing = [e["guid"] for e in entities if "classificationNames" not in e and "classifications" not in e]
+    if missing:
+        full = {e["guid"]: e for e in atlas.get_entities(missing)}
+        entities = [full.get(e["guid"], e) for e in entities]
+    return entities
 
 # 🧠 Extraire informations utiles
 def extract_info(entity):
     attr = entity.get("attributes", {})
     table_name = attr.get("name", "Inconnu")
-    classifications = entity.get("classifications", [])
+    classifications = entity.get("classifications") or [
+        {"typeName": name} for name in entity.get("classificationNames", [])
+    ]
 
     if classifications:
         classification = classifications[0].get("typeName", "Non classifiée")
@@ -55,17 +88,24 @@ def extract_info(entity):
 st.set_page_config(page_title="📊 Dashboard Classification", layout="wide")
 st.title("📊 Dashboard de classification des tables Atlas")
 
-if st.button("🔄 Charger les données depuis Apache Atlas"):
-    with st.spinner("Chargement des tables..."):
-        raw_entities = get_all_postgres_tables()
-        data = []
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def load_dashboard_data():
+    return [extract_info(entity) for entity in get_all_postgres_tables()]
 
-        for entity in raw_entities:
-            guid = entity.get("guid")
-            full_entity = get_entity_with_classification(guid)
-            if full_entity:
-                info = extract_info(full_entity)
-                data.append(info)
+col_load, col_refresh = st.columns(2)
+if col_load.button("🔄 Charger les données depuis Apache Atlas"):
+    st.session_state.dashboard_loaded = True
+if col_refresh.button(f"♻️ Forcer l'actualisation (cache {CACHE_TTL // 60} min)"):
+    load_dashboard_data.clear()
+    st.session_state.dashboard_loaded = True
+
+if st.session_state.get("dashboard_loaded"):
+    with st.spinner("Chargement des tables..."):
+        try:
+            data = load_dashboard_data()
+        except RuntimeError as e:
+            st.error(str(e))
+            st.stop()
 
         # Nettoyage et filtrage
         data = [item for item in data 
@@ -112,3 +152,5 @@ if st.button("🔄 Charger les données depuis Apache Atlas"):
             file_name="dashboard_classification.csv",
             mime="text/csv"
         )
+
+startup_report("dashboard", _started)
@@ -0,0 +1,89 @@
+"""
+Composant d'aperçu des tables PostgreSQL, partagé par la page Classification et le dashboard.
+
+  Pagination               pages suivantes/précédentes par clé primaire, par OFFSET sans clé
+                           (voir database.pg_preview, pages approximatives pour les vues) ;
+                           les curseurs des pages déjà vues sont gardés dans st.session_state
+  Échantillon représentatif  TABLESAMPLE, lignes affichées au fur et à mesure des paquets reçus
+
+Le choix des colonnes est transmis à la requête : seules les colonnes cochées sont lues.
+"""
+
+import random
+import pandas as pd
+import streamlit as st
+
+from database.pg_preview import stream_sample
+from database.postgres_utils import get_schema_snapshot
+from streamlit_app.data_cache import postgres_page
+
+SAMPLE_ROWS = 200
+
+MODES = ["Pagination", "Échantillon représentatif"]
+
+
+def _state(key: str, table: str) -> dict:
+    # Curseurs par table : changer de table ou de colonnes repart de la première page
+    state = st.session_state.setdefault(f"{key}_preview", {})
+    if state.get("table") != table:
+        state.clear()
+        state.update(table=table, cursors=[(None, 0)], seed=random.randint(0, 2**31 - 1))
+    return state
+
+
+def show_postgres_preview(table: str, schema: str = "public", key: str = "preview") -> None:
+    """
+    Affiche l'aperçu paginé de la table avec le choix des colonnes et du mode.
+
+    Args:
+        table (str): Table sélectionnée.
+        schema (str): Schéma PostgreSQL.
+        key (str): Préfixe des clés de widgets (plusieurs aperçus par page).
+    """
+    state = _state(key, table)
+    all_columns = [col["name"] for col in get_schema_snapshot().columns(table, schema)]
+
+    col_mode, col_columns = st.columns([1, 3])
+    with col_mode:
+        mode = st.radio("Mode d'aperçu :", MODES, key=f"{key}_mode", horizontal=True)
+    with col_columns:
+        columns = st.multiselect("Colonnes :", all_columns, key=f"{key}_columns_{table}",
+                                 placeholder="Toutes les colonnes")
+    if state.get("columns") != columns:
+        state.update(columns=columns, cursors=[(None, 0)])
+
+    if mode == MODES[1]:
+        if st.button("🎲 Nouvel échantillon", key=f"{key}_reseed"):
+            state["seed"] = random.randint(0, 2**31 - 1)
+        placeholder = st.empty()
+        frame = None
+        for batch in stream_sample(table, schema, columns or None, rows=SAMPLE_ROWS, seed=state["seed"]):
+            chunk = pd.DataFrame(batch["rows"], columns=batch["columns"])
+            frame = chunk if frame is None else pd.concat([frame, chunk], ignore_index=True)
+            placeholder.dataframe(frame, use_container_width=True)
+        if frame is None:
+            placeholder.info("Table vide.")
+        return
+
+    cursors = state["cursors"]
+    after, offset = cursors[-1]
+    page = postgres_page(table, schema, columns, after, offset)
+    st.dataframe(page["frame"], use_container_width=True)
+
+    col_prev, col_info, col_next = st.columns([1, 2, 1])
+    with col_prev:
+        if st.button("⬅️ Précédente", key=f"{key}_prev", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+    with col_info:
+        # Sans clé primaire, les pages suivantes passent par OFFSET
+        ordering = {
+            "key": ", ".join(page["key"]),
+            "physical": "position physique, sans clé primaire (mode échantillon conseillé)",
+        }.get(page["ordering"], "aucun, vue sans ordre garanti : pages approximatives")
+        st.caption(f"Page {len(cursors)} — tri : {ordering}")
+    with col_next:
+        has_next = page["next"] is not None or page["next_offset"] is not None
+        if st.button("Suivante ➡️", key=f"{key}_next", disabled=not has_next):
+            cursors.append((page["next"], page["next_offset"] or 0))
+            st.rerun()